@@ -1,10 +1,17 @@
+from datetime import datetime
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from APP.Application.Calentamiento import calentamiento
 router = APIRouter()
 
 @router.get("/health")
 def health_check():
-    return {"status": "ok"}
+    return {"status": "ok", "timestamp": datetime.now().isoformat()}
 
 @router.get("/ready")
 def readiness_check():
-    return {"status": "ready"}
\ No newline at end of file
+    progreso = calentamiento.progreso()
+    if not calentamiento.listo:
+        # 503 mientras el modelo y el pool no están calientes: el balanceador no enruta tráfico
+        return JSONResponse(status_code=503, content={"status": "not_ready", **progreso})
+    return {"status": "ready", **progreso}
@@ -1,84 +1,531 @@
 
+import copy
 import json
 import logging
-import torch
+import threading
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import List, Iterator, Tuple, Any
 from APP.Domain.ModelManager import ModelManager
+from APP.Application.MotorAnalisis import MotorAnalisisBatch
+from APP.Application.FragmentosAnalisis import dividir_transcripcion, combinar_analisis
+from APP.Application.DecodificacionJSON import (
+    ProcesadorJSONRestringido, completar_puntuaciones, reparar_truncado
+)
+from APP.Infrastructure.metricas import (
+    ANALISIS_FASE_DURACION, ANALISIS_TOKENS_POR_SEGUNDO, ANALISIS_TOKENS_GENERADOS, ANALISIS_JSON_FALLOS,
+    ANALISIS_TASA_ACEPTACION
+)
 from config import settings
 
-def analizar_llamada(transcripcion: str) -> dict:
-    try:
+# Cambiar al modificar el prompt: invalida los resultados guardados en cache
+VERSION_PROMPT = "1.0"
 
-        manager = ModelManager()
-        tokenizer, model = manager.get_model()
-        
-        prompt = f"""[INST] Analiza esta transcripción de llamada y devuelve SOLO un JSON válido con estas métricas:
+PROMPT_INSTRUCCION = """[INST] Analiza esta transcripción de llamada y devuelve SOLO un JSON válido con estas métricas:
 
-{{
-  "regulacion": {{
+{
+  "regulacion": {
     "cumplimiento": 0-10,
     "comentario": "breve explicación"
-  }},
-  "habilidad_comercial": {{
+  },
+  "habilidad_comercial": {
     "puntuacion": 0-10,
     "comentario": "breve explicación"
-  }},
-  "conocimiento_producto": {{
+  },
+  "conocimiento_producto": {
     "puntuacion": 0-10,
     "comentario": "breve explicación"
-  }},
-  "cierre_venta": {{
+  },
+  "cierre_venta": {
     "puntuacion": 0-10,
     "comentario": "breve explicación"
-  }},
+  },
   "puntuacion_general": 0-10,
   "aspectos_positivos": ["aspecto1", "aspecto2"],
   "areas_mejora": ["mejora1", "mejora2"],
   "recomendacion": "recomendación final"
-}}
+}
 
-Transcripción: {transcripcion}
-[/INST]"""
+Transcripción: """
 
-        inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
-        
-        with torch.no_grad():
-            outputs = model.generate(
-                **inputs,
-                max_new_tokens=settings.max_new_tokens,
-                do_sample=False,
-                repetition_penalty=1.05,
-                pad_token_id=tokenizer.eos_token_id
-            )
-        response = tokenizer.decode(outputs[0], skip_special_tokens=True)
+PROMPT_CIERRE = "\n[/INST]"
+
+# Tokens generados por análisis, para comparar decodificación libre y restringida
+_estadisticas_generacion = {
+    "analisis": 0, "tokens_generados": 0, "max_tokens": 0, "borrador_propuestos": 0, "borrador_aceptados": 0
+}
+_lock_estadisticas = threading.Lock()
+
+def construir_prompt(transcripcion: str) -> str:
+    return f"{PROMPT_INSTRUCCION}{transcripcion}{PROMPT_CIERRE}"
 
+def _reparar_respuesta(response: str):
+    # Salida cortada por max_new_tokens: se cierra si lo generado encaja con el esquema
+    json_start = response.find('{')
+    if json_start == -1:
+        return None
+    reparado = reparar_truncado(response[json_start:])
+    if reparado is None:
+        return None
+    try:
+        result = json.loads(reparado)
+    except json.JSONDecodeError:
+        return None
+    result = completar_puntuaciones(result, reparado)
+    result["respuesta_truncada"] = True
+    ANALISIS_JSON_FALLOS.inc(tipo="truncado_reparado")
+    logging.warning("Respuesta truncada: JSON cerrado y puntuaciones completadas")
+    return result
+
+def extraer_json(response: str) -> dict:
+    try:
         json_start = response.find('{')
         json_end = response.rfind('}') + 1
-        
+
         if json_start != -1 and json_end > json_start:
             json_response = response[json_start:json_end]
             result = json.loads(json_response)
+            if isinstance(result, dict):
+                result = completar_puntuaciones(result, json_response)
             logging.info(f"Análisis completado exitosamente")
             return result
         else:
+            reparado = _reparar_respuesta(response)
+            if reparado is not None:
+                return reparado
             logging.warning("No se encontró JSON válido en la respuesta")
+            ANALISIS_JSON_FALLOS.inc(tipo="sin_json")
             return {
                 "error": "No se pudo extraer JSON de la respuesta",
                 "raw_response": response
             }
-            
+
     except json.JSONDecodeError as e:
+        reparado = _reparar_respuesta(response)
+        if reparado is not None:
+            return reparado
         logging.error(f"Error parseando JSON: {e}")
+        ANALISIS_JSON_FALLOS.inc(tipo="json_invalido")
         return {
             "error": "Respuesta no es JSON válido",
             "parse_error": str(e),
-            "raw_response": response if 'response' in locals() else "Sin respuesta"
+            "raw_response": response
         }
+
+def _preparar_entradas(transcripciones: List[str]) -> dict:
+    """Argumentos de generate para un lote: prefijo fijo + sufijo con cada transcripción.
+
+    Con ``analisis_cache_prefijo`` activo se pasa una copia del KV cache del prefijo,
+    así que solo se hace prefill del sufijo. Con ``analisis_json_restringido`` la salida
+    se limita al esquema del prompt y la generación para al cerrar el objeto. Con
+    ``ml_modelo_borrador`` se pasa el borrador como asistente (solo admite lotes de uno).
+    """
+    import torch
+    from transformers import LogitsProcessorList
+    
+    manager = ModelManager()
+    tokenizer, model = manager.get_model()
+    n = len(transcripciones)
+    tokenizer_borrador, borrador = manager.get_borrador()
+
+    # Con borrador no se reutiliza el KV cache del prefijo: generate asistido no lo respeta
+    # y la salida dejaría de coincidir con la greedy sin borrador
+    if settings.analisis_cache_prefijo and borrador is None:
+        prefijo_ids, prefijo_cache = manager.get_prefijo_cache(PROMPT_INSTRUCCION)
+    else:
+        prefijo_ids = tokenizer(PROMPT_INSTRUCCION, return_tensors="pt").input_ids.to(model.device)
+        prefijo_cache = None
+
+    with ANALISIS_FASE_DURACION.medir(fase="tokenizacion"):
+        sufijos = tokenizer(
+            [f"{transcripcion}{PROMPT_CIERRE}" for transcripcion in transcripciones],
+            return_tensors="pt",
+            padding=True,
+            add_special_tokens=False
+        ).to(model.device)
+
+    # El padding queda entre el prefijo y el sufijo; las posiciones salen de la attention_mask
+    entradas = {
+        "input_ids": torch.cat([prefijo_ids.expand(n, -1), sufijos["input_ids"]], dim=1),
+        "attention_mask": torch.cat([torch.ones_like(prefijo_ids).expand(n, -1), sufijos["attention_mask"]], dim=1),
+        "max_new_tokens": settings.max_new_tokens,
+        "do_sample": False,
+        "repetition_penalty": 1.05,
+        "pad_token_id": tokenizer.pad_token_id
+    }
+
+    if prefijo_cache is not None:
+        past_key_values = copy.deepcopy(prefijo_cache)
+        if n > 1:
+            past_key_values.batch_repeat_interleave(n)
+        entradas["past_key_values"] = past_key_values
+
+    if borrador is not None:
+        # Greedy: el modelo principal verifica cada candidato, la salida es la misma que sin borrador
+        entradas["assistant_model"] = borrador
+        if tokenizer_borrador is not None:
+            entradas["tokenizer"] = tokenizer
+            entradas["assistant_tokenizer"] = tokenizer_borrador
+
+    entradas["logits_processor"] = LogitsProcessorList()
+    if settings.analisis_json_restringido:
+        entradas["logits_processor"].append(
+            ProcesadorJSONRestringido(tokenizer, n, top_k=settings.analisis_json_top_k)
+        )
+
+    return entradas
+
+class _MedidorGeneracion:
+    """Logits processor que no modifica nada: su primera llamada marca el fin del prefill."""
+
+    def __init__(self):
+        self.primer_paso = None
+
+    def __call__(self, input_ids, scores):
+        if self.primer_paso is None:
+            self.primer_paso = time.perf_counter()
+        return scores
+
+class _ContadorAsistido:
+    """Cuenta las pasadas hacia delante del modelo principal y del borrador durante un generate.
+
+    Cada pasada del principal verifica los candidatos y fija los aceptados más un token propio;
+    cada pasada del borrador propone un candidato. Solo cuenta las del hilo que lo crea.
+    """
+
+    def __init__(self, model, borrador):
+        self.hilo = threading.get_ident()
+        self.pasos = 0
+        self.propuestos = 0
+        self._ganchos = [
+            model.register_forward_hook(self._contar_paso),
+            borrador.register_forward_hook(self._contar_propuesta),
+        ]
+
+    def _contar_paso(self, *_):
+        if threading.get_ident() == self.hilo:
+            self.pasos += 1
+
+    def _contar_propuesta(self, *_):
+        if threading.get_ident() == self.hilo:
+            self.propuestos += 1
+
+    def cerrar(self):
+        for gancho in self._ganchos:
+            gancho.remove()
+
+def _registrar_asistencia(contador: _ContadorAsistido, tokens: int, segundos: float):
+    aceptados = min(max(0, tokens - contador.pasos), contador.propuestos)
+    tasa = aceptados / contador.propuestos if contador.propuestos else 0.0
+    with _lock_estadisticas:
+        _estadisticas_generacion["borrador_propuestos"] += contador.propuestos
+        _estadisticas_generacion["borrador_aceptados"] += aceptados
+    ANALISIS_TASA_ACEPTACION.observar(tasa)
+    logging.info(
+        f"Decodificación asistida: {aceptados}/{contador.propuestos} tokens del borrador aceptados "
+        f"({tasa:.0%}), {contador.pasos} pasadas del modelo principal, "
+        f"{tokens / segundos if segundos > 0 else 0:.1f} tokens/s"
+    )
+
+def _registrar_tokens(generados: "torch.Tensor", eos_token_id: int) -> List[int]:
+    import torch
+    
+    # Cuenta por fila los tokens hasta el primer EOS (incluido); el resto es relleno
+    es_eos = generados == eos_token_id
+    hay_eos = es_eos.any(dim=1)
+    primer_eos = es_eos.int().argmax(dim=1)
+    tokens = torch.where(hay_eos, primer_eos + 1, torch.full_like(primer_eos, generados.shape[1])).tolist()
+
+    with _lock_estadisticas:
+        _estadisticas_generacion["analisis"] += len(tokens)
+        _estadisticas_generacion["tokens_generados"] += sum(tokens)
+        _estadisticas_generacion["max_tokens"] = max(_estadisticas_generacion["max_tokens"], *tokens)
+    modo = "restringida" if settings.analisis_json_restringido else "libre"
+    logging.info(f"Tokens generados por análisis (decodificación {modo}): {tokens}")
+    for cantidad in tokens:
+        ANALISIS_TOKENS_GENERADOS.observar(cantidad)
+    return tokens
+
+def obtener_estadisticas_generacion() -> dict:
+    with _lock_estadisticas:
+        estadisticas = dict(_estadisticas_generacion)
+    estadisticas["decodificacion"] = "restringida" if settings.analisis_json_restringido else "libre"
+    estadisticas["tokens_medios"] = (
+        round(estadisticas["tokens_generados"] / estadisticas["analisis"], 1) if estadisticas["analisis"] else 0
+    )
+    estadisticas["borrador"] = settings.ml_modelo_borrador or None
+    estadisticas["tasa_aceptacion"] = (
+        round(estadisticas["borrador_aceptados"] / estadisticas["borrador_propuestos"], 3)
+        if estadisticas["borrador_propuestos"] else None
+    )
+    return estadisticas
+
+def analizar_lote(transcripciones: List[str]) -> List[dict]:
+    """Analiza varias transcripciones con un único generate (una a una con decodificación asistida)."""
+    import torch
+    
+    manager = ModelManager()
+    tokenizer, model = manager.get_model()
+    _, borrador = manager.get_borrador()
+    if borrador is not None and len(transcripciones) > 1:
+        return [resultado for transcripcion in transcripciones for resultado in analizar_lote([transcripcion])]
+
+    entradas = _preparar_entradas(transcripciones)
+    medidor = _MedidorGeneracion()
+    entradas["logits_processor"].insert(0, medidor)
+
+    contador = _ContadorAsistido(model, borrador) if borrador is not None else None
+    inicio = time.perf_counter()
+    try:
+        with torch.no_grad():
+            outputs = model.generate(**entradas)
+    finally:
+        if contador is not None:
+            contador.cerrar()
+    fin = time.perf_counter()
+
+    # Solo se decodifican los tokens nuevos; el prompt también contiene llaves
+    longitud_prompt = entradas["input_ids"].shape[1]
+    tokens = _registrar_tokens(outputs[:, longitud_prompt:], tokenizer.eos_token_id)
+    if contador is not None:
+        _registrar_asistencia(contador, tokens[0], fin - inicio)
+
+    primer_paso = medidor.primer_paso or fin
+    ANALISIS_FASE_DURACION.observar(primer_paso - inicio, fase="prefill")
+    ANALISIS_FASE_DURACION.observar(fin - primer_paso, fase="decode")
+    if fin > primer_paso:
+        ANALISIS_TOKENS_POR_SEGUNDO.observar(sum(tokens) / (fin - primer_paso))
+
+    with ANALISIS_FASE_DURACION.medir(fase="detokenizacion"):
+        respuestas = tokenizer.batch_decode(outputs[:, longitud_prompt:], skip_special_tokens=True)
+    return [extraer_json(respuesta) for respuesta in respuestas]
+
+def calentar_modelo(tokens: int):
+    """Carga el modelo, calcula el KV cache del prefijo y hace un generate corto de prueba."""
+    import torch
+    
+    _, model = ModelManager().get_model()
+    entradas = _preparar_entradas(["Operador: Buenos días, ¿en qué le puedo ayudar?\nCliente: Tengo una consulta."])
+    entradas["max_new_tokens"] = tokens
+    with torch.no_grad():
+        model.generate(**entradas)
+
+def analizar_llamada_stream(transcripcion: str) -> Iterator[str]:
+    """Genera el texto de la respuesta a medida que el modelo produce tokens."""
+    import torch
+    from transformers import TextIteratorStreamer
+
+    tokenizer, model = ModelManager().get_model()
+    entradas = _preparar_entradas([transcripcion])
+    streamer = TextIteratorStreamer(
+        tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=settings.inferencia_timeout_segundos
+    )
+    errores: List[Exception] = []
+
+    def generar():
+        try:
+            with torch.no_grad():
+                model.generate(**entradas, streamer=streamer)
+        except Exception as e:
+            errores.append(e)
+        finally:
+            # Sin end() el consumidor se quedaría esperando tokens que no van a llegar
+            streamer.end()
+
+    hilo = threading.Thread(target=generar, name="analisis-stream", daemon=True)
+    hilo.start()
+    for fragmento in streamer:
+        if fragmento:
+            yield fragmento
+    hilo.join()
+    if errores:
+        raise errores[0]
+
+class ExtractorCamposJSON:
+    """Detecta los campos de primer nivel del objeto JSON a medida que se completan."""
+
+    def __init__(self):
+        self._buffer = ""
+        self._posicion = 0
+        self._inicio_campo = None
+        self._profundidad = 0
+        self._en_string = False
+        self._escape = False
+        self.terminado = False
+
+    def alimentar(self, fragmento: str) -> List[Tuple[str, Any]]:
+        self._buffer += fragmento
+        campos = []
+
+        while self._posicion < len(self._buffer) and not self.terminado:
+            caracter = self._buffer[self._posicion]
+
+            if self._en_string:
+                if self._escape:
+                    self._escape = False
+                elif caracter == '\\':
+                    self._escape = True
+                elif caracter == '"':
+                    self._en_string = False
+            elif caracter == '"' and self._profundidad > 0:
+                self._en_string = True
+            elif caracter in '{[':
+                self._profundidad += 1
+                if self._profundidad == 1:
+                    self._inicio_campo = self._posicion + 1
+            elif caracter in '}]' and self._profundidad > 0:
+                if self._profundidad == 1:
+                    campos.extend(self._cerrar_campo())
+                    self.terminado = True
+                self._profundidad -= 1
+            elif caracter == ',' and self._profundidad == 1:
+                campos.extend(self._cerrar_campo())
+                self._inicio_campo = self._posicion + 1
+
+            self._posicion += 1
+
+        return campos
+
+    def _cerrar_campo(self) -> List[Tuple[str, Any]]:
+        segmento = self._buffer[self._inicio_campo:self._posicion].strip()
+        if not segmento:
+            return []
+        try:
+            return list(json.loads("{" + segmento + "}").items())
+        except json.JSONDecodeError:
+            return []
+
+motor_analisis = MotorAnalisisBatch(
+    procesar_lote=analizar_lote,
+    ventana_ms=settings.analisis_batch_ventana_ms,
+    # generate con modelo asistente solo admite lotes de uno
+    max_tamano_lote=1 if settings.ml_modelo_borrador else settings.analisis_batch_max_tamano,
+)
+
+def contar_tokens(textos: List[str]) -> List[int]:
+    tokenizer, _ = ModelManager().get_model()
+    return [len(ids) for ids in tokenizer(textos, add_special_tokens=False).input_ids]
+
+def analizar_ordenado(transcripciones: List[str], tamano_lote: int) -> List[dict]:
+    """Analiza muchas transcripciones de una vez (reanálisis), en lotes ordenados por longitud.
+
+    Cada transcripción se parte en ventanas como en ``analizar_llamada_local``; todas las
+    ventanas se ordenan por tokens y se agrupan en lotes de ``tamano_lote``, de modo que cada
+    generate junta textos de longitud parecida y apenas hay padding. Un lote que falla deja
+    con error solo a sus transcripciones.
+    """
+    if settings.inferencia_remota:
+        return _analizar_ordenado_remoto(transcripciones)
+
+    ventanas = []  # (tokens, índice de la transcripción, posición de la ventana, texto)
+    fragmentos_por_transcripcion = []
+    for indice, transcripcion in enumerate(transcripciones):
+        fragmentos = dividir_transcripcion(
+            transcripcion,
+            contar_tokens,
+            settings.analisis_presupuesto_tokens,
+            settings.analisis_solapamiento_tokens
+        )
+        if len(fragmentos) == 1:
+            fragmentos = [{"texto": transcripcion, "tokens": fragmentos[0]["tokens"]}]
+        fragmentos_por_transcripcion.append(fragmentos)
+        for posicion, fragmento in enumerate(fragmentos):
+            ventanas.append((fragmento["tokens"], indice, posicion, fragmento["texto"]))
+
+    # De más largas a más cortas: el primer lote es el de más memoria y falla pronto si no cabe
+    ventanas.sort(key=lambda ventana: ventana[0], reverse=True)
+    resultados_ventanas = {}
+    for inicio in range(0, len(ventanas), max(1, tamano_lote)):
+        lote = ventanas[inicio:inicio + max(1, tamano_lote)]
+        try:
+            resultados = analizar_lote([texto for *_, texto in lote])
+        except Exception as e:
+            logging.error(f"Error en lote de reanálisis ({len(lote)} ventanas): {e}")
+            resultados = [{"error": "Error inesperado en el análisis", "exception": str(e)}] * len(lote)
+        for (_, indice, posicion, _), resultado in zip(lote, resultados):
+            resultados_ventanas[indice, posicion] = resultado
+
+    salida = []
+    for indice, fragmentos in enumerate(fragmentos_por_transcripcion):
+        resultados = [resultados_ventanas[indice, posicion] for posicion in range(len(fragmentos))]
+        if len(fragmentos) == 1:
+            salida.append(resultados[0])
+        else:
+            salida.append(combinar_analisis(resultados, [fragmento["tokens"] for fragmento in fragmentos]))
+    return salida
+
+def _analizar_ordenado_remoto(transcripciones: List[str]) -> List[dict]:
+    """Envía el bloque entero al servidor de inferencia antes de esperar ninguna respuesta.
+
+    Los workers forman lotes con lo que hay en la cola compartida; se envían de más larga a
+    más corta (por caracteres: en este proceso no hay tokenizer) para que cada lote junte
+    textos de longitud parecida. Un timeout o un error deja con error solo a esa transcripción.
+    """
+    from APP.Application.InferenciaRemota import obtener_cliente
+
+    cliente = obtener_cliente()
+    orden = sorted(range(len(transcripciones)), key=lambda indice: len(transcripciones[indice]), reverse=True)
+    futuros = {}
+    salida: List[dict] = [None] * len(transcripciones)
+    for indice in orden:
+        try:
+            futuros[indice] = cliente.enviar(transcripciones[indice])
+        except Exception as e:
+            logging.error(f"Error enviando análisis remoto: {e}")
+            salida[indice] = {"error": "Error inesperado en el análisis", "exception": str(e) or type(e).__name__}
+
+    plazo = time.monotonic() + cliente.timeout_segundos
+    for indice, futuro in futuros.items():
+        try:
+            salida[indice] = futuro.result(timeout=max(0.0, plazo - time.monotonic()))
+        except FuturesTimeoutError:
+            cliente.descartar(futuro)
+            salida[indice] = {"error": "Tiempo de espera agotado en el análisis", "exception": "TimeoutError"}
+        except Exception as e:
+            logging.error(f"Error en análisis remoto de llamada: {e}")
+            salida[indice] = {"error": "Error inesperado en el análisis", "exception": str(e) or type(e).__name__}
+    return salida
+
+def analizar_llamada(transcripcion: str) -> dict:
+    """Analiza en este proceso o, con ``inferencia_remota``, en el servidor de inferencia."""
+    if not settings.inferencia_remota:
+        return analizar_llamada_local(transcripcion)
+
+    from APP.Application.InferenciaRemota import obtener_cliente
+    try:
+        return obtener_cliente().analizar(transcripcion)
     except Exception as e:
-        logging.error(f"Error en análisis de llamada: {e}")
+        logging.error(f"Error en análisis remoto de llamada: {e}")
         return {
             "error": "Error inesperado en el análisis",
-            "exception": str(e)
+            "exception": str(e) or type(e).__name__
         }
 
+def analizar_llamada_local(transcripcion: str) -> dict:
+    """Analiza una llamada; si supera el presupuesto de tokens se hace map-reduce por ventanas.
 
+    Las ventanas se encolan a la vez en el motor, así que se generan en el mismo lote.
+    """
+    try:
+        fragmentos = dividir_transcripcion(
+            transcripcion,
+            contar_tokens,
+            settings.analisis_presupuesto_tokens,
+            settings.analisis_solapamiento_tokens
+        )
+        if len(fragmentos) == 1:
+            return motor_analisis.analizar(transcripcion)
 
+        logging.info(
+            f"Transcripción larga dividida en {len(fragmentos)} ventanas "
+            f"({sum(f['tokens'] for f in fragmentos)} tokens)"
+        )
+        futuros = [motor_analisis.enviar(fragmento["texto"]) for fragmento in fragmentos]
+        resultados = [futuro.result() for futuro in futuros]
+        return combinar_analisis(resultados, [fragmento["tokens"] for fragmento in fragmentos])
+    except Exception as e:
+        logging.error(f"Error en análisis de llamada: {e}")
+        return {
+            "error": "Error inesperado en el análisis",
+            "exception": str(e)
+        }
@@ -0,0 +1,56 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+from APP.Infrastructure.database import db_manager
+from APP.Application.Analisis import VERSION_PROMPT
+from APP.Domain.ModelManager import ModelManager
+from config import settings
+
+
+def calcular_clave(transcripcion: str) -> str:
+    """Clave de contenido: hash del texto + modelo y perfil + versión del prompt + parámetros de generación."""
+    hash_texto = hashlib.sha256(transcripcion.encode('utf-8')).hexdigest()
+    decodificacion = "json" if settings.analisis_json_restringido else "libre"
+    ventanas = f"{settings.analisis_presupuesto_tokens}/{settings.analisis_solapamiento_tokens}"
+    componentes = (
+        f"{hash_texto}|{settings.ml_model_name}|{ModelManager.perfil_efectivo()}|{VERSION_PROMPT}|{settings.max_new_tokens}"
+        f"|{decodificacion}|{ventanas}"
+    )
+    return hashlib.sha256(componentes.encode('utf-8')).hexdigest()
+
+
+class CacheAnalisis:
+    """Cache de resultados en dos niveles: LRU en proceso y tabla analisis_llamadas."""
+
+    def __init__(self, max_entradas: int):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, clave: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                return entrada
+
+        entrada = db_manager.buscar_analisis_por_clave(clave)
+        if entrada:
+            logging.info(f"Análisis encontrado en cache persistente: {clave[:12]}")
+            self.guardar(clave, entrada)
+        return entrada
+
+    def guardar(self, clave: str, entrada: Dict[str, Any]):
+        if "error" in entrada.get('resultado', {}):
+            return
+
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+
+cache_analisis = CacheAnalisis(max_entradas=settings.analisis_cache_max_entradas)
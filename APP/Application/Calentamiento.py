@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from APP.Infrastructure.metricas import registro_metricas
+from config import settings
+
+PASOS_CALENTAMIENTO = ["base_de_datos", "modelo", "generacion"]
+
+
+class CalentamientoServicio:
+    """Calienta en segundo plano lo que el primer análisis pagaría en frío.
+
+    Pasos: comprobar el pool de PostgreSQL, cargar el modelo y lanzar un generate corto
+    (kernels, allocator y KV cache del prefijo). Mientras no termine, el servicio no está listo.
+    Un paso que falla (p. ej. PostgreSQL aún no accesible al arrancar el pod) se reintenta con
+    espera exponencial; solo queda en ``error`` al agotar ``calentamiento_reintentos``.
+    """
+
+    def __init__(self, pasos: List[str] = None):
+        self.pasos = pasos or PASOS_CALENTAMIENTO
+        self.estado = "pendiente"
+        self.paso_actual: Optional[str] = None
+        self.completados: List[str] = []
+        self.error: Optional[str] = None
+        self.reintentos = 0
+        self.inicio: Optional[float] = None
+        self.duracion_segundos: Optional[float] = None
+        self.duracion_pasos: Dict[str, float] = {}
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def listo(self) -> bool:
+        return self.estado == "listo"
+
+    def iniciar(self):
+        with self._lock:
+            if self._hilo is not None:
+                return
+            if not settings.calentamiento_al_arrancar:
+                self.estado = "listo"
+                self.duracion_segundos = 0.0
+                return
+            self.estado = "en_curso"
+            self.inicio = time.perf_counter()
+            self._hilo = threading.Thread(target=self._ejecutar, name="calentamiento", daemon=True)
+            self._hilo.start()
+
+    def _ejecutar_paso(self, paso: str):
+        if paso == "base_de_datos":
+            from APP.Infrastructure.database import db_manager
+            db_manager.verificar_conexion()
+        elif paso == "modelo":
+            if not settings.inferencia_remota:
+                from APP.Domain.ModelManager import ModelManager
+                ModelManager().get_model()
+        elif paso == "generacion":
+            if settings.inferencia_remota:
+                from APP.Application.Analisis import analizar_llamada
+                resultado = analizar_llamada("Operador: Buenos días.\nCliente: Hola.")
+                if "error" in resultado:
+                    raise RuntimeError(resultado.get("exception") or resultado["error"])
+            else:
+                from APP.Application.Analisis import calentar_modelo
+                calentar_modelo(settings.calentamiento_tokens)
+
+    def _ejecutar(self):
+        for paso in self.pasos:
+            self.paso_actual = paso
+            inicio_paso = time.perf_counter()
+            fallos = 0
+            while True:
+                try:
+                    self._ejecutar_paso(paso)
+                    break
+                except Exception as e:
+                    fallos += 1
+                    self.error = f"{paso}: {e}"
+                    if settings.calentamiento_reintentos and fallos > settings.calentamiento_reintentos:
+                        logging.error(f"Calentamiento fallido en el paso '{paso}' tras {fallos} intentos: {e}")
+                        self.estado = "error"
+                        return
+                    espera = min(settings.calentamiento_espera_max_segundos, 2.0 ** (fallos - 1))
+                    logging.warning(f"Calentamiento: paso '{paso}' fallido ({e}), reintento en {espera}s")
+                    self.reintentos += 1
+                    time.sleep(espera)
+            self.error = None
+            self.duracion_pasos[paso] = round(time.perf_counter() - inicio_paso, 3)
+            self.completados.append(paso)
+            logging.info(f"Calentamiento: paso '{paso}' completado en {self.duracion_pasos[paso]}s")
+
+        self.paso_actual = None
+        self.duracion_segundos = round(time.perf_counter() - self.inicio, 3)
+        self.estado = "listo"
+        logging.info(f"Calentamiento completado en {self.duracion_segundos}s")
+
+    def progreso(self) -> Dict[str, Any]:
+        en_curso = None
+        if self.estado == "en_curso" and self.inicio is not None:
+            en_curso = round(time.perf_counter() - self.inicio, 3)
+        return {
+            "estado": self.estado,
+            "paso_actual": self.paso_actual,
+            "pasos_completados": len(self.completados),
+            "pasos_totales": len(self.pasos),
+            "progreso": round(len(self.completados) / len(self.pasos), 2),
+            "duracion_segundos": self.duracion_segundos if self.duracion_segundos is not None else en_curso,
+            "duracion_pasos": dict(self.duracion_pasos),
+            "error": self.error,
+            "reintentos": self.reintentos,
+            "timestamp": datetime.now().isoformat(),
+        }
+
+
+calentamiento = CalentamientoServicio()
+
+registro_metricas.gauge(
+    "llamadas_calentamiento_duracion_segundos",
+    "Duración total del calentamiento al arrancar",
+    lambda: calentamiento.duracion_segundos
+)
+registro_metricas.gauge(
+    "llamadas_calentamiento_listo",
+    "1 cuando el calentamiento ha terminado y /ready responde 200",
+    lambda: 1 if calentamiento.listo else 0
+)
@@ -0,0 +1,401 @@
+import re
+from typing import NamedTuple, Optional, List, Dict, Any
+
+ENTERO = "entero"
+TEXTO = "texto"
+
+# Mismo esquema que se pide en el prompt de análisis
+ESQUEMA_ANALISIS = {
+    "regulacion": {"cumplimiento": ENTERO, "comentario": TEXTO},
+    "habilidad_comercial": {"puntuacion": ENTERO, "comentario": TEXTO},
+    "conocimiento_producto": {"puntuacion": ENTERO, "comentario": TEXTO},
+    "cierre_venta": {"puntuacion": ENTERO, "comentario": TEXTO},
+    "puntuacion_general": ENTERO,
+    "aspectos_positivos": [TEXTO],
+    "areas_mejora": [TEXTO],
+    "recomendacion": TEXTO,
+}
+
+# (sección, campo) de cada puntuación 0-10; sección None = primer nivel
+CAMPOS_PUNTUACION = [
+    ("regulacion", "cumplimiento"),
+    ("habilidad_comercial", "puntuacion"),
+    ("conocimiento_producto", "puntuacion"),
+    ("cierre_venta", "puntuacion"),
+    (None, "puntuacion_general"),
+]
+
+MAX_ESPACIOS = 16
+MAX_LONGITUD_TEXTO = 200
+MAX_ELEMENTOS_LISTA = 6
+# Escape de un escalar TEXTO: 0 = ninguno, ESCAPE_BARRA = tras la barra, 1-4 = cifras hex que faltan de \uXXXX
+ESCAPE_BARRA = -1
+
+
+class EstadoJSON(NamedTuple):
+    # Cada marco: (esquema, estado, claves_usadas, clave_actual, elementos)
+    pila: tuple = ()
+    # Escalar en curso: (tipo, contenido, escape)
+    escalar: Optional[tuple] = None
+    iniciado: bool = False
+    terminado: bool = False
+    espacios: int = 0
+
+
+ESTADO_INICIAL = EstadoJSON()
+
+
+def _reemplazar_tope(estado: EstadoJSON, **cambios) -> EstadoJSON:
+    esquema, fase, usadas, clave, elementos = estado.pila[-1]
+    marco = (
+        esquema,
+        cambios.get('fase', fase),
+        cambios.get('usadas', usadas),
+        cambios.get('clave', clave),
+        cambios.get('elementos', elementos),
+    )
+    return estado._replace(pila=estado.pila[:-1] + (marco,))
+
+
+def _cerrar_contenedor(estado: EstadoJSON) -> EstadoJSON:
+    pila = estado.pila[:-1]
+    return estado._replace(pila=pila, terminado=not pila)
+
+
+def _iniciar_valor(estado: EstadoJSON, tipo, caracter: str) -> Optional[EstadoJSON]:
+    # El contenedor padre pasa a 'tras_valor'; el valor hijo se apila o queda como escalar
+    esquema_padre = estado.pila[-1][0]
+    if isinstance(esquema_padre, list):
+        if estado.pila[-1][4] >= MAX_ELEMENTOS_LISTA:
+            return None
+        estado = _reemplazar_tope(estado, fase='tras_valor', elementos=estado.pila[-1][4] + 1)
+    else:
+        estado = _reemplazar_tope(estado, fase='tras_valor')
+
+    if isinstance(tipo, dict) and caracter == '{':
+        return estado._replace(pila=estado.pila + ((tipo, 'clave_o_fin', frozenset(), '', 0),))
+    if isinstance(tipo, list) and caracter == '[':
+        return estado._replace(pila=estado.pila + ((tipo, 'valor_o_fin', frozenset(), '', 0),))
+    if tipo == TEXTO and caracter == '"':
+        return estado._replace(escalar=(TEXTO, 0, 0))
+    if tipo == ENTERO and caracter.isdigit():
+        return estado._replace(escalar=(ENTERO, caracter, False))
+    return None
+
+
+def _avanzar_escalar(estado: EstadoJSON, caracter: str) -> Optional[EstadoJSON]:
+    tipo, contenido, escape = estado.escalar
+
+    if tipo == 'clave':
+        esquema, _, usadas, _, _ = estado.pila[-1]
+        if caracter == '"':
+            if contenido not in esquema or contenido in usadas:
+                return None
+            estado = _reemplazar_tope(estado, fase='dos_puntos', usadas=usadas | {contenido}, clave=contenido)
+            return estado._replace(escalar=None)
+        contenido += caracter
+        if not any(clave.startswith(contenido) for clave in esquema if clave not in usadas):
+            return None
+        return estado._replace(escalar=('clave', contenido, False))
+
+    if tipo == TEXTO:
+        if escape == ESCAPE_BARRA:
+            if caracter == 'u':
+                return estado._replace(escalar=(TEXTO, contenido + 1, 4))
+            return estado._replace(escalar=(TEXTO, contenido + 1, 0)) if caracter in '"\\/bfnrt' else None
+        if escape:
+            return estado._replace(escalar=(TEXTO, contenido, escape - 1)) if caracter in '0123456789abcdefABCDEF' else None
+        if caracter == '"':
+            return estado._replace(escalar=None)
+        if ord(caracter) < 0x20 or contenido >= MAX_LONGITUD_TEXTO:
+            return None
+        if caracter == '\\':
+            return estado._replace(escalar=(TEXTO, contenido, ESCAPE_BARRA))
+        return estado._replace(escalar=(TEXTO, contenido + 1, 0))
+
+    # ENTERO entre 0 y 10: el único número de dos cifras admitido es 10
+    if caracter.isdigit():
+        if contenido == '1' and caracter == '0':
+            return estado._replace(escalar=(ENTERO, '10', False))
+        return None
+    return avanzar(estado._replace(escalar=None), caracter)
+
+
+def avanzar(estado: EstadoJSON, caracter: str) -> Optional[EstadoJSON]:
+    """Consume un carácter; devuelve el nuevo estado o None si el texto deja de ser válido."""
+    if estado.terminado:
+        return estado if caracter.isspace() else None
+    if estado.escalar is not None:
+        return _avanzar_escalar(estado, caracter)
+    if caracter in ' \t\n':
+        return estado._replace(espacios=estado.espacios + 1) if estado.espacios < MAX_ESPACIOS else None
+    estado = estado._replace(espacios=0)
+
+    if not estado.pila:
+        if not estado.iniciado and caracter == '{':
+            return estado._replace(pila=((ESQUEMA_ANALISIS, 'clave_o_fin', frozenset(), '', 0),), iniciado=True)
+        return None
+
+    esquema, fase, usadas, clave, elementos = estado.pila[-1]
+    if isinstance(esquema, dict):
+        completo = len(usadas) == len(esquema)
+        if fase in ('clave_o_fin', 'clave'):
+            if caracter == '"':
+                return estado._replace(escalar=('clave', '', False))
+            if caracter == '}' and fase == 'clave_o_fin' and completo:
+                return _cerrar_contenedor(estado)
+            return None
+        if fase == 'dos_puntos':
+            return _reemplazar_tope(estado, fase='valor') if caracter == ':' else None
+        if fase == 'valor':
+            return _iniciar_valor(estado, esquema[clave], caracter)
+        if caracter == ',' and not completo:
+            return _reemplazar_tope(estado, fase='clave')
+        if caracter == '}' and completo:
+            return _cerrar_contenedor(estado)
+        return None
+
+    if fase == 'valor_o_fin' and caracter == ']':
+        return _cerrar_contenedor(estado)
+    if fase in ('valor_o_fin', 'valor'):
+        return _iniciar_valor(estado, esquema[0], caracter)
+    if caracter == ',' and elementos < MAX_ELEMENTOS_LISTA:
+        return _reemplazar_tope(estado, fase='valor')
+    if caracter == ']':
+        return _cerrar_contenedor(estado)
+    return None
+
+
+def avanzar_texto(estado: EstadoJSON, texto: str) -> Optional[EstadoJSON]:
+    for caracter in texto:
+        estado = avanzar(estado, caracter)
+        if estado is None:
+            return None
+    return estado
+
+
+# id(tokenizer) -> {primer carácter: [ids de tokens cuyo texto empieza por él]}
+_vocabularios: Dict[int, Dict[str, List[int]]] = {}
+
+
+def _vocabulario_por_caracter(tokenizer) -> Dict[str, List[int]]:
+    """Agrupa el vocabulario por el primer carácter que produce cada token (se calcula una vez)."""
+    vocabulario = _vocabularios.get(id(tokenizer))
+    if vocabulario is None:
+        # Se decodifica detrás de un token de referencia para conservar el espacio inicial
+        referencia = tokenizer("a", add_special_tokens=False).input_ids[-1]
+        base = tokenizer.decode([referencia])
+        textos = tokenizer.batch_decode(
+            [[referencia, token] for token in range(len(tokenizer))], skip_special_tokens=True
+        )
+        vocabulario = {}
+        for token, texto in enumerate(textos):
+            texto = texto[len(base):]
+            if texto:
+                vocabulario.setdefault(texto[0], []).append(token)
+        _vocabularios[id(tokenizer)] = vocabulario
+    return vocabulario
+
+
+def reparar_truncado(texto: str) -> Optional[str]:
+    """Cierra un JSON cortado por ``max_new_tokens`` si lo generado es un prefijo válido del esquema."""
+    estado = avanzar_texto(ESTADO_INICIAL, texto)
+    if estado is None or not estado.pila:
+        return None
+
+    cierre = ""
+    if estado.escalar is not None:
+        tipo, _, escape = estado.escalar
+        if tipo == 'clave':
+            cierre = '": null'
+        elif tipo == TEXTO:
+            # Escape a medias: la barra sola se dobla y a \uXX se le añaden ceros
+            if escape == ESCAPE_BARRA:
+                cierre = '\\"'
+            else:
+                cierre = '0' * escape + '"'
+    else:
+        fase = estado.pila[-1][1]
+        es_lista = isinstance(estado.pila[-1][0], list)
+        if (fase == 'clave' and not es_lista) or (fase == 'valor' and es_lista):
+            # Termina en una coma: se quita
+            texto = texto.rstrip()[:-1]
+        elif fase == 'dos_puntos':
+            cierre = ': null'
+        elif fase == 'valor':
+            cierre = ' null'
+
+    for esquema, *_ in reversed(estado.pila):
+        cierre += '}' if isinstance(esquema, dict) else ']'
+    return texto + cierre
+
+
+class ProcesadorJSONRestringido:
+    """Decodificación greedy restringida al esquema de análisis (logits processor de transformers).
+
+    En cada paso elige, entre los ``top_k`` tokens más probables, el primero que mantiene
+    el texto como prefijo válido del JSON esperado; si ninguno vale, busca en todo el
+    vocabulario entre los tokens que empiezan por un carácter admitido. Cuando el objeto
+    de primer nivel se cierra solo se permite EOS, de modo que la generación termina ahí.
+
+    El estado de cada fila se deduce de los tokens ya generados, no del número de llamadas:
+    con decodificación asistida se llama sobre los candidatos del modelo borrador y luego
+    sobre cada posición de la verificación, y parte de esos tokens se descartan.
+    """
+
+    def __init__(self, tokenizer, filas: int, top_k: int = 10, ventana: int = 6):
+        self.tokenizer = tokenizer
+        self.eos_token_id = tokenizer.eos_token_id
+        self.top_k = top_k
+        self.ventana = ventana
+        self.vocabulario = _vocabulario_por_caracter(tokenizer)
+        # Por fila: tokens ya procesados y el estado tras cada uno (historial[k] = estado tras k tokens)
+        self.caminos: List[List[int]] = [[] for _ in range(filas)]
+        self.historiales: List[List[Optional[EstadoJSON]]] = [[ESTADO_INICIAL] for _ in range(filas)]
+        self.longitud_prompt = None
+
+    def _delta(self, generados: List[int], token: int) -> str:
+        previos = generados[-self.ventana:]
+        antes = self.tokenizer.decode(previos, skip_special_tokens=True)
+        despues = self.tokenizer.decode(previos + [token], skip_special_tokens=True)
+        return despues[len(antes):] if despues.startswith(antes) else despues
+
+    def _probar(self, estado: EstadoJSON, generados: List[int], candidatos: List[int]):
+        for token in candidatos:
+            if token == self.eos_token_id:
+                continue
+            delta = self._delta(generados, token)
+            if not delta:
+                continue
+            nuevo = avanzar_texto(estado, delta)
+            if nuevo is not None:
+                return token, nuevo
+        return None, None
+
+    def _elegir(self, estado: EstadoJSON, generados: List[int], puntuaciones):
+        import torch
+        
+        candidatos = torch.topk(puntuaciones, min(self.top_k, puntuaciones.shape[-1])).indices.tolist()
+        token, nuevo = self._probar(estado, generados, candidatos)
+        if token is not None:
+            return token, nuevo
+
+        admitidos = [
+            token
+            for caracter, tokens in self.vocabulario.items()
+            if avanzar(estado, caracter) is not None
+            for token in tokens
+        ]
+        if not admitidos:
+            return None, None
+        indices = torch.tensor(admitidos, device=puntuaciones.device)
+        orden = torch.argsort(puntuaciones[indices], descending=True)
+        return self._probar(estado, generados, indices[orden].tolist())
+
+    def _estado(self, fila: int, generados: List[int]) -> Optional[EstadoJSON]:
+        """Estado tras ``generados``: reutiliza el prefijo común con la llamada anterior y avanza el resto."""
+        camino = self.caminos[fila]
+        historial = self.historiales[fila]
+        comun = 0
+        limite = min(len(camino), len(generados))
+        while comun < limite and camino[comun] == generados[comun]:
+            comun += 1
+        del camino[comun:]
+        del historial[comun + 1:]
+
+        estado = historial[-1]
+        for token in generados[comun:]:
+            if estado is not None and not estado.terminado:
+                # Un token que no mantiene el JSON válido (EOS, candidato descartado) no tiene continuación
+                delta = self._delta(camino, token)
+                estado = avanzar_texto(estado, delta) if delta else None
+            camino.append(token)
+            historial.append(estado)
+        return estado
+
+    def __call__(self, input_ids, scores):
+        import torch
+        
+        if self.longitud_prompt is None:
+            self.longitud_prompt = input_ids.shape[1]
+
+        restringidos = torch.full_like(scores, float('-inf'))
+        for fila in range(scores.shape[0]):
+            generados = input_ids[fila, self.longitud_prompt:].tolist()
+            estado = self._estado(fila, generados)
+            token = None
+            if estado is not None and not estado.terminado:
+                token, nuevo = self._elegir(estado, generados, scores[fila])
+                if token is not None:
+                    # Lo normal es que el siguiente paso llegue con este token: se deja ya calculado
+                    self.caminos[fila].append(token)
+                    self.historiales[fila].append(nuevo)
+
+            if token is None:
+                # JSON cerrado o sin continuación válida: se fuerza EOS
+                restringidos[fila, self.eos_token_id] = 0
+            else:
+                restringidos[fila, token] = scores[fila, token]
+
+        return restringidos
+
+
+def _puntuacion_valida(valor) -> Optional[int]:
+    if isinstance(valor, bool):
+        return None
+    try:
+        numero = float(valor)
+    except (TypeError, ValueError):
+        return None
+    if numero != numero or not 0 <= numero <= 10:
+        return None
+    return int(round(numero))
+
+
+def completar_puntuaciones(resultado: Dict[str, Any], respuesta: str = "") -> Dict[str, Any]:
+    """Normaliza las puntuaciones a enteros 0-10 y rellena las que falten.
+
+    Primero busca el campo en el texto crudo; si no aparece usa la media de las demás
+    puntuaciones. Los campos rellenados se listan en ``puntuaciones_estimadas``.
+    """
+    estimadas = []
+    pendientes = []
+
+    for seccion, campo in CAMPOS_PUNTUACION:
+        if seccion is None:
+            contenedor = resultado
+            texto = respuesta
+        else:
+            if not isinstance(resultado.get(seccion), dict):
+                resultado[seccion] = {}
+            contenedor = resultado[seccion]
+            # Solo se busca en el texto a partir de la sección correspondiente
+            inicio = respuesta.find(f'"{seccion}"')
+            texto = respuesta[inicio:] if inicio != -1 else ""
+
+        valor = _puntuacion_valida(contenedor.get(campo))
+        if valor is None:
+            encontrado = re.search(rf'"{campo}"\s*:\s*"?(\d+(?:\.\d+)?)', texto)
+            valor = _puntuacion_valida(encontrado.group(1)) if encontrado else None
+            estimadas.append(f"{seccion}.{campo}" if seccion else campo)
+            if valor is None:
+                pendientes.append(contenedor)
+                contenedor[campo] = None
+                continue
+        contenedor[campo] = valor
+
+    if pendientes:
+        conocidas = [
+            (resultado if seccion is None else resultado[seccion])[campo]
+            for seccion, campo in CAMPOS_PUNTUACION
+        ]
+        conocidas = [valor for valor in conocidas if valor is not None]
+        media = int(round(sum(conocidas) / len(conocidas))) if conocidas else None
+        for (seccion, campo) in CAMPOS_PUNTUACION:
+            contenedor = resultado if seccion is None else resultado[seccion]
+            if contenedor[campo] is None:
+                contenedor[campo] = media
+
+    if estimadas:
+        resultado['puntuaciones_estimadas'] = estimadas
+    return resultado
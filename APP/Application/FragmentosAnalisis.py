@@ -0,0 +1,139 @@
+import math
+import re
+from typing import Callable, List, Dict, Any
+from APP.Application.DecodificacionJSON import CAMPOS_PUNTUACION
+
+# Corte delante de cada intervención, aunque vengan en la misma línea
+PATRON_TURNO = re.compile(r'(?=\b(?:Operador|Cliente)\s*:)', re.IGNORECASE)
+
+MAX_ELEMENTOS_COMBINADOS = 5
+
+
+def dividir_en_turnos(texto: str) -> List[str]:
+    turnos = [turno.strip() for turno in PATRON_TURNO.split(texto)]
+    return [turno for turno in turnos if turno]
+
+
+def _partir_turno(turno: str, tokens: int, presupuesto: int) -> List[tuple]:
+    # Un turno que no cabe solo en una ventana se reparte por palabras
+    palabras = turno.split()
+    piezas = math.ceil(tokens / presupuesto)
+    por_pieza = math.ceil(len(palabras) / piezas)
+    return [
+        (" ".join(palabras[i:i + por_pieza]), math.ceil(tokens / piezas))
+        for i in range(0, len(palabras), por_pieza)
+    ]
+
+
+def dividir_transcripcion(
+    texto: str,
+    contar_tokens: Callable[[List[str]], List[int]],
+    presupuesto: int,
+    solapamiento: int = 0
+) -> List[Dict[str, Any]]:
+    """Agrupa los turnos en ventanas de como mucho ``presupuesto`` tokens.
+
+    Cada ventana empieza repitiendo los últimos turnos de la anterior hasta ``solapamiento``
+    tokens, para no perder el contexto en el corte. Devuelve el texto y los tokens de cada una.
+    """
+    turnos = dividir_en_turnos(texto)
+    if not turnos:
+        return [{"texto": texto, "tokens": 0}]
+
+    piezas = []
+    for turno, tokens in zip(turnos, contar_tokens(turnos)):
+        if tokens > presupuesto:
+            piezas.extend(_partir_turno(turno, tokens, presupuesto))
+        else:
+            piezas.append((turno, tokens))
+
+    ventanas = []
+    actual = []
+    tokens_actual = 0
+    nuevas = 0
+    for pieza, tokens in piezas:
+        if actual and tokens_actual + tokens > presupuesto:
+            ventanas.append(actual)
+            # Turnos finales que se repiten al principio de la siguiente ventana
+            arrastre = []
+            tokens_arrastre = 0
+            for anterior in reversed(actual):
+                if tokens_arrastre + anterior[1] > solapamiento or tokens_arrastre + anterior[1] + tokens > presupuesto:
+                    break
+                arrastre.insert(0, anterior)
+                tokens_arrastre += anterior[1]
+            actual = arrastre
+            tokens_actual = tokens_arrastre
+            nuevas = 0
+        actual.append((pieza, tokens))
+        tokens_actual += tokens
+        nuevas += 1
+    if nuevas or not ventanas:
+        ventanas.append(actual)
+
+    return [
+        {"texto": "\n".join(pieza for pieza, _ in ventana), "tokens": sum(tokens for _, tokens in ventana)}
+        for ventana in ventanas
+    ]
+
+
+def _unicos(valores: List[Any]) -> List[Any]:
+    vistos = []
+    for valor in valores:
+        if valor and valor not in vistos:
+            vistos.append(valor)
+    return vistos
+
+
+def combinar_analisis(resultados: List[Dict[str, Any]], pesos: List[int]) -> Dict[str, Any]:
+    """Reduce los análisis de cada fragmento al esquema de un único análisis.
+
+    - regulacion: la peor puntuación (un incumplimiento en cualquier tramo cuenta).
+    - cierre_venta y recomendacion: las del último fragmento, donde se cierra la llamada.
+    - resto de puntuaciones: media ponderada por tokens del fragmento.
+    - listas y comentarios: unión sin duplicados.
+    """
+    validos = [(r, p) for r, p in zip(resultados, pesos) if isinstance(r, dict) and "error" not in r]
+    if not validos:
+        return resultados[0] if resultados else {"error": "No hay fragmentos que analizar"}
+
+    combinado: Dict[str, Any] = {}
+    for seccion, campo in CAMPOS_PUNTUACION:
+        valores = []
+        for resultado, peso in validos:
+            contenedor = resultado if seccion is None else resultado.get(seccion)
+            valor = contenedor.get(campo) if isinstance(contenedor, dict) else None
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                valores.append((valor, max(peso, 1), contenedor))
+
+        if not valores:
+            puntuacion, comentarios = None, []
+        elif seccion == "regulacion":
+            puntuacion, _, contenedor = min(valores, key=lambda v: v[0])
+            comentarios = [contenedor.get("comentario")]
+        elif seccion == "cierre_venta":
+            puntuacion, _, contenedor = valores[-1]
+            comentarios = [contenedor.get("comentario")]
+        else:
+            puntuacion = round(sum(v * p for v, p, _ in valores) / sum(p for _, p, _ in valores))
+            comentarios = [contenedor.get("comentario") for _, _, contenedor in valores]
+
+        if seccion is None:
+            combinado[campo] = puntuacion
+        else:
+            combinado[seccion] = {campo: puntuacion, "comentario": " ".join(_unicos(comentarios))}
+
+    for lista in ("aspectos_positivos", "areas_mejora"):
+        elementos = []
+        for resultado, _ in validos:
+            if isinstance(resultado.get(lista), list):
+                elementos.extend(resultado[lista])
+        combinado[lista] = _unicos(elementos)[:MAX_ELEMENTOS_COMBINADOS]
+
+    combinado["recomendacion"] = next(
+        (r.get("recomendacion") for r, _ in reversed(validos) if r.get("recomendacion")), ""
+    )
+    combinado["fragmentos_analizados"] = len(validos)
+    if len(validos) < len(resultados):
+        combinado["fragmentos_con_error"] = len(resultados) - len(validos)
+    return combinado
@@ -0,0 +1,233 @@
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from multiprocessing.managers import BaseManager
+from typing import List, Dict, Any, Optional
+from uuid import uuid4
+from config import settings
+
+# Estado del proceso servidor: una cola de solicitudes compartida y una cola de respuestas por cliente
+_solicitudes: "queue.Queue[tuple]" = queue.Queue()
+_respuestas: Dict[str, "queue.Queue[tuple]"] = {}
+_lock_respuestas = threading.Lock()
+
+
+def _obtener_solicitudes():
+    return _solicitudes
+
+
+def _obtener_respuestas(cliente_id: str):
+    with _lock_respuestas:
+        return _respuestas.setdefault(cliente_id, queue.Queue())
+
+
+class GestorInferencia(BaseManager):
+    """Canal IPC local entre los workers de la API y los procesos que tienen el modelo."""
+
+
+GestorInferencia.register('solicitudes', callable=_obtener_solicitudes)
+GestorInferencia.register('respuestas', callable=_obtener_respuestas)
+
+
+# Valor de ejemplo que tuvo la configuración; se rechaza igual que una clave vacía
+_CLAVES_NO_VALIDAS = {"", "cambiar-en-produccion"}
+
+
+def clave_inferencia() -> bytes:
+    """Authkey del canal IPC. Es obligatoria: multiprocessing.managers deserializa con pickle
+    lo que recibe, así que quien conozca la clave puede ejecutar código en los workers."""
+    clave = settings.inferencia_clave.strip()
+    if clave in _CLAVES_NO_VALIDAS:
+        raise RuntimeError(
+            "APP_INFERENCIA_CLAVE no está configurada: es obligatoria con inferencia remota y en servidor-inferencia "
+            "(por ejemplo: python -c \"import secrets; print(secrets.token_hex(32))\")"
+        )
+    return clave.encode('utf-8')
+
+
+def _conectar(direccion: tuple, clave: bytes, intentos: int = 1) -> GestorInferencia:
+    for intento in range(intentos):
+        gestor = GestorInferencia(address=direccion, authkey=clave)
+        try:
+            gestor.connect()
+            return gestor
+        except (ConnectionRefusedError, FileNotFoundError):
+            if intento == intentos - 1:
+                raise
+            time.sleep(0.5)
+
+
+class ClienteInferencia:
+    """Cliente ligero para los workers de FastAPI: misma interfaz que MotorAnalisisBatch."""
+
+    def __init__(self, direccion: tuple, clave: bytes, timeout_segundos: float):
+        self.direccion = direccion
+        self.clave = clave
+        self.timeout_segundos = timeout_segundos
+        self.cliente_id = uuid4().hex
+        self._pendientes: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._solicitudes = None
+        self._estadisticas = {"enviadas": 0, "completadas": 0, "expiradas": 0}
+
+    def _asegurar_conexion(self):
+        with self._lock:
+            if self._solicitudes is not None:
+                return
+            gestor = _conectar(self.direccion, self.clave)
+            self._solicitudes = gestor.solicitudes()
+            respuestas = gestor.respuestas(self.cliente_id)
+            threading.Thread(
+                target=self._leer_respuestas, args=(respuestas,), name="cliente-inferencia", daemon=True
+            ).start()
+
+    def _leer_respuestas(self, respuestas):
+        while True:
+            try:
+                solicitud_id, resultado = respuestas.get()
+            except (EOFError, ConnectionError) as e:
+                logging.error(f"Conexión con el servidor de inferencia perdida: {e}")
+                with self._lock:
+                    pendientes, self._pendientes = self._pendientes, {}
+                    self._solicitudes = None
+                for futuro in pendientes.values():
+                    futuro.set_exception(ConnectionError("Servidor de inferencia no disponible"))
+                return
+
+            with self._lock:
+                futuro = self._pendientes.pop(solicitud_id, None)
+                self._estadisticas["completadas"] += 1
+            if futuro is not None and not futuro.done():
+                futuro.set_result(resultado)
+
+    def enviar(self, transcripcion: str) -> Future:
+        self._asegurar_conexion()
+        solicitud_id = uuid4().hex
+        futuro: Future = Future()
+        with self._lock:
+            self._pendientes[solicitud_id] = futuro
+            self._estadisticas["enviadas"] += 1
+        # El plazo viaja con la solicitud: los workers descartan las que ya han expirado
+        plazo = time.time() + self.timeout_segundos
+        self._solicitudes.put((solicitud_id, self.cliente_id, transcripcion, plazo))
+        return futuro
+
+    def descartar(self, futuro: Future):
+        """Olvida una solicitud expirada: si la respuesta llega más tarde se ignora."""
+        with self._lock:
+            self._pendientes = {k: v for k, v in self._pendientes.items() if v is not futuro}
+            self._estadisticas["expiradas"] += 1
+
+    def analizar(self, transcripcion: str, timeout: Optional[float] = None) -> dict:
+        futuro = self.enviar(transcripcion)
+        try:
+            return futuro.result(timeout=timeout or self.timeout_segundos)
+        except TimeoutError:
+            self.descartar(futuro)
+            raise
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+            estadisticas["pendientes"] = len(self._pendientes)
+        estadisticas["servidor"] = f"{self.direccion[0]}:{self.direccion[1]}"
+        return estadisticas
+
+
+def _bucle_worker(indice: int, dispositivo: str, direccion: tuple, clave: bytes):
+    from concurrent.futures import ThreadPoolExecutor
+    from APP.Domain.ModelManager import ModelManager
+    from APP.Application.Analisis import analizar_llamada_local
+
+    logging.basicConfig(level=settings.log_level)
+    multiprocessing.current_process().authkey = clave
+    settings.ml_model_device = dispositivo
+    ModelManager()
+    logging.info(f"Worker de inferencia {indice} listo en {dispositivo}")
+
+    gestor = _conectar(direccion, clave, intentos=60)
+    solicitudes = gestor.solicitudes()
+    # Como mucho un lote en vuelo por worker para no acaparar la cola compartida
+    huecos = threading.Semaphore(settings.analisis_batch_max_tamano)
+
+    def atender(solicitud_id: str, cliente_id: str, transcripcion: str):
+        try:
+            resultado = analizar_llamada_local(transcripcion)
+            gestor.respuestas(cliente_id).put((solicitud_id, resultado))
+        except Exception as e:
+            logging.error(f"Worker {indice}: error devolviendo la solicitud {solicitud_id}: {e}")
+        finally:
+            huecos.release()
+
+    with ThreadPoolExecutor(max_workers=settings.analisis_batch_max_tamano) as executor:
+        while True:
+            huecos.acquire()
+            solicitud_id, cliente_id, transcripcion, plazo = solicitudes.get()
+            if time.time() > plazo:
+                logging.warning(f"Worker {indice}: solicitud {solicitud_id} expirada, se descarta")
+                huecos.release()
+                continue
+            executor.submit(atender, solicitud_id, cliente_id, transcripcion)
+
+
+def dispositivos_workers(workers: int, dispositivos: str) -> List[str]:
+    lista = [d.strip() for d in dispositivos.split(',') if d.strip()] or ["cpu"]
+    return [lista[i % len(lista)] for i in range(workers)]
+
+
+def iniciar_servidor(workers: int, dispositivos: str):
+    """Arranca los procesos con el modelo y sirve la cola IPC hasta que se interrumpe.
+
+    Si todos los workers van en CPU el modelo se carga una vez en este proceso y los workers
+    se crean con fork, compartiendo las páginas de los pesos (copy-on-write). Con GPU cada
+    worker carga su copia en su dispositivo, en un proceso nuevo (spawn).
+    """
+    direccion = (settings.inferencia_host, settings.inferencia_puerto)
+    clave = clave_inferencia()
+    asignacion = dispositivos_workers(workers, dispositivos)
+
+    if all(dispositivo == "cpu" for dispositivo in asignacion):
+        from APP.Domain.ModelManager import ModelManager
+        settings.ml_model_device = "cpu"
+        ModelManager()
+        contexto = multiprocessing.get_context("fork")
+    else:
+        contexto = multiprocessing.get_context("spawn")
+
+    procesos = []
+    for indice, dispositivo in enumerate(asignacion):
+        proceso = contexto.Process(
+            target=_bucle_worker,
+            args=(indice, dispositivo, direccion, clave),
+            name=f"inferencia-{indice}",
+            daemon=True
+        )
+        proceso.start()
+        procesos.append(proceso)
+
+    logging.info(f"Servidor de inferencia en {direccion[0]}:{direccion[1]} con {workers} workers: {asignacion}")
+    servidor = GestorInferencia(address=direccion, authkey=clave).get_server()
+    try:
+        servidor.serve_forever()
+    finally:
+        for proceso in procesos:
+            proceso.terminate()
+
+
+_cliente: Optional[ClienteInferencia] = None
+_lock_cliente = threading.Lock()
+
+
+def obtener_cliente() -> ClienteInferencia:
+    global _cliente
+    with _lock_cliente:
+        if _cliente is None:
+            _cliente = ClienteInferencia(
+                (settings.inferencia_host, settings.inferencia_puerto),
+                clave_inferencia(),
+                settings.inferencia_timeout_segundos
+            )
+        return _cliente
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Dict, Any, Optional, Set
+from uuid import uuid4
+from APP.Infrastructure.database import db_manager
+
+
+class ColaLlenaError(Exception):
+    pass
+
+
+class GestorJobsAnalisis:
+    """Pool acotado de workers que drena la tabla analisis_jobs."""
+
+    def __init__(
+        self,
+        procesador: Callable[[str, bool], Dict[str, Any]],
+        num_workers: int,
+        max_cola: int,
+        intervalo_segundos: float,
+        timeout_segundos: float,
+        latido_segundos: float = 30.0,
+    ):
+        self._procesador = procesador
+        self.num_workers = max(1, num_workers)
+        self.max_cola = max_cola
+        self.intervalo_segundos = intervalo_segundos
+        self.timeout_segundos = timeout_segundos
+        self.latido_segundos = latido_segundos
+        self._ultima_recuperacion = 0.0
+        self._en_curso: Set[str] = set()
+        self._lock_en_curso = threading.Lock()
+        self._hilos: List[threading.Thread] = []
+        self._hay_trabajo = threading.Event()
+        self._detener = threading.Event()
+
+    def iniciar(self):
+        if self._hilos:
+            return
+
+        self._recuperar_abandonados()
+        self._detener.clear()
+        for i in range(self.num_workers):
+            hilo = threading.Thread(target=self._bucle, name=f"jobs-analisis-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+        latido = threading.Thread(target=self._bucle_latido, name="jobs-analisis-latido", daemon=True)
+        latido.start()
+        self._hilos.append(latido)
+        logging.info(f"Workers de análisis iniciados: {self.num_workers}")
+
+    def detener(self, timeout: Optional[float] = None):
+        self._detener.set()
+        self._hay_trabajo.set()
+        for hilo in self._hilos:
+            hilo.join(timeout=timeout)
+        self._hilos = []
+
+    def encolar(self, llamada_id: str, force: bool = False) -> Dict[str, Any]:
+        if db_manager.contar_jobs_pendientes() >= self.max_cola:
+            raise ColaLlenaError(f"Cola de análisis llena ({self.max_cola} jobs pendientes)")
+
+        job = db_manager.crear_job_analisis(str(uuid4()), llamada_id, force)
+        self._hay_trabajo.set()
+        return job
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                job = db_manager.tomar_job_analisis()
+            except Exception as e:
+                logging.error(f"Error tomando job de análisis: {e}")
+                job = None
+
+            if job is None:
+                self._recuperar_abandonados()
+                self._hay_trabajo.wait(timeout=self.intervalo_segundos)
+                self._hay_trabajo.clear()
+                continue
+
+            self._ejecutar(job)
+
+    def _bucle_latido(self):
+        """Renueva heartbeat_at de los jobs de este proceso para que no se den por abandonados."""
+        while not self._detener.wait(timeout=self.latido_segundos):
+            with self._lock_en_curso:
+                job_ids = list(self._en_curso)
+            try:
+                db_manager.latido_jobs_analisis(job_ids)
+            except Exception as e:
+                logging.error(f"Error renovando el latido de jobs de análisis: {e}")
+
+    def _recuperar_abandonados(self):
+        """Reencola los jobs cuyo worker murió; como mucho una vez por minuto entre todos los hilos."""
+        ahora = time.monotonic()
+        if ahora - self._ultima_recuperacion < 60:
+            return
+        self._ultima_recuperacion = ahora
+        try:
+            db_manager.recuperar_jobs_analisis(self.timeout_segundos)
+        except Exception as e:
+            logging.error(f"Error recuperando jobs de análisis: {e}")
+
+    def _ejecutar(self, job: Dict[str, Any]):
+        with self._lock_en_curso:
+            self._en_curso.add(job['id'])
+        try:
+            self._procesar(job)
+        finally:
+            with self._lock_en_curso:
+                self._en_curso.discard(job['id'])
+
+    def _procesar(self, job: Dict[str, Any]):
+        try:
+            salida = self._procesador(job['llamada_id'], job['force'])
+            resultado = salida.get('resultado') or {}
+            if "error" in resultado:
+                # analizar_llamada no lanza: los fallos del modelo llegan como {"error": ...}
+                logging.error(f"Error en job de análisis {job['id']}: {resultado['error']}")
+                db_manager.finalizar_job_analisis(
+                    job['id'],
+                    'failed',
+                    analisis_id=salida.get('analisis_id'),
+                    error=str(resultado['error'])
+                )
+                return
+
+            db_manager.finalizar_job_analisis(
+                job['id'],
+                'done',
+                analisis_id=salida.get('analisis_id'),
+                resultado=resultado
+            )
+        except Exception as e:
+            logging.error(f"Error en job de análisis {job['id']}: {e}")
+            db_manager.finalizar_job_analisis(job['id'], 'failed', error=str(e))
@@ -1,13 +1,50 @@
-from fastapi import FastAPI, HTTPException
-from datetime import datetime
+import json
+import logging
+import time
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from datetime import datetime, date
 from uuid import uuid4
 from typing import List, Optional
-from pydantic import BaseModel
-from APP.Infrastructure.database import db_manager
+from pydantic import BaseModel, ValidationError
+from APP.Infrastructure.database import db_manager, fila_busqueda
+from APP.Infrastructure.database_async import db_manager_async
 from APP.Infrastructure.TranscripcionService import TranscripcionService
-from APP.Application.Analisis import analizar_llamada
+from APP.Infrastructure.exportacion import FORMATOS_EXPORTACION, fragmentos_exportacion
+from APP.Infrastructure.metricas import registro_metricas, HTTP_DURACION
+from APP.Application.Analisis import (
+    analizar_llamada, analizar_llamada_stream, extraer_json, motor_analisis, ExtractorCamposJSON,
+    obtener_estadisticas_generacion
+)
+from APP.Application.CacheAnalisis import cache_analisis, calcular_clave
+from APP.Application.JobsAnalisis import GestorJobsAnalisis, ColaLlenaError
+from APP.Application.ReanalisisLote import GestorReanalisis, ReanalisisEnCursoError
+from APP.Application.Calentamiento import calentamiento
+from APP.API.health.health import router as health_router
+from config import settings
 
 app = FastAPI(title="API de Gestión de Llamadas", version="1.0.0")
+app.include_router(health_router)
+
+@app.middleware("http")
+async def medir_peticiones(request: Request, call_next):
+    if not settings.metricas_habilitadas:
+        return await call_next(request)
+    
+    inicio = time.perf_counter()
+    estado = 500
+    try:
+        response = await call_next(request)
+        estado = response.status_code
+        return response
+    finally:
+        # Plantilla de la ruta (/llamadas/{llamada_id}), no la URL, para acotar las series
+        ruta = getattr(request.scope.get("route"), "path", "sin_ruta")
+        HTTP_DURACION.observar(
+            time.perf_counter() - inicio, metodo=request.method, ruta=ruta, estado=str(estado)
+        )
 
 transcripcion_service = TranscripcionService()
 
@@ -30,23 +67,36 @@ class LlamadaResponse(BaseModel):
     transcripcion_archivo: Optional[str] = None
     created_at: Optional[datetime] = None
 
+class ResultadoBusqueda(LlamadaResponse):
+    relevancia: float
+    fragmento: Optional[str] = None
+
+def _datos_llamada(llamada_id: str, llamada: LlamadaCreate) -> dict:
+    return {
+        'id': llamada_id,
+        'customer_name': llamada.customer_name,
+        'operator_name': llamada.operator_name,
+        'start_at': llamada.start_at.isoformat(),
+        'end_at': llamada.end_at.isoformat() if llamada.end_at else None,
+        'palabras_clave': llamada.palabras_clave
+    }
+
+async def _db(metodo: str, *args, **kwargs):
+    """Consulta con asyncpg o, con APP_DATABASE_ASYNC=false, con psycopg2 en el threadpool."""
+    if settings.database_async:
+        return await getattr(db_manager_async, metodo)(*args, **kwargs)
+    return await run_in_threadpool(getattr(db_manager, metodo), *args, **kwargs)
+
 @app.post("/llamadas/", response_model=LlamadaResponse)
-def crear_llamada(llamada: LlamadaCreate):
+async def crear_llamada(llamada: LlamadaCreate):
     try:
         llamada_id = str(uuid4())
         
-        llamada_data = {
-            'id': llamada_id,
-            'customer_name': llamada.customer_name,
-            'operator_name': llamada.operator_name,
-            'start_at': llamada.start_at.isoformat(),
-            'end_at': llamada.end_at.isoformat() if llamada.end_at else None,
-            'palabras_clave': llamada.palabras_clave
-        }
+        llamada_data = _datos_llamada(llamada_id, llamada)
         
         transcripcion_archivo = None
         if llamada.transcripcion:
-            transcripcion_archivo = transcripcion_service.guardar_transcripcion(
+            transcripcion_archivo = await transcripcion_service.guardar_transcripcion_async(
                 llamada_id=llamada_id,
                 transcripcion=llamada.transcripcion,
                 customer_name=llamada.customer_name,
@@ -57,7 +107,15 @@ def crear_llamada(llamada: LlamadaCreate):
             )
             llamada_data['transcripcion_archivo'] = transcripcion_archivo
         
-        db_manager.guardar_llamada(llamada_data)
+        await _db("guardar_llamada", llamada_data)
+        if llamada.transcripcion:
+            try:
+                await _db("indexar_transcripciones", [
+                    fila_busqueda(llamada_id, llamada.transcripcion, llamada.palabras_clave)
+                ])
+            except Exception as e:
+                # La llamada ya está guardada; el índice se puede rehacer con `cli.py indexar-busqueda`
+                logging.warning(f"No se pudo indexar la transcripción {llamada_id} para búsqueda: {e}")
         
         return LlamadaResponse(
             id=llamada_id,
@@ -68,21 +126,268 @@ def crear_llamada(llamada: LlamadaCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error creando llamada: {str(e)}")
 
+def _guardar_lote_llamadas(registros: List[tuple]) -> List[dict]:
+    resultados = {}
+    validas = []
+    
+    for indice, registro in registros:
+        if isinstance(registro, Exception):
+            resultados[indice] = {"indice": indice, "ok": False, "id": None, "error": str(registro)}
+            continue
+        try:
+            llamada = LlamadaCreate(**registro)
+        except (ValidationError, TypeError) as e:
+            resultados[indice] = {"indice": indice, "ok": False, "id": None, "error": str(e)}
+            continue
+        validas.append((indice, str(uuid4()), llamada))
+    
+    con_transcripcion = [(indice, llamada_id, llamada) for indice, llamada_id, llamada in validas if llamada.transcripcion]
+    archivos = transcripcion_service.guardar_transcripciones_lote([
+        {
+            'llamada_id': llamada_id,
+            'transcripcion': llamada.transcripcion,
+            'customer_name': llamada.customer_name,
+            'operator_name': llamada.operator_name,
+            'start_at': llamada.start_at,
+            'end_at': llamada.end_at,
+            'palabras_clave': llamada.palabras_clave
+        }
+        for _, llamada_id, llamada in con_transcripcion
+    ]) if con_transcripcion else []
+    archivo_por_id = {llamada_id: archivo for (_, llamada_id, _), archivo in zip(con_transcripcion, archivos)}
+    
+    llamadas_data = []
+    for indice, llamada_id, llamada in validas:
+        archivo = archivo_por_id.get(llamada_id)
+        if isinstance(archivo, Exception):
+            resultados[indice] = {"indice": indice, "ok": False, "id": llamada_id, "error": f"Error guardando transcripción: {archivo}"}
+            continue
+        llamada_data = _datos_llamada(llamada_id, llamada)
+        llamada_data['transcripcion_archivo'] = archivo
+        llamadas_data.append((indice, llamada_data))
+    
+    errores_db = db_manager.guardar_llamadas_lote([llamada_data for _, llamada_data in llamadas_data]) if llamadas_data else {}
+    
+    for indice, llamada_data in llamadas_data:
+        error = errores_db.get(llamada_data['id'])
+        if error and llamada_data.get('transcripcion_archivo'):
+            transcripcion_service.eliminar_transcripcion(llamada_data['id'])
+        resultados[indice] = {"indice": indice, "ok": error is None, "id": llamada_data['id'], "error": error}
+    
+    try:
+        db_manager.indexar_transcripciones([
+            fila_busqueda(llamada_id, llamada.transcripcion, llamada.palabras_clave)
+            for _, llamada_id, llamada in con_transcripcion
+            if llamada_id in errores_db and errores_db[llamada_id] is None
+        ])
+    except Exception as e:
+        logging.warning(f"No se pudo indexar el lote de transcripciones para búsqueda: {e}")
+    
+    return [resultados[indice] for indice, _ in registros]
+
+async def _leer_registros(request: Request):
+    """Genera (indice, registro) desde un array JSON o un stream NDJSON (una llamada por línea)."""
+    if "ndjson" in request.headers.get("content-type", ""):
+        indice = 0
+        pendiente = b""
+        async for bloque in request.stream():
+            pendiente += bloque
+            *lineas, pendiente = pendiente.split(b"\n")
+            for linea in lineas:
+                if linea.strip():
+                    try:
+                        yield indice, json.loads(linea)
+                    except json.JSONDecodeError as e:
+                        yield indice, ValueError(f"Línea NDJSON inválida: {e}")
+                    indice += 1
+        if pendiente.strip():
+            try:
+                yield indice, json.loads(pendiente)
+            except json.JSONDecodeError as e:
+                yield indice, ValueError(f"Línea NDJSON inválida: {e}")
+        return
+    
+    try:
+        registros = json.loads(await request.body())
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+    if not isinstance(registros, list):
+        raise HTTPException(status_code=400, detail="Se esperaba un array JSON de llamadas")
+    for indice, registro in enumerate(registros):
+        yield indice, registro
+
+@app.post("/llamadas/bulk")
+async def crear_llamadas_bulk(request: Request):
+    resultados = []
+    lote = []
+    
+    async for indice, registro in _leer_registros(request):
+        lote.append((indice, registro))
+        if len(lote) >= settings.bulk_tamano_lote:
+            resultados.extend(await run_in_threadpool(_guardar_lote_llamadas, lote))
+            lote = []
+    if lote:
+        resultados.extend(await run_in_threadpool(_guardar_lote_llamadas, lote))
+    
+    exitosas = sum(1 for resultado in resultados if resultado['ok'])
+    return {
+        "total": len(resultados),
+        "exitosas": exitosas,
+        "fallidas": len(resultados) - exitosas,
+        "resultados": resultados
+    }
+
+# Registrada antes de /llamadas/{llamada_id} para que "search" no se tome como un id
+@app.get("/llamadas/search", response_model=List[ResultadoBusqueda])
+async def buscar_llamadas(
+    response: Response,
+    q: str,
+    limit: int = Query(20, ge=1, le=settings.api_limite_max),
+    cursor: Optional[str] = None
+):
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="La consulta de búsqueda está vacía")
+    
+    try:
+        resultados, siguiente = await _db("buscar_llamadas", q, limit=limit, cursor_pagina=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
+    return [ResultadoBusqueda(**resultado) for resultado in resultados]
+
 @app.get("/llamadas/{llamada_id}", response_model=LlamadaResponse)
-def obtener_llamada(llamada_id: str):
-    llamada = db_manager.obtener_llamada(llamada_id)
+async def obtener_llamada(llamada_id: str):
+    llamada = await _db("obtener_llamada", llamada_id)
     if not llamada:
         raise HTTPException(status_code=404, detail="Llamada no encontrada")
     
     return LlamadaResponse(**llamada)
 
 @app.get("/llamadas/", response_model=List[LlamadaResponse])
-def listar_llamadas(limit: int = 50):
-    llamadas = db_manager.listar_llamadas(limit=limit)
+async def listar_llamadas(
+    response: Response,
+    limit: int = Query(50, ge=1, le=settings.api_limite_max),
+    cursor: Optional[str] = None,
+    operator_name: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    palabra_clave: Optional[str] = None
+):
+    try:
+        llamadas, siguiente = await _db(
+            "listar_llamadas",
+            limit=limit,
+            cursor_pagina=cursor,
+            operator_name=operator_name,
+            customer_name=customer_name,
+            desde=desde,
+            hasta=hasta,
+            palabra_clave=palabra_clave
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # El cursor de la siguiente página va en cabecera para no cambiar el cuerpo de la respuesta
+    if siguiente:
+        response.headers["X-Next-Cursor"] = siguiente
     return [LlamadaResponse(**llamada) for llamada in llamadas]
 
+def _resultado_en_cache(llamada_id: str, clave: str) -> Optional[dict]:
+    en_cache = cache_analisis.obtener(clave)
+    if not en_cache:
+        return None
+    
+    analisis_id = en_cache['id']
+    if en_cache['llamada_id'] != llamada_id:
+        analisis_id = db_manager.guardar_analisis(llamada_id, en_cache['resultado'], clave_cache=clave)
+    
+    return {
+        "analisis_id": analisis_id,
+        "resultado": en_cache['resultado'],
+        "cache": True
+    }
+
+def procesar_analisis(llamada_id: str, force: bool = False) -> dict:
+    transcripcion_data = transcripcion_service.leer_transcripcion_json(llamada_id)
+    if not transcripcion_data:
+        raise ValueError(f"Transcripción no encontrada para llamada {llamada_id}")
+    
+    transcripcion_texto = transcripcion_data['transcripcion']['texto']
+    clave = calcular_clave(transcripcion_texto)
+    
+    if not force:
+        salida = _resultado_en_cache(llamada_id, clave)
+        if salida:
+            return salida
+    
+    resultado_analisis = analizar_llamada(transcripcion_texto)
+    return _guardar_resultado(llamada_id, clave, resultado_analisis)
+
+def _guardar_resultado(llamada_id: str, clave: str, resultado_analisis: dict) -> dict:
+    clave_cache = None if "error" in resultado_analisis else clave
+    analisis_id = db_manager.guardar_analisis(llamada_id, resultado_analisis, clave_cache=clave_cache)
+    if clave_cache:
+        cache_analisis.guardar(clave, {'id': analisis_id, 'llamada_id': llamada_id, 'resultado': resultado_analisis})
+    
+    return {
+        "analisis_id": analisis_id,
+        "resultado": resultado_analisis,
+        "cache": False
+    }
+
+gestor_jobs = GestorJobsAnalisis(
+    procesador=procesar_analisis,
+    num_workers=settings.analisis_jobs_workers,
+    max_cola=settings.analisis_jobs_max_cola,
+    intervalo_segundos=settings.analisis_jobs_intervalo_segundos,
+    timeout_segundos=settings.analisis_jobs_timeout_segundos,
+    latido_segundos=settings.analisis_jobs_latido_segundos
+)
+
+gestor_reanalisis = GestorReanalisis(transcripcion_service)
+
+@app.on_event("startup")
+def comprobar_clave_inferencia():
+    # Sin clave válida la API no arranca, en lugar de fallar en el primer análisis
+    if settings.inferencia_remota:
+        from APP.Application.InferenciaRemota import clave_inferencia
+        clave_inferencia()
+
+@app.on_event("startup")
+def preparar_base_de_datos():
+    if settings.database_migrar_al_arrancar:
+        db_manager.inicializar_esquema()
+
+@app.on_event("startup")
+def preparar_indice_transcripciones():
+    transcripcion_service.preparar_indice()
+
+@app.on_event("startup")
+def iniciar_calentamiento():
+    calentamiento.iniciar()
+
+@app.on_event("startup")
+def iniciar_workers_analisis():
+    gestor_jobs.iniciar()
+
+@app.on_event("shutdown")
+def detener_workers_analisis():
+    gestor_jobs.detener(timeout=5)
+
+@app.on_event("shutdown")
+def detener_reanalisis():
+    # Termina el bloque en curso y guarda el checkpoint; se reanuda con POST /analisis/reanalisis?reanudar=<id>
+    gestor_reanalisis.detener(timeout=30)
+
+@app.on_event("shutdown")
+async def cerrar_pool_async():
+    await db_manager_async.cerrar()
+
 @app.post("/llamadas/{llamada_id}/analizar")
-def analizar_llamada_endpoint(llamada_id: str):
+def analizar_llamada_endpoint(llamada_id: str, force: bool = False):
     try:
 
         llamada = db_manager.obtener_llamada(llamada_id)
@@ -92,46 +397,220 @@ def analizar_llamada_endpoint(llamada_id: str):
         if not llamada.get('transcripcion_archivo'):
             raise HTTPException(status_code=400, detail="La llamada no tiene transcripción")
         
-        transcripcion_data = transcripcion_service.leer_transcripcion_json(llamada_id)
-        if not transcripcion_data:
-            raise HTTPException(status_code=404, detail="Transcripción no encontrada")
-        
-
-        transcripcion_texto = transcripcion_data['transcripcion']['texto']
-        resultado_analisis = analizar_llamada(transcripcion_texto)
+        # Los resultados en cache se devuelven en el acto, sin pasar por la cola
+        if not force:
+            transcripcion_data = transcripcion_service.leer_transcripcion_json(llamada_id)
+            if not transcripcion_data:
+                raise HTTPException(status_code=404, detail="Transcripción no encontrada")
+            
+            clave = calcular_clave(transcripcion_data['transcripcion']['texto'])
+            salida = _resultado_en_cache(llamada_id, clave)
+            if salida:
+                return {
+                    "mensaje": "Análisis completado",
+                    "llamada_id": llamada_id,
+                    **salida
+                }
         
-
-        analisis_id = db_manager.guardar_analisis(llamada_id, resultado_analisis)
+        job = gestor_jobs.encolar(llamada_id, force=force)
         
-        return {
-            "mensaje": "Análisis completado",
-            "analisis_id": analisis_id,
-            "llamada_id": llamada_id,
-            "resultado": resultado_analisis
-        }
+        return JSONResponse(status_code=202, content={
+            "mensaje": "Análisis encolado",
+            "job_id": job['id'],
+            "estado": job['estado'],
+            "llamada_id": llamada_id
+        })
         
     except HTTPException:
         raise
+    except ColaLlenaError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error en análisis: {str(e)}")
 
+def _evento_sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+
+@app.get("/llamadas/{llamada_id}/analizar/stream")
+def analizar_llamada_stream_endpoint(llamada_id: str, force: bool = False):
+    llamada = db_manager.obtener_llamada(llamada_id)
+    if not llamada:
+        raise HTTPException(status_code=404, detail="Llamada no encontrada")
+    
+    if not llamada.get('transcripcion_archivo'):
+        raise HTTPException(status_code=400, detail="La llamada no tiene transcripción")
+    
+    transcripcion_data = transcripcion_service.leer_transcripcion_json(llamada_id)
+    if not transcripcion_data:
+        raise HTTPException(status_code=404, detail="Transcripción no encontrada")
+    
+    transcripcion_texto = transcripcion_data['transcripcion']['texto']
+    clave = calcular_clave(transcripcion_texto)
+    
+    def eventos():
+        try:
+            salida = None if force else _resultado_en_cache(llamada_id, clave)
+            if salida is None and settings.inferencia_remota:
+                # El modelo está en otro proceso: no hay tokens, solo el resultado completo
+                salida = _guardar_resultado(llamada_id, clave, analizar_llamada(transcripcion_texto))
+                for campo, valor in salida['resultado'].items():
+                    yield _evento_sse("campo", {"campo": campo, "valor": valor})
+            elif salida is None:
+                extractor = ExtractorCamposJSON()
+                respuesta = ""
+                for fragmento in analizar_llamada_stream(transcripcion_texto):
+                    respuesta += fragmento
+                    yield _evento_sse("token", {"texto": fragmento})
+                    for campo, valor in extractor.alimentar(fragmento):
+                        yield _evento_sse("campo", {"campo": campo, "valor": valor})
+                
+                salida = _guardar_resultado(llamada_id, clave, extraer_json(respuesta))
+            else:
+                for campo, valor in salida['resultado'].items():
+                    yield _evento_sse("campo", {"campo": campo, "valor": valor})
+            
+            yield _evento_sse("fin", {"llamada_id": llamada_id, **salida})
+        except Exception as e:
+            yield _evento_sse("error", {"detail": f"Error en análisis: {str(e)}"})
+    
+    return StreamingResponse(
+        eventos(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/analisis/jobs/{job_id}")
+async def obtener_job_analisis(job_id: str):
+    job = await _db("obtener_job_analisis", job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job de análisis no encontrado")
+    
+    return job
+
+@app.get("/analisis/jobs")
+async def listar_jobs_analisis(estado: Optional[str] = None, limit: int = Query(50, ge=1, le=settings.api_limite_max)):
+    return await _db("listar_jobs_analisis", estado=estado, limit=limit)
+
+@app.post("/analisis/reanalisis")
+def iniciar_reanalisis(force: bool = False, reanudar: Optional[str] = None):
+    try:
+        reanalisis = gestor_reanalisis.iniciar(force=force, reanudar=reanudar)
+    except ReanalisisEnCursoError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return JSONResponse(status_code=202, content={
+        "mensaje": "Reanálisis reanudado" if reanudar else "Reanálisis iniciado",
+        "reanalisis_id": reanalisis['id'],
+        "estado": reanalisis['estado'],
+        "total": reanalisis['total'],
+        "procesadas": reanalisis['procesadas']
+    })
+
+@app.get("/analisis/reanalisis")
+def listar_reanalisis(limit: int = Query(50, ge=1, le=settings.api_limite_max)):
+    return db_manager.listar_reanalisis(limit=limit)
+
+@app.get("/analisis/reanalisis/{reanalisis_id}")
+def obtener_reanalisis(reanalisis_id: str):
+    reanalisis = db_manager.obtener_reanalisis(reanalisis_id)
+    if not reanalisis:
+        raise HTTPException(status_code=404, detail="Reanálisis no encontrado")
+    
+    # Velocidad y ETA solo si se está ejecutando en este proceso
+    reanalisis["progreso"] = gestor_reanalisis.progreso(reanalisis_id)
+    return reanalisis
+
+@app.post("/analisis/reanalisis/{reanalisis_id}/detener")
+def detener_reanalisis_endpoint(reanalisis_id: str):
+    if gestor_reanalisis.progreso(reanalisis_id) is None:
+        raise HTTPException(status_code=404, detail="Este reanálisis no está en curso en este proceso")
+    
+    gestor_reanalisis.detener()
+    return db_manager.obtener_reanalisis(reanalisis_id)
+
+@app.get("/analisis/motor/estadisticas")
+def obtener_estadisticas_motor():
+    if settings.inferencia_remota:
+        from APP.Application.InferenciaRemota import obtener_cliente
+        return {"inferencia_remota": obtener_cliente().obtener_estadisticas()}
+    estadisticas = motor_analisis.obtener_estadisticas()
+    estadisticas["generacion"] = obtener_estadisticas_generacion()
+    return estadisticas
+
 @app.get("/llamadas/{llamada_id}/analisis")
-def obtener_analisis(llamada_id: str):
-    analisis = db_manager.obtener_analisis(llamada_id)
+async def obtener_analisis(llamada_id: str):
+    analisis = await _db("obtener_analisis", llamada_id)
     if not analisis:
         raise HTTPException(status_code=404, detail="No se encontró análisis para esta llamada")
     
     return analisis
 
 @app.get("/operadores/{operator_name}/estadisticas")
-def obtener_estadisticas_operador(operator_name: str):
-    estadisticas = db_manager.obtener_estadisticas_operador(operator_name)
+async def obtener_estadisticas_operador(
+    operator_name: str,
+    agrupacion: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+):
+    estadisticas = await _db("obtener_estadisticas_operador", operator_name)
     if not estadisticas.get('total_llamadas'):
         raise HTTPException(status_code=404, detail="No se encontraron datos para este operador")
     
+    if agrupacion:
+        try:
+            estadisticas['series'] = await _db(
+                "obtener_estadisticas_operador_por_periodo", operator_name, agrupacion, desde=desde, hasta=hasta
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
     return estadisticas
 
-# Health check
-@app.get("/health")
-def health_check():
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
\ No newline at end of file
+@app.get("/export/llamadas")
+def exportar_llamadas(
+    formato: str = "csv",
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    operator_name: Optional[str] = None
+):
+    """Todas las llamadas (filtradas por start_at y operador) con su último análisis, en streaming."""
+    if formato not in FORMATOS_EXPORTACION:
+        raise HTTPException(status_code=400, detail=f"Formato no soportado: {formato} (csv o ndjson)")
+    media_type, extension = FORMATOS_EXPORTACION[formato]
+    
+    bloques = db_manager.iterar_exportacion(
+        desde=desde, hasta=hasta, operator_name=operator_name, tamano=settings.exportacion_tamano_bloque
+    )
+    # El primer bloque se pide antes de responder: un fallo de la consulta aún puede ser un 500
+    try:
+        primero = next(bloques, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error exportando llamadas: {str(e)}")
+    
+    def todos():
+        if primero is not None:
+            yield primero
+        yield from bloques
+    
+    # Al cortar el cliente la descarga, Starlette cancela el envío sin cerrar el generador:
+    # la tarea de fondo (que se ejecuta también en ese caso) cierra el cursor y devuelve la conexión al pool
+    return StreamingResponse(
+        fragmentos_exportacion(formato, todos()),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="llamadas.{extension}"'},
+        background=BackgroundTask(bloques.close)
+    )
+
+@app.get("/metrics")
+def exportar_metricas():
+    if not settings.metricas_habilitadas:
+        raise HTTPException(status_code=404, detail="Métricas desactivadas")
+    return PlainTextResponse(registro_metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+@app.get("/db/pool")
+def obtener_estadisticas_pool():
+    return {**db_manager.estadisticas_pool(), "async": db_manager_async.estadisticas_pool()}
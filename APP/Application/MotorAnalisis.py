@@ -0,0 +1,110 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Dict, Any, Optional
+
+
+class MotorAnalisisBatch:
+    """Agrupa solicitudes de análisis concurrentes en lotes para un solo generate."""
+
+    def __init__(
+        self,
+        procesar_lote: Callable[[List[str]], List[dict]],
+        ventana_ms: int,
+        max_tamano_lote: int,
+    ):
+        self._procesar_lote = procesar_lote
+        self.ventana_segundos = ventana_ms / 1000
+        self.max_tamano_lote = max(1, max_tamano_lote)
+        self._cola: "queue.Queue[tuple]" = queue.Queue()
+        self._hilo: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._estadisticas = {
+            "lotes_procesados": 0,
+            "transcripciones_procesadas": 0,
+            "ultimo_tamano_lote": 0,
+            "ultima_latencia_segundos": None,
+            "latencia_total_segundos": 0.0,
+        }
+
+    def enviar(self, transcripcion: str) -> Future:
+        """Encola sin esperar; varias llamadas seguidas acaban en el mismo lote."""
+        futuro: Future = Future()
+        self._asegurar_hilo()
+        self._cola.put((transcripcion, futuro))
+        return futuro
+
+    def analizar(self, transcripcion: str, timeout: Optional[float] = None) -> dict:
+        return self.enviar(transcripcion).result(timeout=timeout)
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(
+                    target=self._bucle, name="motor-analisis", daemon=True
+                )
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.ventana_segundos
+
+            while len(lote) < self.max_tamano_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+
+            self._ejecutar(lote)
+
+    def _ejecutar(self, lote: List[tuple]):
+        inicio = time.perf_counter()
+        try:
+            resultados = self._procesar_lote([transcripcion for transcripcion, _ in lote])
+        except Exception as e:
+            logging.error(f"Error procesando lote de {len(lote)} análisis: {e}")
+            for _, futuro in lote:
+                futuro.set_exception(e)
+            return
+
+        if len(resultados) != len(lote):
+            # Los resultados van por posición: si falta alguno no se sabe a qué análisis corresponde cada uno
+            error = RuntimeError(f"El lote devolvió {len(resultados)} resultados para {len(lote)} transcripciones")
+            logging.error(str(error))
+            for _, futuro in lote:
+                futuro.set_exception(error)
+            return
+
+        latencia = time.perf_counter() - inicio
+        for (_, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+        with self._lock:
+            self._estadisticas["lotes_procesados"] += 1
+            self._estadisticas["transcripciones_procesadas"] += len(lote)
+            self._estadisticas["ultimo_tamano_lote"] = len(lote)
+            self._estadisticas["ultima_latencia_segundos"] = round(latencia, 4)
+            self._estadisticas["latencia_total_segundos"] += latencia
+
+        logging.info(f"Lote de análisis procesado: tamaño={len(lote)} latencia={latencia:.2f}s")
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            estadisticas = dict(self._estadisticas)
+
+        lotes = estadisticas["lotes_procesados"]
+        estadisticas["tamano_promedio_lote"] = (
+            round(estadisticas["transcripciones_procesadas"] / lotes, 2) if lotes else None
+        )
+        estadisticas["latencia_promedio_segundos"] = (
+            round(estadisticas["latencia_total_segundos"] / lotes, 4) if lotes else None
+        )
+        estadisticas["latencia_total_segundos"] = round(estadisticas["latencia_total_segundos"], 4)
+        estadisticas["pendientes"] = self._cola.qsize()
+        return estadisticas
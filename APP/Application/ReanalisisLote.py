@@ -0,0 +1,205 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+from uuid import uuid4
+from APP.Infrastructure.database import db_manager, fila_analisis
+from APP.Infrastructure.TranscripcionService import TranscripcionService
+from APP.Application.Analisis import analizar_ordenado, obtener_estadisticas_generacion
+from APP.Application.CacheAnalisis import calcular_clave
+from config import settings
+
+_FIN = object()
+
+
+class ReanalisisEnCursoError(Exception):
+    pass
+
+
+class GestorReanalisis:
+    """Reanaliza las llamadas históricas tras cambiar de modelo o de prompt.
+
+    Tubería por bloques de ``reanalisis_bloque`` llamadas:
+
+    - los ids salen en orden de un cursor en el servidor (``iterar_ids_reanalisis``);
+    - un hilo lee por adelantado las transcripciones de los siguientes bloques;
+    - cada bloque se analiza en lotes ordenados por longitud (``analizar_ordenado``);
+    - los análisis se insertan de una vez junto con el checkpoint (último id del bloque).
+
+    Sin ``force`` se omiten las llamadas que ya tienen un análisis con la clave de cache
+    actual (mismo texto, modelo, prompt y parámetros). Un reanálisis interrumpido se
+    reanuda con su id; solo se ejecuta uno a la vez por proceso.
+    """
+
+    def __init__(self, transcripcion_service: TranscripcionService):
+        self.transcripcion_service = transcripcion_service
+        self._hilo: Optional[threading.Thread] = None
+        self._detener = threading.Event()
+        self._lock = threading.Lock()
+        self._progreso: Dict[str, Any] = {}
+
+    @property
+    def en_curso(self) -> bool:
+        return self._hilo is not None and self._hilo.is_alive()
+
+    def preparar(self, force: bool = False, reanudar: Optional[str] = None) -> Dict[str, Any]:
+        """Crea el reanálisis (o reanuda uno sin terminar) y devuelve su fila."""
+        if reanudar:
+            existente = db_manager.obtener_reanalisis(reanudar)
+            if not existente:
+                raise LookupError(f"Reanálisis no encontrado: {reanudar}")
+            restantes = db_manager.contar_llamadas_reanalisis(existente['ultimo_id'])
+            reanalisis = db_manager.reanudar_reanalisis(reanudar, restantes)
+            if not reanalisis:
+                raise ValueError(f"El reanálisis {reanudar} ya terminó")
+            logging.info(f"Reanálisis {reanudar} reanudado tras {reanalisis['ultimo_id']} ({restantes} pendientes)")
+            return reanalisis
+
+        total = db_manager.contar_llamadas_reanalisis()
+        return db_manager.crear_reanalisis(str(uuid4()), total, force)
+
+    def iniciar(self, force: bool = False, reanudar: Optional[str] = None) -> Dict[str, Any]:
+        """Lanza el reanálisis en segundo plano (API)."""
+        with self._lock:
+            if self.en_curso:
+                raise ReanalisisEnCursoError(f"Ya hay un reanálisis en curso: {self._progreso.get('id')}")
+            reanalisis = self.preparar(force, reanudar)
+            self._detener.clear()
+            self._hilo = threading.Thread(
+                target=self.ejecutar, args=(reanalisis,), name="reanalisis", daemon=True
+            )
+            self._hilo.start()
+            return reanalisis
+
+    def detener(self, timeout: Optional[float] = None) -> bool:
+        """Pide parar al terminar el bloque en curso; el reanálisis queda reanudable."""
+        if not self.en_curso:
+            return False
+        self._detener.set()
+        self._hilo.join(timeout=timeout)
+        return True
+
+    def progreso(self, reanalisis_id: str) -> Optional[Dict[str, Any]]:
+        """Velocidad y ETA del reanálisis en curso en este proceso (None si no es el activo)."""
+        progreso = dict(self._progreso)
+        if progreso.get('id') != reanalisis_id or not self.en_curso:
+            return None
+        progreso.pop('inicio', None)
+        return progreso
+
+    def ejecutar(self, reanalisis: Dict[str, Any]) -> Dict[str, Any]:
+        """Procesa el reanálisis hasta el final (o hasta ``detener``) en el hilo actual (CLI)."""
+        reanalisis_id = reanalisis['id']
+        self._progreso = {
+            'id': reanalisis_id,
+            'total': reanalisis['total'],
+            'procesadas': reanalisis['procesadas'],
+            'procesadas_sesion': 0,
+            'tokens_sesion': 0,
+            'inicio': time.perf_counter(),
+        }
+        tokens_inicio = obtener_estadisticas_generacion()["tokens_generados"]
+        bloques: "queue.Queue" = queue.Queue(maxsize=max(1, settings.reanalisis_prefetch_bloques))
+        lector = threading.Thread(
+            target=self._leer_bloques, args=(reanalisis['ultimo_id'], bloques), name="reanalisis-lectura", daemon=True
+        )
+        lector.start()
+
+        estado, error = 'done', None
+        try:
+            while True:
+                bloque = bloques.get()
+                if bloque is _FIN:
+                    if self._detener.is_set():
+                        estado = 'stopped'
+                    break
+                if isinstance(bloque, Exception):
+                    raise bloque
+                self._procesar_bloque(reanalisis_id, reanalisis['force'], bloque)
+                self._progreso['tokens_sesion'] = obtener_estadisticas_generacion()["tokens_generados"] - tokens_inicio
+                self._registrar_progreso()
+                if self._detener.is_set():
+                    estado = 'stopped'
+                    break
+        except KeyboardInterrupt:
+            estado = 'stopped'
+            raise
+        except Exception as e:
+            logging.error(f"Error en reanálisis {reanalisis_id}: {e}")
+            estado, error = 'failed', str(e)
+        finally:
+            self._detener.set()
+            # Libera al lector si está bloqueado en una cola llena
+            while lector.is_alive():
+                try:
+                    bloques.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            db_manager.finalizar_reanalisis(reanalisis_id, estado, error)
+
+        return db_manager.obtener_reanalisis(reanalisis_id)
+
+    def _leer_bloques(self, desde_id: Optional[str], bloques: "queue.Queue"):
+        ids_bloques = db_manager.iterar_ids_reanalisis(desde_id, settings.reanalisis_bloque)
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, settings.reanalisis_hilos_lectura)) as lectura:
+                for ids in ids_bloques:
+                    if self._detener.is_set():
+                        break
+                    datos = lectura.map(self.transcripcion_service.leer_transcripcion_json, ids)
+                    bloques.put([
+                        (llamada_id, (data or {}).get('transcripcion', {}).get('texto'))
+                        for llamada_id, data in zip(ids, datos)
+                    ])
+            bloques.put(_FIN)
+        except Exception as e:
+            bloques.put(e)
+        finally:
+            # Cierra el cursor con nombre y devuelve su conexión al pool
+            ids_bloques.close()
+
+    def _procesar_bloque(self, reanalisis_id: str, force: bool, bloque: List[tuple]):
+        contadores = {'procesadas': len(bloque), 'analizadas': 0, 'omitidas': 0, 'fallidas': 0}
+        pendientes = [
+            (llamada_id, texto, calcular_clave(texto)) for llamada_id, texto in bloque if texto
+        ]
+        contadores['fallidas'] += len(bloque) - len(pendientes)
+
+        if not force:
+            vigentes = db_manager.analisis_vigentes([(llamada_id, clave) for llamada_id, _, clave in pendientes])
+            contadores['omitidas'] = len(vigentes)
+            pendientes = [pendiente for pendiente in pendientes if (pendiente[0], pendiente[2]) not in vigentes]
+
+        filas = []
+        resultados = analizar_ordenado([texto for _, texto, _ in pendientes], settings.analisis_batch_max_tamano)
+        for (llamada_id, _, clave), resultado in zip(pendientes, resultados):
+            if "error" in resultado:
+                contadores['fallidas'] += 1
+                filas.append(fila_analisis(llamada_id, resultado))
+            else:
+                contadores['analizadas'] += 1
+                filas.append(fila_analisis(llamada_id, resultado, clave_cache=clave))
+
+        db_manager.guardar_bloque_reanalisis(reanalisis_id, filas, bloque[-1][0], contadores)
+        self._progreso['procesadas'] += len(bloque)
+        self._progreso['procesadas_sesion'] += len(bloque)
+
+    def _registrar_progreso(self):
+        progreso = self._progreso
+        segundos = time.perf_counter() - progreso['inicio']
+        por_segundo = progreso['procesadas_sesion'] / segundos if segundos > 0 else 0.0
+        restantes = max(0, progreso['total'] - progreso['procesadas'])
+        progreso.update({
+            'segundos': round(segundos, 1),
+            'llamadas_por_segundo': round(por_segundo, 3),
+            'tokens_por_segundo': round(progreso['tokens_sesion'] / segundos, 1) if segundos > 0 else 0.0,
+            'eta_segundos': round(restantes / por_segundo) if por_segundo else None,
+        })
+        logging.info(
+            f"Reanálisis {progreso['id']}: {progreso['procesadas']}/{progreso['total']} llamadas, "
+            f"{progreso['llamadas_por_segundo']} llamadas/s, {progreso['tokens_por_segundo']} tokens/s, "
+            f"ETA {progreso['eta_segundos']} s"
+        )
+
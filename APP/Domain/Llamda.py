@@ -37,19 +37,14 @@ class Llamda(BaseModel):
             from APP.Infrastructure.TranscripcionService import TranscripcionService
             servicio_transcripcion = TranscripcionService()
         
-        metadata = {
-            "customer_name": self.customer_name,
-            "operator_name": self.operator_name,
-            "start_at": self.start_at.isoformat(),
-            "end_at": self.end_at.isoformat() if self.end_at else None,
-            "duration_hours": self.duration(),
-            "palabras_clave": self.palabras_clave
-        }
-        
-        return servicio_transcripcion.guardar_transcripcion_json(
-            str(self.id), 
-            self.transcripcion, 
-            metadata
+        return servicio_transcripcion.guardar_transcripcion(
+            str(self.id),
+            self.transcripcion,
+            customer_name=self.customer_name,
+            operator_name=self.operator_name,
+            start_at=self.start_at,
+            end_at=self.end_at,
+            palabras_clave=self.palabras_clave
         )
     
     def cargar_transcripcion(self, servicio_transcripcion=None) -> bool:
@@ -60,7 +55,7 @@ class Llamda(BaseModel):
         data = servicio_transcripcion.leer_transcripcion_json(str(self.id))
         
         if data:
-            self.transcripcion = data["transcripcion"]
+            self.transcripcion = data["transcripcion"]["texto"]
             return True
         
         return False
@@ -1,44 +1,196 @@
+import threading
+
+
 class ModelManager:
     _instance = None
     _model= None
     _tokenizer=None
+    _borrador = None
+    _tokenizer_borrador = None
+    _prefijos = {}
+    estadisticas_carga = {}
+    # El calentamiento, los workers de jobs y las peticiones pueden pedir el modelo a la vez:
+    # sin el lock cada uno haría su propio from_pretrained
+    _lock_carga = threading.RLock()
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(ModelManager, cls).__new__(cls)
-            cls._instance._load_model()
+            with cls._lock_carga:
+                if cls._instance is None:
+                    instancia = super(ModelManager, cls).__new__(cls)
+                    instancia._load_model()
+                    # Se publica ya cargada: nadie ve una instancia a medio cargar
+                    cls._instance = instancia
         return cls._instance
     
     def get_model(self):
         if self._model is None or self._tokenizer is None:
-            self._load_model()
+            with self._lock_carga:
+                if self._model is None or self._tokenizer is None:
+                    self._load_model()
         return self._tokenizer, self._model
     
+    def get_borrador(self):
+        """Modelo borrador de la decodificación asistida y su tokenizer, o (None, None) si está desactivada.
+
+        El tokenizer solo se devuelve si su vocabulario difiere del principal; en ese caso
+        generate traduce los candidatos entre vocabularios (decodificación asistida universal).
+        """
+        self.get_model()
+        return self._tokenizer_borrador, self._borrador
+    
+    @classmethod
+    def perfil_efectivo(cls) -> str:
+        """Perfil con el que se carga (o se cargó) el modelo, sin necesidad de cargarlo.
+
+        Forma parte de la clave de cache: int8 y 4bit cambian las puntuaciones.
+        """
+        import importlib.util
+        from config import settings
+        
+        if cls._instance is not None and cls._instance.estadisticas_carga.get("perfil"):
+            return cls._instance.estadisticas_carga["perfil"]
+        if settings.ml_model_perfil == "4bit" and importlib.util.find_spec("bitsandbytes") is None:
+            return "int8"
+        return settings.ml_model_perfil
+    
+    def get_prefijo_cache(self, prefijo: str):
+        """Devuelve los ids y el KV cache del prefijo fijo del prompt, calculados una sola vez por modelo."""
+        import torch
+        
+        if prefijo not in self._prefijos:
+            with self._lock_carga:
+                if prefijo not in self._prefijos:
+                    tokenizer, model = self.get_model()
+                    prefijo_ids = tokenizer(prefijo, return_tensors="pt").input_ids.to(model.device)
+                    with torch.no_grad():
+                        salida = model(input_ids=prefijo_ids, use_cache=True)
+                    self._prefijos[prefijo] = (prefijo_ids, salida.past_key_values)
+        return self._prefijos[prefijo]
+    
+    def _configurar_hilos(self):
+        import torch
+        import logging
+        from config import settings
+        
+        if settings.ml_torch_hilos > 0:
+            torch.set_num_threads(settings.ml_torch_hilos)
+        if settings.ml_torch_hilos_interop > 0:
+            try:
+                torch.set_num_interop_threads(settings.ml_torch_hilos_interop)
+            except RuntimeError as e:
+                # Solo se puede fijar antes del primer trabajo en paralelo del proceso
+                logging.warning(f"No se pudieron fijar los hilos interop: {e}")
+    
+    def _argumentos_carga(self, perfil: str):
+        """Devuelve el perfil efectivo y los argumentos de from_pretrained para ese perfil."""
+        import torch
+        import logging
+        from config import settings
+        
+        dtype_mapping = {
+            "float16": torch.float16,
+            "float32": torch.float32,
+            "bfloat16": torch.bfloat16
+        }
+        
+        if perfil == "4bit":
+            try:
+                import bitsandbytes  # noqa: F401
+                from transformers import BitsAndBytesConfig
+            except ImportError:
+                logging.warning("bitsandbytes no está instalado, se usa el perfil int8")
+                return self._argumentos_carga("int8")
+            return perfil, {
+                "quantization_config": BitsAndBytesConfig(
+                    load_in_4bit=True,
+                    bnb_4bit_quant_type="nf4",
+                    bnb_4bit_compute_dtype=dtype_mapping.get(settings.ml_model_dtype, torch.bfloat16)
+                ),
+                "device_map": settings.ml_model_device
+            }
+        
+        if perfil == "int8":
+            # La cuantización dinámica parte de pesos float32 y solo corre en CPU
+            return perfil, {"torch_dtype": torch.float32, "device_map": "cpu"}
+        
+        if perfil != "estandar":
+            raise ValueError(f"Perfil de modelo no soportado: {perfil}")
+        return perfil, {
+            "torch_dtype": dtype_mapping.get(settings.ml_model_dtype, torch.float16),
+            "device_map": settings.ml_model_device
+        }
+    
     def _load_model(self):
         from transformers import AutoModelForCausalLM, AutoTokenizer
+        import time
         import torch
         import logging
         from config import settings
         
         try:
-            logging.info(f"Cargando modelo: {settings.ml_model_name}")
+            perfil = settings.ml_model_perfil
+            logging.info(f"Cargando modelo: {settings.ml_model_name} (perfil {perfil})")
+            inicio = time.perf_counter()
+            self._configurar_hilos()
             
             self._tokenizer = AutoTokenizer.from_pretrained(settings.ml_model_name)
+            # Padding a la izquierda para poder generar en lote con modelos decoder-only
+            self._tokenizer.padding_side = "left"
+            if self._tokenizer.pad_token is None:
+                self._tokenizer.pad_token = self._tokenizer.eos_token
             
-            dtype_mapping = {
-                "float16": torch.float16,
-                "float32": torch.float32,
-                "bfloat16": torch.bfloat16
-            }
+            perfil, argumentos = self._argumentos_carga(perfil)
+            self._model = AutoModelForCausalLM.from_pretrained(settings.ml_model_name, **argumentos)
             
-            self._model = AutoModelForCausalLM.from_pretrained(
-                settings.ml_model_name,
-                torch_dtype=dtype_mapping.get(settings.ml_model_dtype, torch.float16),
-                device_map=settings.ml_model_device
-            )
+            if perfil == "int8":
+                self._model = torch.ao.quantization.quantize_dynamic(
+                    self._model, {torch.nn.Linear}, dtype=torch.qint8
+                )
             
-            logging.info("Modelo cargado exitosamente!")
+            if settings.ml_model_compilar:
+                # Se compila solo forward para que generate siga disponible
+                self._model.forward = torch.compile(self._model.forward, dynamic=True)
+            
+            self._model.eval()
+            self._prefijos = {}
+            self._cargar_borrador(perfil, argumentos)
+            self.estadisticas_carga = {
+                "perfil": perfil,
+                "compilado": settings.ml_model_compilar,
+                "hilos": torch.get_num_threads(),
+                "hilos_interop": torch.get_num_interop_threads(),
+                "borrador": settings.ml_modelo_borrador or None,
+                "borrador_mismo_vocabulario": self._tokenizer_borrador is None if self._borrador is not None else None,
+                "segundos_carga": round(time.perf_counter() - inicio, 2)
+            }
+            logging.info(f"Modelo cargado exitosamente! {self.estadisticas_carga}")
             
         except Exception as e:
             logging.error(f"Error cargando modelo: {e}")
             raise RuntimeError(f"No se pudo cargar el modelo: {e}")
-        
\ No newline at end of file
+    
+    def _cargar_borrador(self, perfil: str, argumentos: dict):
+        """Carga el modelo borrador con el mismo perfil, dtype y dispositivo que el principal."""
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        import torch
+        import logging
+        from config import settings
+        
+        self._borrador = None
+        self._tokenizer_borrador = None
+        if not settings.ml_modelo_borrador:
+            return
+        
+        logging.info(f"Cargando modelo borrador: {settings.ml_modelo_borrador}")
+        tokenizer = AutoTokenizer.from_pretrained(settings.ml_modelo_borrador)
+        borrador = AutoModelForCausalLM.from_pretrained(settings.ml_modelo_borrador, **argumentos)
+        if perfil == "int8":
+            borrador = torch.ao.quantization.quantize_dynamic(borrador, {torch.nn.Linear}, dtype=torch.qint8)
+        borrador.eval()
+        # generate lee del borrador cuántos candidatos proponer en cada paso
+        borrador.generation_config.num_assistant_tokens = settings.ml_borrador_tokens
+        
+        if tokenizer.get_vocab() != self._tokenizer.get_vocab():
+            logging.warning("El borrador usa otro vocabulario: se traducirán sus candidatos (más lento)")
+            self._tokenizer_borrador = tokenizer
+        self._borrador = borrador
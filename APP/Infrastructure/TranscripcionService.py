@@ -1,36 +1,101 @@
+import asyncio
+import logging
 import os
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 import json
+from concurrent.futures import ThreadPoolExecutor
 from uuid import UUID
+from APP.Infrastructure.almacenamiento_transcripciones import AlmacenamientoTranscripciones, crear_almacenamiento
+from APP.Infrastructure.indice_transcripciones import IndiceTranscripciones
+from APP.Infrastructure.metricas import TRANSCRIPCION_DURACION
+from config import settings
 
 class TranscripcionService:
     
-    def __init__(self, base_path: str = "transcripciones"):
+    def __init__(self, base_path: str = "transcripciones", almacenamiento: AlmacenamientoTranscripciones = None):
         self.base_path = Path(base_path)
-        self.base_path.mkdir(exist_ok=True)
-        print(f"Directorio de transcripciones: {self.base_path.absolute()}")
+        # Backend e índice se abren en el primer uso para no tocar disco al importar la API
+        self._almacenamiento = almacenamiento
+        self._indice = None
+        self._indice_abierto = False
+        self._llenando_indice = False
+        self._lock = threading.Lock()
     
-    def guardar_transcripcion(
-        self, 
-        llamada_id: str, 
+    @property
+    def almacenamiento(self) -> AlmacenamientoTranscripciones:
+        if self._almacenamiento is None:
+            with self._lock:
+                if self._almacenamiento is None:
+                    self.base_path.mkdir(exist_ok=True)
+                    self._almacenamiento = crear_almacenamiento(
+                        self.base_path,
+                        settings.transcripciones_backend,
+                        settings.transcripciones_compresion,
+                        settings.transcripciones_segmento_max_mb * 1024 * 1024
+                    )
+                    logging.info(f"Directorio de transcripciones: {self.base_path.absolute()}")
+        return self._almacenamiento
+    
+    @property
+    def indice(self) -> Optional[IndiceTranscripciones]:
+        if not self._indice_abierto and settings.transcripciones_indice:
+            almacenamiento = self.almacenamiento
+            with self._lock:
+                if not self._indice_abierto:
+                    self._indice = IndiceTranscripciones(self.base_path / "indice_transcripciones.sqlite3")
+                    if self._indice.es_nuevo and next(iter(almacenamiento.listar()), None) is None:
+                        # Almacenamiento vacío: el índice nuevo ya está completo
+                        self._indice.reconstruir(almacenamiento)
+                    # Con datos previos abrirlo no lo llena: eso lo hacen preparar_indice (al arrancar
+                    # la API, en segundo plano) o cli.py reconstruir-indice-transcripciones
+                    self._indice_abierto = True
+        return self._indice
+    
+    def preparar_indice(self) -> Optional[threading.Thread]:
+        """Llena en segundo plano el índice si aún no está poblado (primer arranque con índice).
+
+        Mientras tanto ``listar_transcripciones`` usa el listado del almacenamiento.
+        """
+        indice = self.indice
+        if not indice or indice.poblado:
+            return None
+        with self._lock:
+            if self._llenando_indice:
+                return None
+            self._llenando_indice = True
+        
+        def llenar():
+            try:
+                indice.reconstruir(self.almacenamiento)
+            except Exception as e:
+                logging.error(f"Error llenando el índice de transcripciones: {e}")
+            finally:
+                self._llenando_indice = False
+        
+        hilo = threading.Thread(target=llenar, name="indice-transcripciones", daemon=True)
+        hilo.start()
+        return hilo
+    
+    def _construir_documento(
+        self,
+        llamada_id: str,
         transcripcion: str,
         customer_name: str = None,
         operator_name: str = None,
         start_at: datetime = None,
         end_at: datetime = None,
         palabras_clave: List[str] = None,
-    ) -> str:
-        filename = f"llamada_{llamada_id}.json"
-        filepath = self.base_path / filename
+    ) -> Dict[str, Any]:
         duracion_segundos = None
         duracion_minutos = None
         if start_at and end_at:
             delta = end_at - start_at
             duracion_segundos = delta.total_seconds()
             duracion_minutos = round(duracion_segundos / 60, 2)
-        data = {
+        return {
             "metadata": {
                 "llamada_id": llamada_id,
                 "customer_name": customer_name,
@@ -50,64 +115,131 @@ class TranscripcionService:
                 "tiene_contenido": bool(transcripcion and transcripcion.strip())
             },
         }
+    
+    def guardar_transcripcion(
+        self, 
+        llamada_id: str, 
+        transcripcion: str,
+        customer_name: str = None,
+        operator_name: str = None,
+        start_at: datetime = None,
+        end_at: datetime = None,
+        palabras_clave: List[str] = None,
+    ) -> str:
+        data = self._construir_documento(
+            llamada_id, transcripcion, customer_name, operator_name, start_at, end_at, palabras_clave
+        )
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            with TRANSCRIPCION_DURACION.medir(operacion="guardar", backend=settings.transcripciones_backend):
+                filepath = self.almacenamiento.guardar(llamada_id, data)
+            if self.indice:
+                self.indice.registrar(llamada_id, data, filepath)
             
-            print(f"Transcripción guardada: {filename}")
-            return str(filepath)
+            logging.info(f"Transcripción guardada: {Path(filepath).name}")
+            return filepath
             
         except Exception as e:
-            print(f"Error guardando transcripción {llamada_id}: {e}")
+            logging.error(f"Error guardando transcripción {llamada_id}: {e}")
             raise
     
-    def leer_transcripcion_json(self, llamada_id: str) -> Optional[Dict[str, Any]]:
-        filename = f"llamada_{llamada_id}.json"
-        filepath = self.base_path / filename
+    def guardar_transcripciones_lote(self, items: List[Dict[str, Any]], max_hilos: int = 8) -> List[Any]:
+        """Guarda varias transcripciones en paralelo.
+
+        Cada item lleva los mismos argumentos que ``guardar_transcripcion``. Devuelve, en el
+        mismo orden, la ruta guardada o la excepción producida para ese item.
+        """
+        documentos = [self._construir_documento(**item) for item in items]
         
-        if not filepath.exists():
-            print(f"No se encontró transcripción para llamada: {llamada_id}")
-            return None
-            
+        def guardar(item, data):
+            try:
+                with TRANSCRIPCION_DURACION.medir(operacion="guardar", backend=settings.transcripciones_backend):
+                    return self.almacenamiento.guardar(item['llamada_id'], data)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max_hilos) as executor:
+            resultados = list(executor.map(guardar, items, documentos))
+        
+        if self.indice:
+            self.indice.registrar_lote(
+                (item['llamada_id'], data, resultado)
+                for item, data, resultado in zip(items, documentos, resultados)
+                if not isinstance(resultado, Exception)
+            )
+        
+        errores = sum(1 for r in resultados if isinstance(r, Exception))
+        logging.info(f"Transcripciones guardadas en lote: {len(items) - errores} ok, {errores} con error")
+        return resultados
+    
+    def leer_transcripcion_json(self, llamada_id: str) -> Optional[Dict[str, Any]]:
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            with TRANSCRIPCION_DURACION.medir(operacion="leer", backend=settings.transcripciones_backend):
+                data = self.almacenamiento.leer(llamada_id)
             
-            print(f"Transcripción cargada: {llamada_id}")
+            if data is None:
+                logging.warning(f"No se encontró transcripción para llamada: {llamada_id}")
+                return None
+            
+            logging.info(f"Transcripción cargada: {llamada_id}")
             return data
             
         except json.JSONDecodeError as e:
-            print(f"Error al leer JSON para {llamada_id}: {e}")
+            logging.error(f"Error al leer JSON para {llamada_id}: {e}")
             return None
         except Exception as e:
-            print(f"Error inesperado al leer {llamada_id}: {e}")
+            logging.error(f"Error inesperado al leer {llamada_id}: {e}")
             return None
     
-    def listar_transcripciones(self) -> list:
-        archivos = []
-        for archivo in self.base_path.iterdir():
-            if archivo.is_file() and archivo.name.startswith('llamada_'):
-                # Extrae el ID del nombre del archivo
-                nombre = archivo.stem  # Sin extensión
-                llamada_id = nombre.replace('llamada_', '')
-                archivos.append({
-                    'llamada_id': llamada_id,
-                    'archivo': archivo.name,
-                    'fecha_modificacion': datetime.fromtimestamp(archivo.stat().st_mtime)
-                })
+    async def guardar_transcripcion_async(self, llamada_id: str, transcripcion: str, **metadatos) -> str:
+        """Como ``guardar_transcripcion`` pero sin bloquear el event loop.
+
+        Los backends escriben con E/S de fichero bloqueante (y compresión), así que la operación
+        completa va a un hilo; el event loop sigue atendiendo otras peticiones mientras tanto.
+        """
+        return await asyncio.to_thread(self.guardar_transcripcion, llamada_id, transcripcion, **metadatos)
+    
+    async def leer_transcripcion_json_async(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.leer_transcripcion_json, llamada_id)
+    
+    def listar_transcripciones(
+        self,
+        limit: Optional[int] = None,
+        orden: str = 'fecha_guardado',
+        descendente: bool = True,
+        operator_name: str = None,
+        customer_name: str = None
+    ) -> list:
+        if not self.indice or not self.indice.poblado:
+            archivos = list(self.almacenamiento.listar())
+            archivos = sorted(archivos, key=lambda x: x['fecha_modificacion'], reverse=True)
+            return archivos[:limit] if limit is not None else archivos
         
-        return sorted(archivos, key=lambda x: x['fecha_modificacion'], reverse=True)
+        entradas = self.indice.consultar(
+            limit=limit,
+            orden=orden,
+            descendente=descendente,
+            operator_name=operator_name,
+            customer_name=customer_name
+        )
+        for entrada in entradas:
+            entrada['fecha_modificacion'] = datetime.fromisoformat(entrada['fecha_guardado'])
+        return entradas
+    
+    def iterar_transcripciones(self):
+        """Genera (llamada_id, documento) para todas las transcripciones almacenadas."""
+        for entrada in self.almacenamiento.listar():
+            data = self.leer_transcripcion_json(entrada['llamada_id'])
+            if data is not None:
+                yield entrada['llamada_id'], data
+    
+    def reconstruir_indice(self) -> int:
+        if not self.indice:
+            raise RuntimeError("El índice de transcripciones está desactivado")
+        return self.indice.reconstruir(self.almacenamiento)
     
     def eliminar_transcripcion(self, llamada_id: str) -> bool:
-        eliminados = 0
-
-        for extension in ['.txt', '.json']:
-            filename = f"llamada_{llamada_id}{extension}"
-            filepath = self.base_path / filename
-            
-            if filepath.exists():
-                filepath.unlink()
-                eliminados += 1
-        
-        return eliminados > 0
+        eliminado = self.almacenamiento.eliminar(llamada_id)
+        if self.indice:
+            self.indice.eliminar(llamada_id)
+        return eliminado
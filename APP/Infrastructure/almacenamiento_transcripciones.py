@@ -0,0 +1,217 @@
+import abc
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator
+from uuid import uuid4
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def escribir_atomico(filepath: Path, contenido: bytes):
+    """Escribe en un temporal del mismo directorio y renombra: un lector nunca ve un archivo a medias."""
+    temporal = filepath.parent / f".tmp-{uuid4().hex}"
+    try:
+        with open(temporal, 'wb') as f:
+            f.write(contenido)
+        os.replace(temporal, filepath)
+    except BaseException:
+        temporal.unlink(missing_ok=True)
+        raise
+
+
+class AlmacenamientoTranscripciones(abc.ABC):
+    """Backend de persistencia de los documentos de transcripción."""
+
+    @abc.abstractmethod
+    def guardar(self, llamada_id: str, data: Dict[str, Any]) -> str:
+        ...
+
+    @abc.abstractmethod
+    def leer(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abc.abstractmethod
+    def eliminar(self, llamada_id: str) -> bool:
+        ...
+
+    @abc.abstractmethod
+    def listar(self) -> Iterator[Dict[str, Any]]:
+        ...
+
+
+class AlmacenamientoPlano(AlmacenamientoTranscripciones):
+    """Formato original: un llamada_<id>.json indentado por llamada en un único directorio."""
+
+    def __init__(self, base_path: Path):
+        self.base_path = Path(base_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+
+    def ruta(self, llamada_id: str) -> Path:
+        return self.base_path / f"llamada_{llamada_id}.json"
+
+    def guardar(self, llamada_id: str, data: Dict[str, Any]) -> str:
+        filepath = self.ruta(llamada_id)
+        contenido = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        escribir_atomico(filepath, contenido)
+        return str(filepath)
+
+    def leer(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        filepath = self.ruta(llamada_id)
+        if not filepath.exists():
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def eliminar(self, llamada_id: str) -> bool:
+        eliminados = 0
+        for extension in ['.txt', '.json']:
+            filepath = self.base_path / f"llamada_{llamada_id}{extension}"
+            if filepath.exists():
+                filepath.unlink()
+                eliminados += 1
+        return eliminados > 0
+
+    def listar(self) -> Iterator[Dict[str, Any]]:
+        for archivo in self.base_path.iterdir():
+            if archivo.is_file() and archivo.name.startswith('llamada_'):
+                yield {
+                    'llamada_id': archivo.stem.replace('llamada_', ''),
+                    'archivo': archivo.name,
+                    'fecha_modificacion': datetime.fromtimestamp(archivo.stat().st_mtime)
+                }
+
+
+class AlmacenamientoFragmentado(AlmacenamientoTranscripciones):
+    """Directorios base/ab/cd/ según el hash del id y JSON compacto comprimido con zstd o gzip.
+
+    Las lecturas caen al formato plano si la llamada todavía no se ha migrado.
+    """
+
+    EXTENSIONES = {'zstd': '.json.zst', 'gzip': '.json.gz', 'ninguna': '.json'}
+
+    def __init__(self, base_path: Path, compresion: str = 'zstd', nivel: Optional[int] = None):
+        if compresion not in self.EXTENSIONES:
+            raise ValueError(f"Compresión no soportada: {compresion}")
+        if compresion == 'zstd' and zstandard is None:
+            logging.warning("zstandard no está instalado, se usa gzip para las transcripciones")
+            compresion = 'gzip'
+
+        self.base_path = Path(base_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.compresion = compresion
+        self.nivel = nivel
+        self.plano = AlmacenamientoPlano(self.base_path)
+
+    def directorio(self, llamada_id: str) -> Path:
+        digest = hashlib.md5(llamada_id.encode('utf-8')).hexdigest()
+        return self.base_path / digest[:2] / digest[2:4]
+
+    def ruta(self, llamada_id: str, compresion: Optional[str] = None) -> Path:
+        extension = self.EXTENSIONES[compresion or self.compresion]
+        return self.directorio(llamada_id) / f"llamada_{llamada_id}{extension}"
+
+    def _comprimir(self, contenido: bytes) -> bytes:
+        if self.compresion == 'zstd':
+            return zstandard.ZstdCompressor(level=self.nivel or 3).compress(contenido)
+        if self.compresion == 'gzip':
+            return gzip.compress(contenido, compresslevel=self.nivel or 6)
+        return contenido
+
+    @staticmethod
+    def _descomprimir(filepath: Path, contenido: bytes) -> bytes:
+        if filepath.name.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(f"Se necesita zstandard para leer {filepath.name}")
+            return zstandard.ZstdDecompressor().decompress(contenido)
+        if filepath.name.endswith('.gz'):
+            return gzip.decompress(contenido)
+        return contenido
+
+    def guardar(self, llamada_id: str, data: Dict[str, Any]) -> str:
+        filepath = self.ruta(llamada_id)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        contenido = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        escribir_atomico(filepath, self._comprimir(contenido))
+        return str(filepath)
+
+    def leer(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        # Primero la compresión actual; después las demás por si cambió la configuración
+        compresiones = [self.compresion] + [c for c in self.EXTENSIONES if c != self.compresion]
+        for compresion in compresiones:
+            filepath = self.ruta(llamada_id, compresion)
+            try:
+                with open(filepath, 'rb') as f:
+                    contenido = f.read()
+            except FileNotFoundError:
+                continue
+            return json.loads(self._descomprimir(filepath, contenido))
+
+        return self.plano.leer(llamada_id)
+
+    def eliminar(self, llamada_id: str) -> bool:
+        eliminado = False
+        for compresion in self.EXTENSIONES:
+            filepath = self.ruta(llamada_id, compresion)
+            if filepath.exists():
+                filepath.unlink()
+                eliminado = True
+        return self.plano.eliminar(llamada_id) or eliminado
+
+    def listar(self) -> Iterator[Dict[str, Any]]:
+        yield from self.plano.listar()
+        for raiz, _, archivos in os.walk(self.base_path):
+            if Path(raiz) == self.base_path:
+                continue
+            for nombre in archivos:
+                if not nombre.startswith('llamada_'):
+                    continue
+                filepath = Path(raiz) / nombre
+                yield {
+                    'llamada_id': nombre.split('.', 1)[0].replace('llamada_', ''),
+                    'archivo': str(filepath.relative_to(self.base_path)),
+                    'fecha_modificacion': datetime.fromtimestamp(filepath.stat().st_mtime)
+                }
+
+    def migrar_desde_plano(self, eliminar_originales: bool = True) -> Dict[str, int]:
+        """Convierte los llamada_<id>.json del directorio raíz al formato fragmentado."""
+        migrados = 0
+        errores = 0
+        for archivo in list(self.base_path.glob('llamada_*.json')):
+            llamada_id = archivo.stem.replace('llamada_', '')
+            try:
+                with open(archivo, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.guardar(llamada_id, data)
+                if eliminar_originales:
+                    archivo.unlink()
+                migrados += 1
+            except (OSError, json.JSONDecodeError) as e:
+                logging.error(f"Error migrando {archivo.name}: {e}")
+                errores += 1
+
+        logging.info(f"Migración de transcripciones: {migrados} migradas, {errores} con error")
+        return {'migrados': migrados, 'errores': errores}
+
+
+def crear_almacenamiento(
+    base_path: Path,
+    backend: str,
+    compresion: str = 'zstd',
+    max_bytes_segmento: int = 256 * 1024 * 1024
+) -> AlmacenamientoTranscripciones:
+    if backend == 'plano':
+        return AlmacenamientoPlano(base_path)
+    if backend == 'fragmentado':
+        return AlmacenamientoFragmentado(base_path, compresion=compresion)
+    if backend == 'segmentos':
+        from APP.Infrastructure.segmentos_transcripciones import AlmacenamientoSegmentos
+        return AlmacenamientoSegmentos(base_path, max_bytes_segmento=max_bytes_segmento)
+    raise ValueError(f"Backend de transcripciones no soportado: {backend}")
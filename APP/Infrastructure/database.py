@@ -1,12 +1,238 @@
 import psycopg2
 import psycopg2.extras
+import base64
 import logging
 import json
-from datetime import datetime
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, timedelta
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from config import settings
+from APP.Infrastructure.pool_conexiones import PoolConexiones
+from APP.Infrastructure.metricas import instrumentar_metodos, DB_DURACION
 
+# (columna en analisis_llamadas, sufijo en operador_estadisticas)
+CAMPOS_ESTADISTICAS_ANALISIS = [
+    ('puntuacion_general', 'puntuacion'),
+    ('regulacion_cumplimiento', 'regulacion'),
+    ('habilidad_comercial', 'habilidad'),
+    ('conocimiento_producto', 'conocimiento'),
+    ('cierre_venta', 'cierre'),
+]
+
+COLUMNAS_ESTADISTICAS = [
+    'total_llamadas', 'suma_duracion', 'llamadas_con_duracion', 'total_analisis'
+] + [f"{prefijo}_{sufijo}" for _, sufijo in CAMPOS_ESTADISTICAS_ANALISIS for prefijo in ('suma', 'n')]
+
+PERIODO_TOTAL = date(1970, 1, 1)
+
+GRANULARIDADES = ('total', 'dia', 'semana')
+
+def periodos_estadisticas(fecha: date) -> List[Tuple[str, date]]:
+    return [
+        ('total', PERIODO_TOTAL),
+        ('dia', fecha),
+        ('semana', fecha - timedelta(days=fecha.weekday()))
+    ]
+
+def fecha_sin_zona(valor: Optional[datetime]) -> Optional[datetime]:
+    """Hora local de la fecha sin zona, como se guarda start_at (columna TIMESTAMP)."""
+    return valor.replace(tzinfo=None) if valor else valor
+
+def columna_orden_llamadas(desde: Optional[datetime], hasta: Optional[datetime]) -> str:
+    """Con rango de fechas el listado se ordena por start_at, la columna filtrada, y usa su índice."""
+    return 'start_at' if desde or hasta else 'created_at'
+
+def codificar_cursor(marca: datetime, llamada_id: str) -> str:
+    """Cursor opaco de paginación a partir de la última fila (columna de orden, id)."""
+    crudo = json.dumps([marca.isoformat(), llamada_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+def decodificar_cursor(cursor_pagina: str) -> Tuple[datetime, str]:
+    try:
+        marca, llamada_id = json.loads(base64.urlsafe_b64decode(cursor_pagina.encode('ascii')))
+        return datetime.fromisoformat(marca), llamada_id
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de paginación inválido: {cursor_pagina}") from e
+
+def calcular_duracion(llamada_data: Dict[str, Any]) -> Optional[float]:
+    if llamada_data.get('start_at') and llamada_data.get('end_at'):
+        start = datetime.fromisoformat(llamada_data['start_at'].replace('Z', '+00:00'))
+        end = datetime.fromisoformat(llamada_data['end_at'].replace('Z', '+00:00'))
+        return (end - start).total_seconds()
+    return None
+
+def fila_llamada(llamada_data: Dict[str, Any]) -> tuple:
+    return (
+        llamada_data['id'],
+        llamada_data['customer_name'],
+        llamada_data.get('operator_name'),
+        llamada_data['start_at'],
+        llamada_data.get('end_at'),
+        calcular_duracion(llamada_data),
+        json.dumps(llamada_data.get('palabras_clave', [])),
+        llamada_data.get('transcripcion_archivo')
+    )
+
+def deltas_llamadas(filas: List[tuple]) -> Dict[Tuple[str, str, date], Dict[str, float]]:
+    deltas = {}
+    for fila in filas:
+        operator_name, start_at, duracion = fila[2], fila[3], fila[5]
+        if not operator_name:
+            continue
+        fecha = datetime.fromisoformat(start_at.replace('Z', '+00:00')).date()
+        for granularidad, periodo in periodos_estadisticas(fecha):
+            valores = deltas.setdefault((operator_name, granularidad, periodo), {})
+            valores['total_llamadas'] = valores.get('total_llamadas', 0) + 1
+            if duracion is not None:
+                valores['suma_duracion'] = valores.get('suma_duracion', 0) + duracion
+                valores['llamadas_con_duracion'] = valores.get('llamadas_con_duracion', 0) + 1
+    return deltas
+
+def filas_estadisticas(deltas: Dict[Tuple[str, str, date], Dict[str, float]]) -> List[tuple]:
+    # Orden fijo de claves para no provocar interbloqueos entre transacciones concurrentes
+    return [
+        (*clave, *[valores.get(columna, 0) for columna in COLUMNAS_ESTADISTICAS])
+        for clave, valores in sorted(deltas.items())
+    ]
+
+# El marcador de VALUES depende del driver: "%s" con execute_values, "($1, ..., $n)" con asyncpg
+SQL_ACUMULAR_ESTADISTICAS = f"""
+    INSERT INTO operador_estadisticas 
+    (operator_name, granularidad, periodo, {', '.join(COLUMNAS_ESTADISTICAS)})
+    VALUES %s
+    ON CONFLICT (operator_name, granularidad, periodo) DO UPDATE 
+    SET {", ".join(f"{columna} = operador_estadisticas.{columna} + EXCLUDED.{columna}" for columna in COLUMNAS_ESTADISTICAS)}, 
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+# Búsqueda de texto completo: palabras clave con peso A, texto de la transcripción con peso B
+CONFIGURACION_BUSQUEDA = 'spanish'
+OPCIONES_FRAGMENTO = 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=25, MinWords=8, FragmentDelimiter=" … "'
+
+SQL_INDEXAR_TRANSCRIPCIONES = """
+    INSERT INTO llamadas_busqueda (llamada_id, texto, palabras_clave)
+    SELECT v.llamada_id, v.texto, v.palabras_clave
+    FROM (VALUES %s) AS v (llamada_id, texto, palabras_clave)
+    JOIN llamadas l ON l.id = v.llamada_id
+    ON CONFLICT (llamada_id) DO UPDATE
+    SET texto = EXCLUDED.texto, palabras_clave = EXCLUDED.palabras_clave, updated_at = CURRENT_TIMESTAMP
+"""
+
+# Marcadores en orden: consulta, [relevancia, id del cursor], límite. La relevancia se compara
+# como REAL (el tipo de ts_rank_cd) para que el valor devuelto en el cursor sea exacto
+SQL_BUSCAR_LLAMADAS = f"""
+    WITH consulta AS (SELECT websearch_to_tsquery('{CONFIGURACION_BUSQUEDA}', %s) AS q),
+    pagina AS (
+        SELECT b.llamada_id, b.texto, ts_rank_cd(b.documento, consulta.q, 1) AS relevancia
+        FROM llamadas_busqueda b, consulta
+        WHERE b.documento @@ consulta.q {{filtro_cursor}}
+        ORDER BY relevancia DESC, b.llamada_id DESC
+        LIMIT %s
+    )
+    SELECT l.*, p.relevancia,
+           ts_headline('{CONFIGURACION_BUSQUEDA}', p.texto, consulta.q, '{OPCIONES_FRAGMENTO}') AS fragmento
+    FROM pagina p
+    JOIN llamadas l ON l.id = p.llamada_id, consulta
+    ORDER BY p.relevancia DESC, p.llamada_id DESC
+"""
+SQL_FILTRO_CURSOR_BUSQUEDA = "AND (ts_rank_cd(b.documento, consulta.q, 1), b.llamada_id) < (%s::real, %s)"
+
+def fila_busqueda(llamada_id: str, texto: Optional[str], palabras_clave: Optional[List[str]]) -> tuple:
+    return (llamada_id, texto or '', ' '.join(palabras_clave or []))
+
+def codificar_cursor_busqueda(relevancia: float, llamada_id: str) -> str:
+    crudo = json.dumps([relevancia, llamada_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(crudo).decode('ascii')
+
+def decodificar_cursor_busqueda(cursor_pagina: str) -> Tuple[float, str]:
+    try:
+        relevancia, llamada_id = json.loads(base64.urlsafe_b64decode(cursor_pagina.encode('ascii')))
+        return float(relevancia), str(llamada_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Cursor de búsqueda inválido: {cursor_pagina}") from e
+
+def paginar_busqueda(filas: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = codificar_cursor_busqueda(filas[-1]['relevancia'], filas[-1]['id'])
+    return filas, siguiente
+
+COLUMNAS_ANALISIS = [
+    'llamada_id', 'regulacion_cumplimiento', 'regulacion_comentario',
+    'habilidad_comercial', 'habilidad_comentario', 'conocimiento_producto',
+    'conocimiento_comentario', 'cierre_venta', 'cierre_comentario',
+    'puntuacion_general', 'aspectos_positivos', 'areas_mejora',
+    'recomendacion', 'modelo_usado', 'clave_cache', 'resultado'
+]
+
+SQL_INSERTAR_ANALISIS = f"""
+    INSERT INTO analisis_llamadas 
+    ({', '.join(COLUMNAS_ANALISIS)})
+    VALUES %s
+    RETURNING id, llamada_id, {', '.join(columna for columna, _ in CAMPOS_ESTADISTICAS_ANALISIS)}
+"""
+
+def fila_analisis(llamada_id: str, analisis_data: Dict[str, Any], clave_cache: Optional[str] = None) -> tuple:
+    return (
+        llamada_id,
+        analisis_data.get('regulacion', {}).get('cumplimiento'),
+        analisis_data.get('regulacion', {}).get('comentario'),
+        analisis_data.get('habilidad_comercial', {}).get('puntuacion'),
+        analisis_data.get('habilidad_comercial', {}).get('comentario'),
+        analisis_data.get('conocimiento_producto', {}).get('puntuacion'),
+        analisis_data.get('conocimiento_producto', {}).get('comentario'),
+        analisis_data.get('cierre_venta', {}).get('puntuacion'),
+        analisis_data.get('cierre_venta', {}).get('comentario'),
+        analisis_data.get('puntuacion_general'),
+        json.dumps(analisis_data.get('aspectos_positivos', [])),
+        json.dumps(analisis_data.get('areas_mejora', [])),
+        analisis_data.get('recomendacion'),
+        settings.ml_model_name,
+        clave_cache,
+        json.dumps(analisis_data)
+    )
+
+# Columnas de GET /export/llamadas y del Parquet: la llamada y su último análisis (si lo tiene)
+COLUMNAS_EXPORTACION = [
+    'id', 'customer_name', 'operator_name', 'start_at', 'end_at', 'duration_seconds', 'palabras_clave',
+    'created_at', 'analisis_id', 'regulacion_cumplimiento', 'habilidad_comercial', 'conocimiento_producto',
+    'cierre_venta', 'puntuacion_general', 'recomendacion', 'modelo_usado', 'analizado_at'
+]
+
+SQL_EXPORTAR_LLAMADAS = """
+    SELECT l.id, l.customer_name, l.operator_name, l.start_at, l.end_at, l.duration_seconds, l.palabras_clave,
+           l.created_at, a.id, a.regulacion_cumplimiento, a.habilidad_comercial, a.conocimiento_producto,
+           a.cierre_venta, a.puntuacion_general, a.recomendacion, a.modelo_usado, a.created_at
+    FROM llamadas l
+    LEFT JOIN LATERAL (
+        SELECT * FROM analisis_llamadas 
+        WHERE llamada_id = l.id 
+        ORDER BY created_at DESC 
+        LIMIT 1
+    ) a ON TRUE
+    {where}
+    ORDER BY l.start_at, l.id
+"""
+
+def promedios_estadisticas(row: Dict[str, Any]) -> Dict[str, Any]:
+    def promedio(suma, n):
+        return round(suma / n, 2) if n else None
+    
+    return {
+        'total_llamadas': row['total_llamadas'],
+        'total_analisis': row['total_analisis'],
+        'promedio_puntuacion': promedio(row['suma_puntuacion'], row['n_puntuacion']),
+        'duracion_promedio': promedio(row['suma_duracion'], row['llamadas_con_duracion']),
+        'promedio_regulacion': promedio(row['suma_regulacion'], row['n_regulacion']),
+        'promedio_habilidad': promedio(row['suma_habilidad'], row['n_habilidad']),
+        'promedio_conocimiento': promedio(row['suma_conocimiento'], row['n_conocimiento']),
+        'promedio_cierre': promedio(row['suma_cierre'], row['n_cierre'])
+    }
+
+@instrumentar_metodos(DB_DURACION)
 class DatabaseManager:
     
     def __init__(self):
@@ -17,26 +243,63 @@ class DatabaseManager:
             'user': settings.database_user,
             'password': settings.database_password
         }
-        
-        self._test_connection()
+        # El pool se crea en el primer uso: importar el módulo no abre conexiones
+        self._pool = None
+        self._lock_pool = threading.Lock()
+    
+    @property
+    def pool(self) -> PoolConexiones:
+        if self._pool is None:
+            with self._lock_pool:
+                if self._pool is None:
+                    self._pool = PoolConexiones(
+                        self.connection_params,
+                        min_conexiones=settings.database_pool_min,
+                        max_conexiones=settings.database_pool_max,
+                        idle_timeout_segundos=settings.database_pool_idle_timeout_segundos,
+                        timeout_espera_segundos=settings.database_pool_timeout_espera_segundos,
+                        verificar_tras_segundos=settings.database_pool_verificar_tras_segundos
+                    )
+                    logging.info(f"PostgreSQL conectado: {settings.database_host}:{settings.database_port}")
+        return self._pool
+    
+    def inicializar_esquema(self):
+        """Comprueba la conexión y crea o migra tablas e índices (hook de arranque o CLI)."""
+        self.verificar_conexion()
         self._create_tables()
-        logging.info(f"PostgreSQL conectado: {settings.database_host}:{settings.database_port}")
     
+    @contextmanager
     def _get_connection(self):
         try:
-            conn = psycopg2.connect(**self.connection_params)
-            return conn
+            conn = self.pool.obtener()
         except psycopg2.Error as e:
             logging.error(f"Error conectando a PostgreSQL: {e}")
             raise
+        
+        descartar = False
+        try:
+            # El context manager de psycopg2 hace commit/rollback pero no cierra la conexión
+            with conn:
+                yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            descartar = True
+            raise
+        finally:
+            self.pool.devolver(conn, descartar=descartar)
     
-    def _test_connection(self):
+    def estadisticas_pool(self) -> Dict[str, Any]:
+        if self._pool is None:
+            return {"inicializado": False}
+        return self.pool.estadisticas()
+    
+    def verificar_conexion(self) -> str:
         try:
             with self._get_connection() as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("SELECT version();")
                     version = cursor.fetchone()[0]
                     logging.info(f"Conexión PostgreSQL exitosa: {version}")
+                    return version
         except Exception as e:
             logging.error(f"Error conectando a PostgreSQL: {e}")
             raise
@@ -82,6 +345,97 @@ class DatabaseManager:
                     )
                 """)
                 
+                cursor.execute("""
+                    ALTER TABLE analisis_llamadas
+                    ADD COLUMN IF NOT EXISTS clave_cache VARCHAR(64),
+                    ADD COLUMN IF NOT EXISTS resultado JSONB
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS analisis_jobs (
+                        id VARCHAR(255) PRIMARY KEY,
+                        llamada_id VARCHAR(255) NOT NULL,
+                        estado VARCHAR(20) NOT NULL DEFAULT 'queued',
+                        force BOOLEAN DEFAULT FALSE,
+                        analisis_id INTEGER,
+                        resultado JSONB,
+                        error TEXT,
+                        intentos INTEGER DEFAULT 0,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        started_at TIMESTAMP,
+                        finished_at TIMESTAMP,
+                        FOREIGN KEY (llamada_id) REFERENCES llamadas (id)
+                    )
+                """)
+                
+                # Latido del worker que tiene el job en running; sin latidos recientes está abandonado
+                cursor.execute("""
+                    ALTER TABLE analisis_jobs
+                    ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS reanalisis (
+                        id VARCHAR(255) PRIMARY KEY,
+                        estado VARCHAR(20) NOT NULL DEFAULT 'running',
+                        force BOOLEAN DEFAULT FALSE,
+                        modelo VARCHAR(255),
+                        ultimo_id VARCHAR(255),  -- checkpoint: llamadas hasta este id ya procesadas
+                        total INTEGER DEFAULT 0,
+                        procesadas INTEGER DEFAULT 0,
+                        analizadas INTEGER DEFAULT 0,
+                        omitidas INTEGER DEFAULT 0,
+                        fallidas INTEGER DEFAULT 0,
+                        error TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        finished_at TIMESTAMP
+                    )
+                """)
+                
+                cursor.execute(f"""
+                    CREATE TABLE IF NOT EXISTS llamadas_busqueda (
+                        llamada_id VARCHAR(255) PRIMARY KEY REFERENCES llamadas (id) ON DELETE CASCADE,
+                        texto TEXT NOT NULL DEFAULT '',
+                        palabras_clave TEXT NOT NULL DEFAULT '',
+                        documento TSVECTOR GENERATED ALWAYS AS (
+                            setweight(to_tsvector('{CONFIGURACION_BUSQUEDA}', palabras_clave), 'A') ||
+                            setweight(to_tsvector('{CONFIGURACION_BUSQUEDA}', texto), 'B')
+                        ) STORED,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_busqueda_documento 
+                    ON llamadas_busqueda USING GIN (documento)
+                """)
+                
+                # Agregados por operador: 'total' usa periodo 1970-01-01; 'dia' y 'semana' la fecha de inicio
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS operador_estadisticas (
+                        operator_name VARCHAR(255) NOT NULL,
+                        granularidad VARCHAR(10) NOT NULL,
+                        periodo DATE NOT NULL,
+                        total_llamadas INTEGER NOT NULL DEFAULT 0,
+                        suma_duracion DOUBLE PRECISION NOT NULL DEFAULT 0,
+                        llamadas_con_duracion INTEGER NOT NULL DEFAULT 0,
+                        total_analisis INTEGER NOT NULL DEFAULT 0,
+                        suma_puntuacion BIGINT NOT NULL DEFAULT 0,
+                        n_puntuacion INTEGER NOT NULL DEFAULT 0,
+                        suma_regulacion BIGINT NOT NULL DEFAULT 0,
+                        n_regulacion INTEGER NOT NULL DEFAULT 0,
+                        suma_habilidad BIGINT NOT NULL DEFAULT 0,
+                        n_habilidad INTEGER NOT NULL DEFAULT 0,
+                        suma_conocimiento BIGINT NOT NULL DEFAULT 0,
+                        n_conocimiento INTEGER NOT NULL DEFAULT 0,
+                        suma_cierre BIGINT NOT NULL DEFAULT 0,
+                        n_cierre INTEGER NOT NULL DEFAULT 0,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (operator_name, granularidad, periodo)
+                    )
+                """)
+                
                 cursor.execute("""
                     CREATE TABLE IF NOT EXISTS operadores (
                         id SERIAL PRIMARY KEY,
@@ -93,49 +447,191 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Índices para paginación por cursor sobre (created_at, id) con y sin filtros
+                cursor.execute("DROP INDEX IF EXISTS idx_llamadas_operator")
+                cursor.execute("DROP INDEX IF EXISTS idx_llamadas_created_at")
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_created_id 
+                    ON llamadas (created_at DESC, id DESC)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_operator_created_id 
+                    ON llamadas (operator_name, created_at DESC, id DESC)
+                """)
+                
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_llamadas_operator 
-                    ON llamadas (operator_name)
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_customer_created_id 
+                    ON llamadas (customer_name, created_at DESC, id DESC)
                 """)
                 
                 cursor.execute("""
-                    CREATE INDEX IF NOT EXISTS idx_llamadas_created_at 
-                    ON llamadas (created_at DESC)
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_palabras_clave 
+                    ON llamadas USING GIN (palabras_clave jsonb_path_ops)
+                """)
+                
+                # Último análisis de cada llamada (obtener_analisis y la exportación)
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_analisis_llamada_created 
+                    ON analisis_llamadas (llamada_id, created_at DESC)
+                """)
+                
+                # Exportación y listado con desde/hasta en orden de start_at sin ordenar toda la tabla
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_start_id 
+                    ON llamadas (start_at, id)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_llamadas_operator_start_id 
+                    ON llamadas (operator_name, start_at DESC, id DESC)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_analisis_jobs_estado 
+                    ON analisis_jobs (estado, created_at)
+                """)
+                
+                cursor.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_analisis_clave_cache 
+                    ON analisis_llamadas (clave_cache, created_at DESC)
                 """)
                 
                 conn.commit()
                 logging.info("Tablas PostgreSQL creadas/verificadas")
 
 
+    def _acumular_estadisticas(self, cursor, deltas: Dict[Tuple[str, str, date], Dict[str, float]]):
+        """Suma los deltas a operador_estadisticas dentro de la transacción del llamador."""
+        if not deltas:
+            return
+        
+        psycopg2.extras.execute_values(cursor, SQL_ACUMULAR_ESTADISTICAS % "%s", filas_estadisticas(deltas))
+    
+    def _acumular_llamadas(self, cursor, filas: List[tuple]):
+        self._acumular_estadisticas(cursor, deltas_llamadas(filas))
+    
+    def _acumular_analisis(self, cursor, puntuaciones: List[Tuple[str, Dict[str, Any]]], signo: int = 1):
+        """Suma (o resta, con ``signo=-1``) los análisis (llamada_id, puntuaciones) a las estadísticas de sus operadores."""
+        cursor.execute(
+            "SELECT id, operator_name, start_at FROM llamadas WHERE id = ANY(%s)",
+            (list({llamada_id for llamada_id, _ in puntuaciones}),)
+        )
+        llamadas = {llamada_id: (operator_name, start_at) for llamada_id, operator_name, start_at in cursor.fetchall()}
+        
+        deltas = {}
+        for llamada_id, valores_analisis in puntuaciones:
+            operator_name, start_at = llamadas.get(llamada_id, (None, None))
+            if not operator_name:
+                continue
+            for granularidad, periodo in periodos_estadisticas(start_at.date()):
+                valores = deltas.setdefault((operator_name, granularidad, periodo), {})
+                valores['total_analisis'] = valores.get('total_analisis', 0) + signo
+                for columna, sufijo in CAMPOS_ESTADISTICAS_ANALISIS:
+                    if valores_analisis.get(columna) is not None:
+                        valores[f"suma_{sufijo}"] = valores.get(f"suma_{sufijo}", 0) + signo * valores_analisis[columna]
+                        valores[f"n_{sufijo}"] = valores.get(f"n_{sufijo}", 0) + signo
+        
+        self._acumular_estadisticas(cursor, deltas)
+    
+    def _insertar_analisis(self, cursor, filas: List[tuple]) -> List[int]:
+        """INSERT multi-fila en analisis_llamadas más sus estadísticas; devuelve los ids en orden.
+
+        Las estadísticas cuentan solo el último análisis de cada llamada: si ya tenía uno (force,
+        reanálisis), se resta su contribución en la misma transacción antes de sumar el nuevo.
+        """
+        columnas = [columna for columna, _ in CAMPOS_ESTADISTICAS_ANALISIS]
+        llamada_ids = sorted({fila[COLUMNAS_ANALISIS.index('llamada_id')] for fila in filas})
+        # Bloquea las llamadas: dos análisis concurrentes de la misma no restan dos veces el anterior
+        cursor.execute("SELECT id FROM llamadas WHERE id = ANY(%s) ORDER BY id FOR UPDATE", (llamada_ids,))
+        cursor.execute(f"""
+            SELECT DISTINCT ON (llamada_id) llamada_id, {', '.join(columnas)}
+            FROM analisis_llamadas 
+            WHERE llamada_id = ANY(%s)
+            ORDER BY llamada_id, created_at DESC, id DESC
+        """, (llamada_ids,))
+        anteriores = [(llamada_id, dict(zip(columnas, puntuaciones))) for llamada_id, *puntuaciones in cursor.fetchall()]
+        
+        devueltas = psycopg2.extras.execute_values(cursor, SQL_INSERTAR_ANALISIS, filas, page_size=len(filas), fetch=True)
+        vigentes = {}
+        for _, llamada_id, *puntuaciones in sorted(devueltas):
+            vigentes[llamada_id] = dict(zip(columnas, puntuaciones))
+        
+        if anteriores:
+            self._acumular_analisis(cursor, anteriores, signo=-1)
+        self._acumular_analisis(cursor, list(vigentes.items()))
+        return [analisis_id for analisis_id, *_ in devueltas]
+
     def guardar_llamada(self, llamada_data: Dict[str, Any]) -> str:
         with self._get_connection() as conn:
             with conn.cursor() as cursor:
-                duration = None
-                if llamada_data.get('start_at') and llamada_data.get('end_at'):
-                    start = datetime.fromisoformat(llamada_data['start_at'].replace('Z', '+00:00'))
-                    end = datetime.fromisoformat(llamada_data['end_at'].replace('Z', '+00:00'))
-                    duration = (end - start).total_seconds()
-                
                 cursor.execute("""
                     INSERT INTO llamadas 
                     (id, customer_name, operator_name, start_at, end_at, 
                      duration_seconds, palabras_clave, transcripcion_archivo)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """, (
-                    llamada_data['id'],
-                    llamada_data['customer_name'],
-                    llamada_data.get('operator_name'),
-                    llamada_data['start_at'],
-                    llamada_data.get('end_at'),
-                    duration,
-                    json.dumps(llamada_data.get('palabras_clave', [])),
-                    llamada_data.get('transcripcion_archivo')
-                ))
+                """, fila_llamada(llamada_data))
+                self._acumular_llamadas(cursor, [fila_llamada(llamada_data)])
                 
                 conn.commit()
                 logging.info(f"Llamada guardada: {llamada_data['id']}")
                 return llamada_data['id']
     
+    def guardar_llamadas_lote(self, llamadas_data: List[Dict[str, Any]]) -> Dict[str, Optional[str]]:
+        """Inserta un bloque de llamadas en una sola transacción con un INSERT multi-fila.
+
+        Si el bloque falla se reintenta fila a fila con savepoints para aislar las filas
+        inválidas. Devuelve, por id, None si se guardó o el mensaje de error.
+        """
+        resultados = {}
+        sql = """
+            INSERT INTO llamadas 
+            (id, customer_name, operator_name, start_at, end_at, 
+             duration_seconds, palabras_clave, transcripcion_archivo)
+            VALUES %s
+        """
+        
+        filas = []
+        for llamada_data in llamadas_data:
+            try:
+                filas.append(fila_llamada(llamada_data))
+            except (KeyError, ValueError) as e:
+                resultados[llamada_data.get('id')] = f"Datos inválidos: {e}"
+        
+        if not filas:
+            return resultados
+        
+        try:
+            with self._get_connection() as conn:
+                with conn.cursor() as cursor:
+                    psycopg2.extras.execute_values(cursor, sql, filas, page_size=len(filas))
+                    self._acumular_llamadas(cursor, filas)
+                    conn.commit()
+            resultados.update({fila[0]: None for fila in filas})
+            logging.info(f"Lote de llamadas guardado: {len(filas)}")
+            return resultados
+        except psycopg2.Error as e:
+            logging.warning(f"Lote de llamadas rechazado ({e}), se reintenta fila a fila")
+        
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                for fila in filas:
+                    cursor.execute("SAVEPOINT fila_llamada")
+                    try:
+                        psycopg2.extras.execute_values(cursor, sql, [fila])
+                        cursor.execute("RELEASE SAVEPOINT fila_llamada")
+                        resultados[fila[0]] = None
+                    except psycopg2.Error as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT fila_llamada")
+                        resultados[fila[0]] = str(e).strip()
+                self._acumular_llamadas(cursor, [fila for fila in filas if resultados[fila[0]] is None])
+                conn.commit()
+        
+        guardadas = sum(1 for error in resultados.values() if error is None)
+        logging.info(f"Lote de llamadas guardado: {guardadas} de {len(llamadas_data)}")
+        return resultados
+    
     def obtener_llamada(self, llamada_id: str) -> Optional[Dict[str, Any]]:
         with self._get_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
@@ -149,52 +645,109 @@ class DatabaseManager:
                     return data
                 return None
     
-    def listar_llamadas(self, limit: int = 50) -> List[Dict[str, Any]]:
+    def listar_llamadas(
+        self,
+        limit: int = 50,
+        cursor_pagina: Optional[str] = None,
+        operator_name: Optional[str] = None,
+        customer_name: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        palabra_clave: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Lista llamadas de la más reciente a la más antigua con paginación por cursor.
+
+        Devuelve la página y el cursor de la siguiente (None si no hay más). Los filtros
+        desde/hasta se aplican sobre start_at (hora de la llamada), igual que en la exportación
+        y en las estadísticas por periodo; con ellos el orden y el cursor también son por start_at.
+        """
+        orden = columna_orden_llamadas(desde, hasta)
+        condiciones = []
+        parametros = []
+        
+        if cursor_pagina:
+            marca, llamada_id = decodificar_cursor(cursor_pagina)
+            condiciones.append(f"({orden}, id) < (%s, %s)")
+            parametros.extend([marca, llamada_id])
+        if operator_name:
+            condiciones.append("operator_name = %s")
+            parametros.append(operator_name)
+        if customer_name:
+            condiciones.append("customer_name = %s")
+            parametros.append(customer_name)
+        if desde:
+            condiciones.append("start_at >= %s")
+            parametros.append(fecha_sin_zona(desde))
+        if hasta:
+            condiciones.append("start_at < %s")
+            parametros.append(fecha_sin_zona(hasta))
+        if palabra_clave:
+            condiciones.append("palabras_clave @> %s::jsonb")
+            parametros.append(json.dumps([palabra_clave]))
+        
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        
         with self._get_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT * FROM llamadas 
-                    ORDER BY created_at DESC 
+                    {where}
+                    ORDER BY {orden} DESC, id DESC 
                     LIMIT %s
-                """, (limit,))
-                
-                llamadas = []
-                for row in cursor.fetchall():
-                    data = dict(row)
-                    llamadas.append(data)
+                """, (*parametros, limit + 1))
                 
-                return llamadas
+                llamadas = [dict(row) for row in cursor.fetchall()]
+        
+        siguiente = None
+        if len(llamadas) > limit:
+            llamadas = llamadas[:limit]
+            ultima = llamadas[-1]
+            siguiente = codificar_cursor(ultima[orden], ultima['id'])
+        
+        return llamadas, siguiente
     
-    def guardar_analisis(self, llamada_id: str, analisis_data: Dict[str, Any]) -> int:
+    def indexar_transcripciones(self, filas: List[tuple]) -> int:
+        """Indexa (llamada_id, texto, palabras_clave) para la búsqueda; ignora llamadas inexistentes."""
+        if not filas:
+            return 0
         with self._get_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO analisis_llamadas 
-                    (llamada_id, regulacion_cumplimiento, regulacion_comentario,
-                     habilidad_comercial, habilidad_comentario, conocimiento_producto,
-                     conocimiento_comentario, cierre_venta, cierre_comentario,
-                     puntuacion_general, aspectos_positivos, areas_mejora,
-                     recomendacion, modelo_usado)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    llamada_id,
-                    analisis_data.get('regulacion', {}).get('cumplimiento'),
-                    analisis_data.get('regulacion', {}).get('comentario'),
-                    analisis_data.get('habilidad_comercial', {}).get('puntuacion'),
-                    analisis_data.get('habilidad_comercial', {}).get('comentario'),
-                    analisis_data.get('conocimiento_producto', {}).get('puntuacion'),
-                    analisis_data.get('conocimiento_producto', {}).get('comentario'),
-                    analisis_data.get('cierre_venta', {}).get('puntuacion'),
-                    analisis_data.get('cierre_venta', {}).get('comentario'),
-                    analisis_data.get('puntuacion_general'),
-                    json.dumps(analisis_data.get('aspectos_positivos', [])),
-                    json.dumps(analisis_data.get('areas_mejora', [])),
-                    analisis_data.get('recomendacion'),
-                    settings.ml_model_name
-                ))
-                
-                analisis_id = cursor.fetchone()[0]
+                psycopg2.extras.execute_values(cursor, SQL_INDEXAR_TRANSCRIPCIONES, filas, page_size=len(filas))
+                indexadas = cursor.rowcount
+                conn.commit()
+                return indexadas
+    
+    def buscar_llamadas(
+        self,
+        consulta: str,
+        limit: int = 20,
+        cursor_pagina: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Llamadas cuya transcripción o palabras clave coinciden con ``consulta``.
+
+        Acepta la sintaxis de websearch_to_tsquery ("frase exacta", -excluir, OR). Ordena por
+        relevancia y devuelve un fragmento resaltado con <mark>; pagina por (relevancia, id).
+        """
+        parametros = [consulta]
+        filtro_cursor = ""
+        if cursor_pagina:
+            filtro_cursor = SQL_FILTRO_CURSOR_BUSQUEDA
+            parametros.extend(decodificar_cursor_busqueda(cursor_pagina))
+        
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute(
+                    SQL_BUSCAR_LLAMADAS.format(filtro_cursor=filtro_cursor),
+                    (*parametros, limit + 1)
+                )
+                filas = [dict(row) for row in cursor.fetchall()]
+        
+        return paginar_busqueda(filas, limit)
+    
+    def guardar_analisis(self, llamada_id: str, analisis_data: Dict[str, Any], clave_cache: Optional[str] = None) -> int:
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                analisis_id, = self._insertar_analisis(cursor, [fila_analisis(llamada_id, analisis_data, clave_cache)])
                 conn.commit()
                 logging.info(f"Análisis guardado: {analisis_id} para llamada {llamada_id}")
                 return analisis_id
@@ -219,26 +772,422 @@ class DatabaseManager:
                     return data
                 return None
 
-    def obtener_estadisticas_operador(self, operator_name: str) -> Dict[str, Any]:
+    def buscar_analisis_por_clave(self, clave_cache: str) -> Optional[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT id, llamada_id, resultado FROM analisis_llamadas 
+                    WHERE clave_cache = %s AND resultado IS NOT NULL
+                    ORDER BY created_at DESC 
+                    LIMIT 1
+                """, (clave_cache,))
+                
+                row = cursor.fetchone()
+                if row:
+                    return dict(row)
+                return None
+
+    def crear_job_analisis(self, job_id: str, llamada_id: str, force: bool = False) -> Dict[str, Any]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    INSERT INTO analisis_jobs (id, llamada_id, force)
+                    VALUES (%s, %s, %s)
+                    RETURNING *
+                """, (job_id, llamada_id, force))
+                
+                job = dict(cursor.fetchone())
+                conn.commit()
+                logging.info(f"Job de análisis encolado: {job_id} para llamada {llamada_id}")
+                return job
+    
+    def contar_jobs_pendientes(self) -> int:
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM analisis_jobs WHERE estado = 'queued'
+                """)
+                return cursor.fetchone()[0]
+    
+    def tomar_job_analisis(self) -> Optional[Dict[str, Any]]:
+        """Marca como running el job encolado más antiguo; SKIP LOCKED permite varios workers."""
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    UPDATE analisis_jobs 
+                    SET estado = 'running', started_at = CURRENT_TIMESTAMP, heartbeat_at = CURRENT_TIMESTAMP,
+                        intentos = intentos + 1
+                    WHERE id = (
+                        SELECT id FROM analisis_jobs 
+                        WHERE estado = 'queued' 
+                        ORDER BY created_at 
+                        FOR UPDATE SKIP LOCKED 
+                        LIMIT 1
+                    )
+                    RETURNING *
+                """)
+                
+                row = cursor.fetchone()
+                conn.commit()
+                if row:
+                    return dict(row)
+                return None
+    
+    def finalizar_job_analisis(
+        self,
+        job_id: str,
+        estado: str,
+        analisis_id: Optional[int] = None,
+        resultado: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ):
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE analisis_jobs 
+                    SET estado = %s, analisis_id = %s, resultado = %s, error = %s, 
+                        finished_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                """, (
+                    estado,
+                    analisis_id,
+                    json.dumps(resultado) if resultado is not None else None,
+                    error,
+                    job_id
+                ))
+                
+                conn.commit()
+                logging.info(f"Job de análisis {job_id} finalizado: {estado}")
+    
+    def obtener_job_analisis(self, job_id: str) -> Optional[Dict[str, Any]]:
         with self._get_connection() as conn:
             with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
                 cursor.execute("""
-                    SELECT 
-                        COUNT(l.id) as total_llamadas,
-                        ROUND(AVG(a.puntuacion_general), 2) as promedio_puntuacion,
-                        ROUND(AVG(l.duration_seconds), 2) as duracion_promedio,
-                        ROUND(AVG(a.regulacion_cumplimiento), 2) as promedio_regulacion,
-                        ROUND(AVG(a.habilidad_comercial), 2) as promedio_habilidad,
-                        ROUND(AVG(a.conocimiento_producto), 2) as promedio_conocimiento,
-                        ROUND(AVG(a.cierre_venta), 2) as promedio_cierre
-                    FROM llamadas l
-                    LEFT JOIN analisis_llamadas a ON l.id = a.llamada_id
-                    WHERE l.operator_name = %s
-                """, (operator_name,))
+                    SELECT * FROM analisis_jobs WHERE id = %s
+                """, (job_id,))
                 
                 row = cursor.fetchone()
                 if row:
                     return dict(row)
+                return None
+    
+    def listar_jobs_analisis(self, estado: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM analisis_jobs 
+                    WHERE %s IS NULL OR estado = %s
+                    ORDER BY created_at DESC 
+                    LIMIT %s
+                """, (estado, estado, limit))
+                
+                return [dict(row) for row in cursor.fetchall()]
+    
+    def latido_jobs_analisis(self, job_ids: List[str]):
+        """Renueva heartbeat_at de los jobs en running que este proceso sigue ejecutando."""
+        if not job_ids:
+            return
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE analisis_jobs 
+                    SET heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ANY(%s) AND estado = 'running'
+                """, (list(job_ids),))
+                
+                conn.commit()
+    
+    def recuperar_jobs_analisis(self, timeout_segundos: float) -> int:
+        """Devuelve a la cola los jobs en running sin latido desde hace más de ``timeout_segundos``.
+
+        Solo los abandonados (su proceso murió): los workers vivos renuevan heartbeat_at mientras
+        procesan, así que un análisis largo sigue en running y no se ejecuta dos veces.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE analisis_jobs 
+                    SET estado = 'queued', started_at = NULL, heartbeat_at = NULL
+                    WHERE estado = 'running'
+                      AND COALESCE(heartbeat_at, started_at) < CURRENT_TIMESTAMP - make_interval(secs => %s)
+                """, (timeout_segundos,))
+                
+                recuperados = cursor.rowcount
+                conn.commit()
+                if recuperados:
+                    logging.warning(f"Jobs de análisis abandonados devueltos a la cola: {recuperados}")
+                return recuperados
+
+    def crear_reanalisis(self, reanalisis_id: str, total: int, force: bool = False) -> Dict[str, Any]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    INSERT INTO reanalisis (id, force, modelo, total)
+                    VALUES (%s, %s, %s, %s)
+                    RETURNING *
+                """, (reanalisis_id, force, settings.ml_model_name, total))
+                
+                reanalisis = dict(cursor.fetchone())
+                conn.commit()
+                logging.info(f"Reanálisis creado: {reanalisis_id} ({total} llamadas)")
+                return reanalisis
+    
+    def reanudar_reanalisis(self, reanalisis_id: str, restantes: int) -> Optional[Dict[str, Any]]:
+        """Vuelve a marcar como running un reanálisis sin terminar; None si no existe o ya terminó."""
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    UPDATE reanalisis 
+                    SET estado = 'running', modelo = %s, total = procesadas + %s, error = NULL,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s AND estado <> 'done'
+                    RETURNING *
+                """, (settings.ml_model_name, restantes, reanalisis_id))
+                
+                row = cursor.fetchone()
+                conn.commit()
+                if row:
+                    return dict(row)
+                return None
+    
+    def obtener_reanalisis(self, reanalisis_id: str) -> Optional[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM reanalisis WHERE id = %s
+                """, (reanalisis_id,))
+                
+                row = cursor.fetchone()
+                if row:
+                    return dict(row)
+                return None
+    
+    def listar_reanalisis(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM reanalisis 
+                    ORDER BY created_at DESC 
+                    LIMIT %s
+                """, (limit,))
+                
+                return [dict(row) for row in cursor.fetchall()]
+    
+    def contar_llamadas_reanalisis(self, desde_id: Optional[str] = None) -> int:
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT COUNT(*) FROM llamadas 
+                    WHERE transcripcion_archivo IS NOT NULL AND id > %s
+                """, (desde_id or '',))
+                return cursor.fetchone()[0]
+    
+    def iterar_ids_reanalisis(self, desde_id: Optional[str] = None, tamano: int = 256):
+        """Ids de llamadas con transcripción posteriores a ``desde_id``, en orden y en bloques.
+
+        Usa un cursor con nombre (en el servidor): PostgreSQL va enviando ``tamano`` filas
+        cada vez en lugar de materializar todo el resultado en memoria. La conexión queda
+        ocupada mientras se itera.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor(name="reanalisis_ids") as cursor:
+                cursor.itersize = tamano
+                cursor.execute("""
+                    SELECT id FROM llamadas 
+                    WHERE transcripcion_archivo IS NOT NULL AND id > %s
+                    ORDER BY id
+                """, (desde_id or '',))
+                
+                while True:
+                    filas = cursor.fetchmany(tamano)
+                    if not filas:
+                        return
+                    yield [llamada_id for llamada_id, in filas]
+    
+    def analisis_vigentes(self, pares: List[Tuple[str, str]]) -> set:
+        """De los pares (llamada_id, clave_cache), los que ya tienen análisis con esa clave."""
+        if not pares:
+            return set()
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT a.llamada_id, a.clave_cache 
+                    FROM analisis_llamadas a 
+                    JOIN unnest(%s::varchar[], %s::varchar[]) AS p (llamada_id, clave_cache) 
+                      ON a.llamada_id = p.llamada_id AND a.clave_cache = p.clave_cache
+                """, ([llamada_id for llamada_id, _ in pares], [clave for _, clave in pares]))
+                return set(cursor.fetchall())
+    
+    def guardar_bloque_reanalisis(
+        self,
+        reanalisis_id: str,
+        filas: List[tuple],
+        ultimo_id: str,
+        contadores: Dict[str, int]
+    ) -> List[int]:
+        """Inserta los análisis de un bloque (filas de ``fila_analisis``) y avanza el checkpoint.
+
+        Todo en la misma transacción: tras una interrupción, el reanálisis sigue en el primer
+        id posterior a ``ultimo_id`` sin duplicar ni perder análisis.
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                ids = self._insertar_analisis(cursor, filas) if filas else []
+                cursor.execute("""
+                    UPDATE reanalisis 
+                    SET ultimo_id = %s, procesadas = procesadas + %s, analizadas = analizadas + %s,
+                        omitidas = omitidas + %s, fallidas = fallidas + %s, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = %s
+                """, (
+                    ultimo_id,
+                    contadores.get('procesadas', 0),
+                    contadores.get('analizadas', 0),
+                    contadores.get('omitidas', 0),
+                    contadores.get('fallidas', 0),
+                    reanalisis_id
+                ))
+                conn.commit()
+                return ids
+    
+    def finalizar_reanalisis(self, reanalisis_id: str, estado: str, error: Optional[str] = None):
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE reanalisis 
+                    SET estado = %s, error = %s, updated_at = CURRENT_TIMESTAMP,
+                        finished_at = CASE WHEN %s = 'done' THEN CURRENT_TIMESTAMP END
+                    WHERE id = %s
+                """, (estado, error, estado, reanalisis_id))
+                
+                conn.commit()
+                logging.info(f"Reanálisis {reanalisis_id} finalizado: {estado}")
+
+    def iterar_exportacion(
+        self,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        operator_name: Optional[str] = None,
+        tamano: int = 2000
+    ):
+        """Filas (en el orden de ``COLUMNAS_EXPORTACION``) de cada llamada con su último análisis.
+
+        Cursor con nombre: se reciben bloques de ``tamano`` filas en orden de ``start_at``, así
+        que la memoria no depende del número de llamadas. La conexión queda ocupada mientras se itera.
+        """
+        condiciones = []
+        parametros = []
+        if desde:
+            condiciones.append("l.start_at >= %s")
+            parametros.append(fecha_sin_zona(desde))
+        if hasta:
+            condiciones.append("l.start_at < %s")
+            parametros.append(fecha_sin_zona(hasta))
+        if operator_name:
+            condiciones.append("l.operator_name = %s")
+            parametros.append(operator_name)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        
+        with self._get_connection() as conn:
+            with conn.cursor(name="exportacion_llamadas") as cursor:
+                cursor.itersize = tamano
+                cursor.execute(SQL_EXPORTAR_LLAMADAS.format(where=where), parametros)
+                
+                while True:
+                    filas = cursor.fetchmany(tamano)
+                    if not filas:
+                        return
+                    yield filas
+    
+    def obtener_estadisticas_operador(self, operator_name: str) -> Dict[str, Any]:
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM operador_estadisticas 
+                    WHERE operator_name = %s AND granularidad = 'total' AND periodo = %s
+                """, (operator_name, PERIODO_TOTAL))
+                
+                row = cursor.fetchone()
+                if row:
+                    return promedios_estadisticas(row)
                 return {}
+    
+    def obtener_estadisticas_operador_por_periodo(
+        self,
+        operator_name: str,
+        granularidad: str,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        if granularidad not in GRANULARIDADES or granularidad == 'total':
+            raise ValueError(f"Granularidad no soportada: {granularidad}")
+        
+        with self._get_connection() as conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+                cursor.execute("""
+                    SELECT * FROM operador_estadisticas 
+                    WHERE operator_name = %s AND granularidad = %s 
+                      AND periodo >= %s AND periodo <= %s
+                    ORDER BY periodo
+                """, (operator_name, granularidad, desde or date.min, hasta or date.max))
+                
+                return [
+                    {'periodo': row['periodo'], **promedios_estadisticas(row)}
+                    for row in cursor.fetchall()
+                ]
+    
+    def reconstruir_estadisticas_operadores(self) -> int:
+        """Recalcula operador_estadisticas desde llamadas y el último análisis de cada una (backfill o reparación)."""
+        periodo = """
+            CASE g.granularidad 
+                WHEN 'total' THEN DATE '1970-01-01' 
+                WHEN 'dia' THEN l.start_at::date 
+                ELSE date_trunc('week', l.start_at)::date 
+            END
+        """
+        granularidades = "(VALUES ('total'), ('dia'), ('semana')) AS g(granularidad)"
+        columnas_analisis = [f"{prefijo}_{sufijo}" for _, sufijo in CAMPOS_ESTADISTICAS_ANALISIS for prefijo in ('suma', 'n')]
+        agregados_analisis = ", ".join(
+            f"COALESCE(SUM(a.{columna}), 0), COUNT(a.{columna})" for columna, _ in CAMPOS_ESTADISTICAS_ANALISIS
+        )
+        
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                # Bloquea los incrementos concurrentes hasta terminar la reconstrucción
+                cursor.execute("LOCK TABLE operador_estadisticas IN EXCLUSIVE MODE")
+                cursor.execute("DELETE FROM operador_estadisticas")
+                
+                cursor.execute(f"""
+                    INSERT INTO operador_estadisticas 
+                    (operator_name, granularidad, periodo, total_llamadas, suma_duracion, llamadas_con_duracion)
+                    SELECT l.operator_name, g.granularidad, {periodo},
+                           COUNT(*), COALESCE(SUM(l.duration_seconds), 0), COUNT(l.duration_seconds)
+                    FROM llamadas l CROSS JOIN {granularidades}
+                    WHERE l.operator_name IS NOT NULL
+                    GROUP BY 1, 2, 3
+                """)
+                
+                cursor.execute(f"""
+                    INSERT INTO operador_estadisticas 
+                    (operator_name, granularidad, periodo, total_analisis, {', '.join(columnas_analisis)})
+                    SELECT l.operator_name, g.granularidad, {periodo},
+                           COUNT(a.id), {agregados_analisis}
+                    FROM (
+                        SELECT DISTINCT ON (llamada_id) * FROM analisis_llamadas 
+                        ORDER BY llamada_id, created_at DESC, id DESC
+                    ) a 
+                    JOIN llamadas l ON l.id = a.llamada_id 
+                    CROSS JOIN {granularidades}
+                    WHERE l.operator_name IS NOT NULL
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT (operator_name, granularidad, periodo) DO UPDATE 
+                    SET total_analisis = EXCLUDED.total_analisis, 
+                        {', '.join(f"{columna} = EXCLUDED.{columna}" for columna in columnas_analisis)}
+                """)
+                
+                cursor.execute("SELECT COUNT(*) FROM operador_estadisticas")
+                filas = cursor.fetchone()[0]
+                conn.commit()
+                logging.info(f"Estadísticas de operadores reconstruidas: {filas} filas")
+                return filas
 
 db_manager = DatabaseManager()
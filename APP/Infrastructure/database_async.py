@@ -0,0 +1,253 @@
+import asyncio
+import itertools
+import json
+import logging
+import re
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any, Tuple
+from config import settings
+from APP.Infrastructure.database import (
+    GRANULARIDADES, PERIODO_TOTAL, SQL_ACUMULAR_ESTADISTICAS, COLUMNAS_ESTADISTICAS,
+    SQL_INDEXAR_TRANSCRIPCIONES, SQL_BUSCAR_LLAMADAS, SQL_FILTRO_CURSOR_BUSQUEDA,
+    codificar_cursor, decodificar_cursor, fecha_sin_zona, columna_orden_llamadas,
+    fila_llamada, deltas_llamadas, filas_estadisticas, promedios_estadisticas,
+    decodificar_cursor_busqueda, paginar_busqueda
+)
+from APP.Infrastructure.metricas import instrumentar_metodos, DB_ASYNC_DURACION
+
+# Tres claves (operator_name, granularidad, periodo) más una columna por contador
+MARCADORES_ESTADISTICAS = "(" + ", ".join(f"${i}" for i in range(1, len(COLUMNAS_ESTADISTICAS) + 4)) + ")"
+
+
+def _marcadores_asyncpg(sql: str) -> str:
+    """Pasa los %s de psycopg2 a $1, $2... para reutilizar las mismas consultas."""
+    contador = itertools.count(1)
+    return re.sub(r"%s", lambda _: f"${next(contador)}", sql)
+
+
+def _fecha(valor: Optional[str]) -> Optional[datetime]:
+    # psycopg2 envía el texto ISO y PostgreSQL descarta la zona en columnas TIMESTAMP; aquí igual
+    if not valor:
+        return None
+    return datetime.fromisoformat(valor.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+async def _configurar_conexion(conn):
+    for tipo in ('json', 'jsonb'):
+        await conn.set_type_codec(tipo, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+@instrumentar_metodos(DB_ASYNC_DURACION)
+class DatabaseManagerAsync:
+    """Versión asyncpg de las consultas del camino caliente de la API (CRUD de llamadas).
+
+    Mismo esquema y mismos resultados que ``DatabaseManager``; las escrituras de análisis, los
+    jobs y las migraciones siguen en el gestor síncrono.
+    """
+
+    def __init__(self):
+        self.connection_params = {
+            'host': settings.database_host,
+            'port': settings.database_port,
+            'database': settings.database_name,
+            'user': settings.database_user,
+            'password': settings.database_password
+        }
+        # El pool pertenece al event loop que lo crea: se abre en el primer uso dentro de la app
+        self._pool = None
+        self._lock_pool: Optional[asyncio.Lock] = None
+
+    async def _obtener_pool(self):
+        if self._pool is None:
+            if self._lock_pool is None:
+                self._lock_pool = asyncio.Lock()
+            async with self._lock_pool:
+                if self._pool is None:
+                    import asyncpg
+                    self._pool = await asyncpg.create_pool(
+                        **self.connection_params,
+                        min_size=settings.database_pool_min,
+                        max_size=settings.database_pool_max,
+                        max_inactive_connection_lifetime=settings.database_pool_idle_timeout_segundos,
+                        init=_configurar_conexion
+                    )
+                    logging.info(f"PostgreSQL (asyncpg) conectado: {settings.database_host}:{settings.database_port}")
+        return self._pool
+
+    async def cerrar(self):
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+    def estadisticas_pool(self) -> Dict[str, Any]:
+        if self._pool is None:
+            return {"inicializado": False}
+        return {
+            "min_conexiones": self._pool.get_min_size(),
+            "max_conexiones": self._pool.get_max_size(),
+            "abiertas": self._pool.get_size(),
+            "libres": self._pool.get_idle_size(),
+            "en_uso": self._pool.get_size() - self._pool.get_idle_size(),
+        }
+
+    async def guardar_llamada(self, llamada_data: Dict[str, Any]) -> str:
+        fila = fila_llamada(llamada_data)
+        pool = await self._obtener_pool()
+        async with pool.acquire(timeout=settings.database_pool_timeout_espera_segundos) as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    INSERT INTO llamadas
+                    (id, customer_name, operator_name, start_at, end_at,
+                     duration_seconds, palabras_clave, transcripcion_archivo)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                """, fila[0], fila[1], fila[2], _fecha(fila[3]), _fecha(fila[4]), fila[5],
+                    llamada_data.get('palabras_clave', []), fila[7])
+
+                filas = filas_estadisticas(deltas_llamadas([fila]))
+                if filas:
+                    await conn.executemany(SQL_ACUMULAR_ESTADISTICAS % MARCADORES_ESTADISTICAS, filas)
+
+        logging.info(f"Llamada guardada: {llamada_data['id']}")
+        return llamada_data['id']
+
+    async def obtener_llamada(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self._obtener_pool()
+        row = await pool.fetchrow("SELECT * FROM llamadas WHERE id = $1", llamada_id)
+        return dict(row) if row else None
+
+    async def listar_llamadas(
+        self,
+        limit: int = 50,
+        cursor_pagina: Optional[str] = None,
+        operator_name: Optional[str] = None,
+        customer_name: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None,
+        palabra_clave: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        orden = columna_orden_llamadas(desde, hasta)
+        condiciones = []
+        parametros = []
+
+        def condicion(plantilla: str, *valores):
+            marcadores = [f"${len(parametros) + i + 1}" for i in range(len(valores))]
+            condiciones.append(plantilla.format(*marcadores))
+            parametros.extend(valores)
+
+        if cursor_pagina:
+            condicion(f"({orden}, id) < ({{}}, {{}})", *decodificar_cursor(cursor_pagina))
+        if operator_name:
+            condicion("operator_name = {}", operator_name)
+        if customer_name:
+            condicion("customer_name = {}", customer_name)
+        if desde:
+            condicion("start_at >= {}", fecha_sin_zona(desde))
+        if hasta:
+            condicion("start_at < {}", fecha_sin_zona(hasta))
+        if palabra_clave:
+            condicion("palabras_clave @> {}::jsonb", [palabra_clave])
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+        pool = await self._obtener_pool()
+        rows = await pool.fetch(f"""
+            SELECT * FROM llamadas
+            {where}
+            ORDER BY {orden} DESC, id DESC
+            LIMIT ${len(parametros) + 1}
+        """, *parametros, limit + 1)
+        llamadas = [dict(row) for row in rows]
+
+        siguiente = None
+        if len(llamadas) > limit:
+            llamadas = llamadas[:limit]
+            ultima = llamadas[-1]
+            siguiente = codificar_cursor(ultima[orden], ultima['id'])
+
+        return llamadas, siguiente
+
+    async def indexar_transcripciones(self, filas: List[tuple]) -> int:
+        if not filas:
+            return 0
+        valores = ", ".join("(%s, %s, %s)" for _ in filas)
+        pool = await self._obtener_pool()
+        estado = await pool.execute(
+            _marcadores_asyncpg(SQL_INDEXAR_TRANSCRIPCIONES % valores),
+            *[valor for fila in filas for valor in fila]
+        )
+        # asyncpg devuelve la etiqueta del comando: "INSERT 0 <filas>"
+        return int(estado.split()[-1])
+
+    async def buscar_llamadas(
+        self,
+        consulta: str,
+        limit: int = 20,
+        cursor_pagina: Optional[str] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        parametros = [consulta]
+        filtro_cursor = ""
+        if cursor_pagina:
+            filtro_cursor = SQL_FILTRO_CURSOR_BUSQUEDA
+            parametros.extend(decodificar_cursor_busqueda(cursor_pagina))
+
+        pool = await self._obtener_pool()
+        rows = await pool.fetch(
+            _marcadores_asyncpg(SQL_BUSCAR_LLAMADAS.format(filtro_cursor=filtro_cursor)),
+            *parametros, limit + 1
+        )
+        return paginar_busqueda([dict(row) for row in rows], limit)
+
+    async def obtener_analisis(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self._obtener_pool()
+        row = await pool.fetchrow("""
+            SELECT * FROM analisis_llamadas
+            WHERE llamada_id = $1
+            ORDER BY created_at DESC
+            LIMIT 1
+        """, llamada_id)
+        return dict(row) if row else None
+
+    async def obtener_job_analisis(self, job_id: str) -> Optional[Dict[str, Any]]:
+        pool = await self._obtener_pool()
+        row = await pool.fetchrow("SELECT * FROM analisis_jobs WHERE id = $1", job_id)
+        return dict(row) if row else None
+
+    async def listar_jobs_analisis(self, estado: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        pool = await self._obtener_pool()
+        rows = await pool.fetch("""
+            SELECT * FROM analisis_jobs
+            WHERE $1::varchar IS NULL OR estado = $1
+            ORDER BY created_at DESC
+            LIMIT $2
+        """, estado, limit)
+        return [dict(row) for row in rows]
+
+    async def obtener_estadisticas_operador(self, operator_name: str) -> Dict[str, Any]:
+        pool = await self._obtener_pool()
+        row = await pool.fetchrow("""
+            SELECT * FROM operador_estadisticas
+            WHERE operator_name = $1 AND granularidad = 'total' AND periodo = $2
+        """, operator_name, PERIODO_TOTAL)
+        return promedios_estadisticas(row) if row else {}
+
+    async def obtener_estadisticas_operador_por_periodo(
+        self,
+        operator_name: str,
+        granularidad: str,
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None
+    ) -> List[Dict[str, Any]]:
+        if granularidad not in GRANULARIDADES or granularidad == 'total':
+            raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+        pool = await self._obtener_pool()
+        rows = await pool.fetch("""
+            SELECT * FROM operador_estadisticas
+            WHERE operator_name = $1 AND granularidad = $2
+              AND periodo >= $3 AND periodo <= $4
+            ORDER BY periodo
+        """, operator_name, granularidad, desde or date.min, hasta or date.max)
+        return [{'periodo': row['periodo'], **promedios_estadisticas(row)} for row in rows]
+
+
+db_manager_async = DatabaseManagerAsync()
@@ -0,0 +1,155 @@
+import csv
+import io
+import itertools
+import json
+import logging
+from datetime import datetime, date
+from pathlib import Path
+from typing import Iterable, Iterator, List, Dict, Any
+from APP.Infrastructure.database import COLUMNAS_EXPORTACION
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# formato -> (media type, extensión)
+FORMATOS_EXPORTACION = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+COLUMNA_PARTICION = "start_at"
+
+
+def _valor_texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, (list, dict)):
+        return json.dumps(valor, ensure_ascii=False)
+    return valor
+
+
+def _valor_json(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    return valor
+
+
+def fragmentos_csv(bloques: Iterable[List[tuple]]) -> Iterator[str]:
+    """Cabecera y un fragmento de texto CSV por bloque de filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(COLUMNAS_EXPORTACION)
+    yield buffer.getvalue()
+
+    for filas in bloques:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows([_valor_texto(valor) for valor in fila] for fila in filas)
+        yield buffer.getvalue()
+
+
+def fragmentos_ndjson(bloques: Iterable[List[tuple]]) -> Iterator[str]:
+    """Un objeto JSON por línea; un fragmento por bloque de filas."""
+    for filas in bloques:
+        yield "".join(
+            json.dumps(dict(zip(COLUMNAS_EXPORTACION, map(_valor_json, fila))), ensure_ascii=False) + "\n"
+            for fila in filas
+        )
+
+
+def fragmentos_exportacion(formato: str, bloques: Iterable[List[tuple]]) -> Iterator[str]:
+    if formato == "csv":
+        return fragmentos_csv(bloques)
+    if formato == "ndjson":
+        return fragmentos_ndjson(bloques)
+    raise ValueError(f"Formato de exportación no soportado: {formato}")
+
+
+def _esquema_parquet():
+    marca_tiempo = pyarrow.timestamp("us")
+    tipos = {
+        'start_at': marca_tiempo,
+        'end_at': marca_tiempo,
+        'created_at': marca_tiempo,
+        'analizado_at': marca_tiempo,
+        'duration_seconds': pyarrow.float32(),
+        'palabras_clave': pyarrow.list_(pyarrow.string()),
+        'analisis_id': pyarrow.int32(),
+        'regulacion_cumplimiento': pyarrow.int16(),
+        'habilidad_comercial': pyarrow.int16(),
+        'conocimiento_producto': pyarrow.int16(),
+        'cierre_venta': pyarrow.int16(),
+        'puntuacion_general': pyarrow.int16(),
+    }
+    return pyarrow.schema([(columna, tipos.get(columna, pyarrow.string())) for columna in COLUMNAS_EXPORTACION])
+
+
+def escribir_parquet(
+    bloques: Iterable[List[tuple]],
+    directorio: str,
+    filas_por_grupo: int = 50000,
+    compresion: str = "zstd"
+) -> Dict[str, Any]:
+    """Escribe las filas en Parquet particionado por día de ``start_at`` (``fecha=AAAA-MM-DD/``).
+
+    Las filas llegan ordenadas por ``start_at``: cada día va seguido a un único archivo y solo
+    hay un escritor abierto a la vez. Se acumulan como mucho ``filas_por_grupo`` filas (un row
+    group) antes de escribir, así que la memoria no depende del total de filas.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Se necesita pyarrow para exportar a Parquet (pip install pyarrow)")
+
+    base = Path(directorio)
+    if base.exists() and any(base.iterdir()):
+        raise ValueError(f"El directorio de salida no está vacío: {directorio}")
+
+    esquema = _esquema_parquet()
+    indice_fecha = COLUMNAS_EXPORTACION.index(COLUMNA_PARTICION)
+    escritor = None
+    fecha_actual = None
+    pendientes: List[tuple] = []
+    particiones = 0
+    filas_escritas = 0
+
+    def volcar():
+        if pendientes:
+            columnas = list(zip(*pendientes))
+            escritor.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)],
+                schema=esquema
+            ))
+            pendientes.clear()
+
+    try:
+        for filas in bloques:
+            for fecha, grupo in itertools.groupby(filas, key=lambda fila: fila[indice_fecha].date()):
+                if fecha != fecha_actual:
+                    # Empieza un día nuevo: se cierra el archivo del anterior
+                    if escritor is not None:
+                        volcar()
+                        escritor.close()
+                    particion = base / f"fecha={fecha.isoformat()}"
+                    particion.mkdir(parents=True, exist_ok=True)
+                    escritor = pyarrow.parquet.ParquetWriter(
+                        particion / "llamadas.parquet", esquema, compression=compresion
+                    )
+                    fecha_actual = fecha
+                    particiones += 1
+                for fila in grupo:
+                    pendientes.append(fila)
+                    if len(pendientes) >= filas_por_grupo:
+                        volcar()
+            filas_escritas += len(filas)
+        if escritor is not None:
+            volcar()
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+    logging.info(f"Exportación Parquet: {filas_escritas} filas en {particiones} particiones ({directorio})")
+    return {"filas": filas_escritas, "particiones": particiones}
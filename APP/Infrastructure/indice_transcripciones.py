@@ -0,0 +1,164 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, Tuple
+
+ORDENES_VALIDOS = ('fecha_guardado', 'longitud_palabras', 'tamano_bytes')
+
+
+class IndiceTranscripciones:
+    """Índice persistente (SQLite) con los metadatos de cada transcripción guardada.
+
+    Se actualiza al guardar y eliminar, de modo que listar no necesita recorrer el
+    almacenamiento: las consultas usan índices y cuestan O(limit). Solo está ``poblado``
+    tras un ``reconstruir`` completo; hasta entonces no refleja lo que ya había en disco.
+    """
+
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self.es_nuevo = not self.ruta.exists()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.ruta), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._crear_tablas()
+
+    def _crear_tablas(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS transcripciones (
+                    llamada_id TEXT PRIMARY KEY,
+                    operator_name TEXT,
+                    customer_name TEXT,
+                    fecha_guardado TEXT NOT NULL,
+                    longitud_palabras INTEGER NOT NULL DEFAULT 0,
+                    tamano_bytes INTEGER NOT NULL DEFAULT 0,
+                    archivo TEXT
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_fecha ON transcripciones (fecha_guardado)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_palabras ON transcripciones (longitud_palabras)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tamano ON transcripciones (tamano_bytes)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_operador_fecha ON transcripciones (operator_name, fecha_guardado)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cliente_fecha ON transcripciones (customer_name, fecha_guardado)")
+            existia_estado = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estado'"
+            ).fetchone()
+            self._conn.execute("CREATE TABLE IF NOT EXISTS estado (clave TEXT PRIMARY KEY, valor TEXT NOT NULL)")
+            if not existia_estado and not self.es_nuevo:
+                # Los índices anteriores a esta tabla se llenaban completos al abrirse
+                self._conn.execute("INSERT INTO estado (clave, valor) VALUES ('poblado', '1')")
+
+    @property
+    def poblado(self) -> bool:
+        """True si el índice se llenó con todo el almacenamiento (se consulta cada vez: la CLI puede reconstruirlo)."""
+        with self._lock:
+            fila = self._conn.execute("SELECT valor FROM estado WHERE clave = 'poblado'").fetchone()
+        return fila is not None and fila[0] == '1'
+
+    def _marcar_poblado(self, poblado: bool):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO estado (clave, valor) VALUES ('poblado', ?)", ('1' if poblado else '0',)
+        )
+
+    @staticmethod
+    def _fila(llamada_id: str, data: Dict[str, Any], archivo: Optional[str]) -> Tuple:
+        metadata = data.get('metadata', {})
+        transcripcion = data.get('transcripcion', {})
+        texto = transcripcion.get('texto') or ""
+        return (
+            llamada_id,
+            metadata.get('operator_name'),
+            metadata.get('customer_name'),
+            metadata.get('fecha_guardado') or datetime.now().isoformat(),
+            transcripcion.get('longitud_palabras', len(texto.split())),
+            len(texto.encode('utf-8')),
+            archivo
+        )
+
+    def registrar_lote(self, entradas: Iterable[Tuple[str, Dict[str, Any], Optional[str]]]):
+        filas = [self._fila(llamada_id, data, archivo) for llamada_id, data, archivo in entradas]
+        with self._lock, self._conn:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO transcripciones
+                (llamada_id, operator_name, customer_name, fecha_guardado, longitud_palabras, tamano_bytes, archivo)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, filas)
+
+    def registrar(self, llamada_id: str, data: Dict[str, Any], archivo: Optional[str] = None):
+        self.registrar_lote([(llamada_id, data, archivo)])
+
+    def eliminar(self, llamada_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transcripciones WHERE llamada_id = ?", (llamada_id,))
+
+    def consultar(
+        self,
+        limit: Optional[int] = None,
+        orden: str = 'fecha_guardado',
+        descendente: bool = True,
+        operator_name: Optional[str] = None,
+        customer_name: Optional[str] = None,
+        desde: Optional[datetime] = None,
+        hasta: Optional[datetime] = None
+    ) -> List[Dict[str, Any]]:
+        if orden not in ORDENES_VALIDOS:
+            raise ValueError(f"Orden no soportado: {orden}")
+
+        condiciones = []
+        parametros = []
+        if operator_name:
+            condiciones.append("operator_name = ?")
+            parametros.append(operator_name)
+        if customer_name:
+            condiciones.append("customer_name = ?")
+            parametros.append(customer_name)
+        if desde:
+            condiciones.append("fecha_guardado >= ?")
+            parametros.append(desde.isoformat())
+        if hasta:
+            condiciones.append("fecha_guardado < ?")
+            parametros.append(hasta.isoformat())
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        direccion = "DESC" if descendente else "ASC"
+        with self._lock:
+            filas = self._conn.execute(f"""
+                SELECT * FROM transcripciones {where}
+                ORDER BY {orden} {direccion}, llamada_id {direccion}
+                LIMIT ?
+            """, (*parametros, -1 if limit is None else limit)).fetchall()
+
+        return [dict(fila) for fila in filas]
+
+    def reconstruir(self, almacenamiento) -> int:
+        """Vacía el índice y lo vuelve a llenar leyendo todas las transcripciones del almacenamiento."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM transcripciones")
+            self._marcar_poblado(False)
+
+        total = 0
+        lote = []
+        for entrada in almacenamiento.listar():
+            data = almacenamiento.leer(entrada['llamada_id'])
+            if data is None:
+                continue
+            lote.append((entrada['llamada_id'], data, entrada['archivo']))
+            if len(lote) >= 1000:
+                self.registrar_lote(lote)
+                total += len(lote)
+                lote = []
+        if lote:
+            self.registrar_lote(lote)
+            total += len(lote)
+        with self._lock, self._conn:
+            self._marcar_poblado(True)
+
+        logging.info(f"Índice de transcripciones reconstruido: {total} entradas")
+        return total
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
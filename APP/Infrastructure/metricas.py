@@ -0,0 +1,253 @@
+import abc
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+from config import settings
+
+# Buckets en segundos: de 1 ms a 2 min, cubren desde una consulta hasta un generate largo
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+BUCKETS_TOKENS_POR_SEGUNDO = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BUCKETS_TOKENS = (16, 32, 64, 128, 256, 512, 1024, 2048)
+BUCKETS_FRACCION = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+
+
+def _formatear_etiquetas(nombres: Tuple[str, ...], valores: Tuple[str, ...], extra: str = "") -> str:
+    partes = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        partes.append(extra)
+    return "{" + ",".join(partes) + "}" if partes else ""
+
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Metrica(abc.ABC):
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _clave(self, etiquetas: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(etiquetas.get(nombre, "")) for nombre in self.etiquetas)
+
+    def exportar(self) -> List[str]:
+        return [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"] + self._muestras()
+
+    @abc.abstractmethod
+    def _muestras(self) -> List[str]:
+        ...
+
+
+class Contador(Metrica):
+    tipo = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, valor: float = 1, **etiquetas):
+        if not settings.metricas_habilitadas:
+            return
+        clave = self._clave(etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + valor
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            valores = dict(self._valores)
+        return [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, clave)} {_numero(valor)}"
+            for clave, valor in sorted(valores.items())
+        ]
+
+
+class Histograma(Metrica):
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (), buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # clave -> [conteos por bucket (sin acumular) + desbordados, suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, **etiquetas):
+        if not settings.metricas_habilitadas:
+            return
+        clave = self._clave(etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        if not settings.metricas_habilitadas:
+            yield
+            return
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def _muestras(self) -> List[str]:
+        with self._lock:
+            series = {clave: (list(conteos), suma, total) for clave, (conteos, suma, total) in self._series.items()}
+
+        lineas = []
+        for clave, (conteos, suma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                etiquetas = _formatear_etiquetas(self.etiquetas, clave, f'le="{_numero(limite)}"')
+                lineas.append(f"{self.nombre}_bucket{etiquetas} {acumulado}")
+            etiquetas = _formatear_etiquetas(self.etiquetas, clave)
+            lineas.append(f"{self.nombre}_sum{etiquetas} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{etiquetas} {total}")
+        return lineas
+
+
+class GaugeFuncion(Metrica):
+    """Gauge que se calcula al exportar; no cuesta nada entre scrapes."""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, funcion: Callable[[], Optional[float]]):
+        super().__init__(nombre, ayuda)
+        self.funcion = funcion
+
+    def _muestras(self) -> List[str]:
+        valor = self.funcion()
+        return [] if valor is None else [f"{self.nombre} {_numero(valor)}"]
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: Dict[str, Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica: Metrica) -> Metrica:
+        with self._lock:
+            existente = self._metricas.get(metrica.nombre)
+            if existente is not None:
+                return existente
+            self._metricas[metrica.nombre] = metrica
+            return metrica
+
+    def contador(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = ()) -> Contador:
+        return self._registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre: str, ayuda: str, etiquetas: Tuple[str, ...] = (), buckets=BUCKETS_SEGUNDOS) -> Histograma:
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def gauge(self, nombre: str, ayuda: str, funcion: Callable[[], Optional[float]]) -> GaugeFuncion:
+        return self._registrar(GaugeFuncion(nombre, ayuda, funcion))
+
+    def exportar(self) -> str:
+        """Formato de texto de Prometheus (0.0.4)."""
+        with self._lock:
+            metricas = sorted(self._metricas.values(), key=lambda m: m.nombre)
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exportar())
+        return "\n".join(lineas) + "\n"
+
+
+registro_metricas = RegistroMetricas()
+
+# Nombres estables: las alertas dependen de ellos, no renombrar
+HTTP_DURACION = registro_metricas.histograma(
+    "llamadas_http_duracion_segundos", "Latencia de las peticiones HTTP por ruta", ("metodo", "ruta", "estado")
+)
+DB_DURACION = registro_metricas.histograma(
+    "llamadas_db_duracion_segundos", "Duración de cada método de DatabaseManager", ("metodo", "resultado")
+)
+DB_ASYNC_DURACION = registro_metricas.histograma(
+    "llamadas_db_async_duracion_segundos", "Duración de cada método de DatabaseManagerAsync", ("metodo", "resultado")
+)
+TRANSCRIPCION_DURACION = registro_metricas.histograma(
+    "llamadas_transcripcion_duracion_segundos", "Lectura y escritura de transcripciones", ("operacion", "backend")
+)
+ANALISIS_FASE_DURACION = registro_metricas.histograma(
+    "llamadas_analisis_fase_duracion_segundos", "Tokenización, prefill y decode de cada lote de análisis", ("fase",)
+)
+ANALISIS_TOKENS_POR_SEGUNDO = registro_metricas.histograma(
+    "llamadas_analisis_tokens_por_segundo", "Velocidad de decode por lote", buckets=BUCKETS_TOKENS_POR_SEGUNDO
+)
+ANALISIS_TOKENS_GENERADOS = registro_metricas.histograma(
+    "llamadas_analisis_tokens_generados", "Tokens generados por análisis", buckets=BUCKETS_TOKENS
+)
+ANALISIS_TASA_ACEPTACION = registro_metricas.histograma(
+    "llamadas_analisis_tasa_aceptacion_borrador", "Fracción de tokens del borrador aceptados por análisis",
+    buckets=BUCKETS_FRACCION
+)
+ANALISIS_JSON_FALLOS = registro_metricas.contador(
+    "llamadas_analisis_json_fallos_total", "Respuestas del modelo que no se pudieron parsear como JSON", ("tipo",)
+)
+
+
+def instrumentar_metodos(histograma: Histograma):
+    """Decorador de clase: mide cada método público con la etiqueta ``metodo``."""
+
+    def decorar(cls):
+        for nombre, atributo in list(vars(cls).items()):
+            if nombre.startswith("_") or not callable(atributo) or isinstance(atributo, (staticmethod, classmethod)):
+                continue
+            setattr(cls, nombre, _medir_metodo(histograma, nombre, atributo))
+        return cls
+
+    return decorar
+
+
+def _medir_metodo(histograma: Histograma, nombre: str, funcion):
+    if inspect.isgeneratorfunction(funcion):
+        # Solo se mediría la creación del generador, no la iteración
+        return funcion
+    if inspect.iscoroutinefunction(funcion):
+        @functools.wraps(funcion)
+        async def envoltura_async(*args, **kwargs):
+            if not settings.metricas_habilitadas:
+                return await funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            resultado = "error"
+            try:
+                valor = await funcion(*args, **kwargs)
+                resultado = "ok"
+                return valor
+            finally:
+                histograma.observar(time.perf_counter() - inicio, metodo=nombre, resultado=resultado)
+
+        return envoltura_async
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not settings.metricas_habilitadas:
+            return funcion(*args, **kwargs)
+        inicio = time.perf_counter()
+        resultado = "error"
+        try:
+            valor = funcion(*args, **kwargs)
+            resultado = "ok"
+            return valor
+        finally:
+            histograma.observar(time.perf_counter() - inicio, metodo=nombre, resultado=resultado)
+
+    return envoltura
@@ -0,0 +1,158 @@
+import psycopg2
+import psycopg2.extensions
+import psycopg2.pool
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any
+
+
+class PoolConexiones:
+    """Pool de conexiones psycopg2 seguro entre hilos, con verificación al prestar y cierre por inactividad."""
+
+    def __init__(
+        self,
+        connection_params: Dict[str, Any],
+        min_conexiones: int,
+        max_conexiones: int,
+        idle_timeout_segundos: float,
+        timeout_espera_segundos: float,
+        verificar_tras_segundos: float,
+    ):
+        self.connection_params = connection_params
+        self.min_conexiones = max(0, min_conexiones)
+        self.max_conexiones = max(1, max_conexiones, self.min_conexiones)
+        self.idle_timeout_segundos = idle_timeout_segundos
+        self.timeout_espera_segundos = timeout_espera_segundos
+        self.verificar_tras_segundos = verificar_tras_segundos
+
+        # Pila de (conexion, ultimo_uso): se reutiliza primero la más reciente
+        self._libres = deque()
+        self._cond = threading.Condition()
+        self._en_uso = 0
+        self._esperando = 0
+        self._creadas = 0
+        self._recicladas = 0
+
+        for _ in range(self.min_conexiones):
+            self._libres.append((self._crear(), time.monotonic()))
+
+    def _crear(self):
+        conn = psycopg2.connect(**self.connection_params)
+        with self._cond:
+            self._creadas += 1
+        return conn
+
+    def _reciclar(self, conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._recicladas += 1
+
+    def _es_valida(self, conn, inactiva_segundos: float) -> bool:
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if inactiva_segundos < self.verificar_tras_segundos:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _purgar_inactivas(self) -> list:
+        # Se llama con el lock tomado; devuelve las conexiones a cerrar fuera del lock
+        ahora = time.monotonic()
+        expiradas = []
+        while (
+            self._libres
+            and len(self._libres) + self._en_uso > self.min_conexiones
+            and ahora - self._libres[0][1] > self.idle_timeout_segundos
+        ):
+            expiradas.append(self._libres.popleft()[0])
+        return expiradas
+
+    def obtener(self):
+        limite = time.monotonic() + self.timeout_espera_segundos
+        with self._cond:
+            expiradas = self._purgar_inactivas()
+            while True:
+                if self._libres:
+                    conn, ultimo_uso = self._libres.pop()
+                    self._en_uso += 1
+                    break
+                if self._en_uso < self.max_conexiones:
+                    conn, ultimo_uso = None, None
+                    self._en_uso += 1
+                    break
+
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise psycopg2.pool.PoolError(
+                        f"Tiempo de espera agotado: {self.max_conexiones} conexiones en uso"
+                    )
+                self._esperando += 1
+                self._cond.wait(timeout=restante)
+                self._esperando -= 1
+
+        for expirada in expiradas:
+            self._reciclar(expirada)
+
+        try:
+            if conn is not None and not self._es_valida(conn, time.monotonic() - ultimo_uso):
+                logging.warning("Conexión PostgreSQL inválida en el pool, se reemplaza")
+                self._reciclar(conn)
+                conn = None
+            if conn is None:
+                conn = self._crear()
+            return conn
+        except Exception:
+            with self._cond:
+                self._en_uso -= 1
+                self._cond.notify()
+            raise
+
+    def devolver(self, conn, descartar: bool = False):
+        if descartar or conn.closed:
+            self._reciclar(conn)
+            conn = None
+        elif conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error as e:
+                # El servidor cerró la conexión: se descarta pero el hueco vuelve al pool
+                logging.warning(f"Rollback fallido al devolver la conexión, se recicla: {e}")
+                self._reciclar(conn)
+                conn = None
+
+        with self._cond:
+            self._en_uso -= 1
+            if conn is not None:
+                self._libres.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def cerrar(self):
+        with self._cond:
+            libres = [conn for conn, _ in self._libres]
+            self._libres.clear()
+        for conn in libres:
+            conn.close()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "en_uso": self._en_uso,
+                "libres": len(self._libres),
+                "esperando": self._esperando,
+                "creadas": self._creadas,
+                "recicladas": self._recicladas,
+                "min_conexiones": self.min_conexiones,
+                "max_conexiones": self.max_conexiones,
+            }
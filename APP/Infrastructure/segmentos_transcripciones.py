@@ -0,0 +1,330 @@
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, Tuple
+from APP.Infrastructure.almacenamiento_transcripciones import (
+    AlmacenamientoTranscripciones,
+    AlmacenamientoPlano,
+    escribir_atomico,
+)
+
+# Registro del índice: tipo, timestamp, segmento, offset, longitud, longitud del id (+ id en utf-8)
+FORMATO_INDICE = struct.Struct('<BdIQIH')
+TIPO_ALTA = 1
+TIPO_BAJA = 2
+
+
+class AlmacenamientoSegmentos(AlmacenamientoTranscripciones):
+    """Transcripciones añadidas a archivos de segmento grandes con un índice de offsets en disco.
+
+    El índice (``indice.log``) es append-only y se reproduce al abrir para reconstruir el mapa
+    llamada_id -> (segmento, offset, longitud). Los datos se escriben antes que la entrada del
+    índice, así que un corte a mitad deja como mucho bytes huérfanos en el segmento.
+
+    Varios procesos de la misma máquina (workers de uvicorn, comandos de la CLI) pueden abrir
+    el directorio a la vez: escrituras y compactación se serializan con ``flock`` exclusivo
+    sobre ``segmentos/.bloqueo`` y cada proceso aplica, antes de cada operación, las entradas
+    que los demás hayan añadido al índice. La compactación sustituye el índice (otro inodo) y
+    entonces se recarga entero. ``flock`` no sirve entre máquinas (p. ej. NFS compartido).
+    """
+
+    def __init__(self, base_path: Path, max_bytes_segmento: int = 256 * 1024 * 1024):
+        self.base_path = Path(base_path)
+        self.directorio = self.base_path / "segmentos"
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes_segmento = max_bytes_segmento
+        self.plano = AlmacenamientoPlano(self.base_path)
+
+        self._lock = threading.RLock()
+        self._bloqueo = open(self.directorio / ".bloqueo", 'ab')
+        self._ubicaciones: Dict[str, Tuple[int, int, int, float]] = {}
+        self._bytes_muertos: Dict[int, int] = {}
+        self._mapas: Dict[int, mmap.mmap] = {}
+        self._fd_lectura: Dict[int, int] = {}
+
+        self._ruta_indice = self.directorio / "indice.log"
+        open(self._ruta_indice, 'ab').close()
+        self._indice = None
+        self._inodo_indice: Optional[int] = None
+        self._posicion_indice = 0
+        self._segmento_activo = 1
+        self._escritura = None
+        self._segmento_escritura: Optional[int] = None
+
+        with self._exclusivo():
+            pass
+
+    def _ruta_segmento(self, segmento: int) -> Path:
+        return self.directorio / f"segmento_{segmento:06d}.log"
+
+    def _segmentos_en_disco(self) -> list:
+        return sorted(int(ruta.stem.split('_')[1]) for ruta in self.directorio.glob("segmento_*.log"))
+
+    @contextmanager
+    def _exclusivo(self):
+        """Bloqueo entre procesos para escribir; dentro, el estado en memoria coincide con el disco."""
+        with self._lock:
+            fcntl.flock(self._bloqueo, fcntl.LOCK_EX)
+            try:
+                self._sincronizar(truncar=True)
+                self._alinear_segmento_activo()
+                yield
+            finally:
+                fcntl.flock(self._bloqueo, fcntl.LOCK_UN)
+
+    def _sincronizar(self, truncar: bool = False):
+        """Aplica las entradas del índice añadidas desde la última lectura (propias o de otros procesos).
+
+        Con ``truncar`` (solo con el bloqueo exclusivo, sin escritor a medias) se descarta el
+        registro final incompleto que deja un corte.
+        """
+        estado = os.stat(self._ruta_indice)
+        if estado.st_ino == self._inodo_indice and estado.st_size == self._posicion_indice:
+            return
+
+        with open(self._ruta_indice, 'rb') as f:
+            inodo = os.fstat(f.fileno()).st_ino
+            recarga = inodo != self._inodo_indice
+            if recarga:
+                # Primera carga o índice compactado por otro proceso: se reconstruye el mapa entero
+                self._ubicaciones.clear()
+                self._bytes_muertos.clear()
+                self._cerrar_lectores()
+                self._inodo_indice = inodo
+                self._posicion_indice = 0
+                if self._indice is not None:
+                    self._indice.close()
+                self._indice = open(self._ruta_indice, 'ab')
+            f.seek(self._posicion_indice)
+            contenido = f.read()
+
+        consumidos = self._aplicar_indice(contenido, contar_muertos=not recarga)
+        self._posicion_indice += consumidos
+        if truncar and consumidos < len(contenido):
+            logging.warning(f"Índice de segmentos truncado en el byte {self._posicion_indice}, se ignora el resto")
+            with open(self._ruta_indice, 'r+b') as f:
+                f.truncate(self._posicion_indice)
+        if recarga:
+            self._calcular_bytes_muertos()
+
+    def _aplicar_indice(self, contenido: bytes, contar_muertos: bool) -> int:
+        """Reproduce los registros completos de ``contenido``; devuelve los bytes consumidos."""
+        posicion = 0
+        while posicion + FORMATO_INDICE.size <= len(contenido):
+            tipo, timestamp, segmento, offset, longitud, longitud_id = FORMATO_INDICE.unpack_from(contenido, posicion)
+            fin = posicion + FORMATO_INDICE.size + longitud_id
+            if fin > len(contenido):
+                break
+            llamada_id = contenido[posicion + FORMATO_INDICE.size:fin].decode('utf-8')
+            posicion = fin
+
+            anterior = self._ubicaciones.pop(llamada_id, None)
+            if anterior and contar_muertos:
+                self._bytes_muertos[anterior[0]] = self._bytes_muertos.get(anterior[0], 0) + anterior[2]
+            if tipo == TIPO_ALTA:
+                self._ubicaciones[llamada_id] = (segmento, offset, longitud, timestamp)
+                self._segmento_activo = max(self._segmento_activo, segmento)
+        return posicion
+
+    def _calcular_bytes_muertos(self):
+        """Bytes muertos de cada segmento = tamaño en disco - bytes de registros vivos.
+
+        No se pueden contar reproduciendo el índice: tras compactar solo guarda las altas vivas.
+        Incluye también los bytes huérfanos que deja un corte entre datos e índice.
+        """
+        vivos: Dict[int, int] = {}
+        for segmento, _, longitud, _ in self._ubicaciones.values():
+            vivos[segmento] = vivos.get(segmento, 0) + longitud
+        for segmento in self._segmentos_en_disco():
+            muertos = self._ruta_segmento(segmento).stat().st_size - vivos.get(segmento, 0)
+            if muertos > 0:
+                self._bytes_muertos[segmento] = muertos
+
+    def _alinear_segmento_activo(self):
+        """Escribe en el último segmento, aunque lo haya abierto otro proceso.
+
+        Al rotar, el segmento nuevo recibe su entrada del índice con el bloqueo aún tomado, así
+        que tras sincronizar ``_segmento_activo`` ya es el último; al abrir se mira el directorio.
+        """
+        if self._escritura is None:
+            segmentos = self._segmentos_en_disco()
+            self._segmento_activo = max(segmentos[-1] if segmentos else 1, self._segmento_activo)
+        if self._segmento_activo != self._segmento_escritura:
+            self._abrir_segmento_activo()
+        self._tamano_activo = os.fstat(self._escritura.fileno()).st_size
+
+    def _abrir_segmento_activo(self):
+        if self._escritura is not None:
+            self._escritura.close()
+        self._escritura = open(self._ruta_segmento(self._segmento_activo), 'ab')
+        self._segmento_escritura = self._segmento_activo
+        self._tamano_activo = self._escritura.tell()
+
+    def _rotar_segmento(self):
+        self._segmento_activo += 1
+        self._abrir_segmento_activo()
+
+    def _registrar(self, tipo: int, llamada_id: str, segmento: int = 0, offset: int = 0, longitud: int = 0) -> float:
+        timestamp = time.time()
+        id_bytes = llamada_id.encode('utf-8')
+        registro = FORMATO_INDICE.pack(tipo, timestamp, segmento, offset, longitud, len(id_bytes)) + id_bytes
+        self._indice.write(registro)
+        self._indice.flush()
+        self._posicion_indice += len(registro)
+        return timestamp
+
+    def _leer_bytes(self, segmento: int, offset: int, longitud: int) -> bytes:
+        # Segmentos cerrados: mmap; segmento activo (sigue creciendo): un único pread
+        if segmento != self._segmento_activo:
+            mapa = self._mapas.get(segmento)
+            if mapa is None or offset + longitud > len(mapa):
+                # Mapeado cuando aún era el activo de otro proceso: se vuelve a mapear entero
+                if mapa is not None:
+                    mapa.close()
+                with open(self._ruta_segmento(segmento), 'rb') as f:
+                    mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._mapas[segmento] = mapa
+            return mapa[offset:offset + longitud]
+
+        fd = self._fd_lectura.get(segmento)
+        if fd is None:
+            fd = os.open(self._ruta_segmento(segmento), os.O_RDONLY)
+            self._fd_lectura[segmento] = fd
+        return os.pread(fd, longitud, offset)
+
+    def _cerrar_lectores(self):
+        for mapa in self._mapas.values():
+            mapa.close()
+        for fd in self._fd_lectura.values():
+            os.close(fd)
+        self._mapas.clear()
+        self._fd_lectura.clear()
+
+    def guardar(self, llamada_id: str, data: Dict[str, Any]) -> str:
+        contenido = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        with self._exclusivo():
+            if self._tamano_activo and self._tamano_activo + len(contenido) > self.max_bytes_segmento:
+                self._rotar_segmento()
+
+            segmento, offset = self._segmento_activo, self._tamano_activo
+            self._escritura.write(contenido)
+            self._escritura.flush()
+            self._tamano_activo += len(contenido)
+
+            anterior = self._ubicaciones.get(llamada_id)
+            if anterior:
+                self._bytes_muertos[anterior[0]] = self._bytes_muertos.get(anterior[0], 0) + anterior[2]
+            timestamp = self._registrar(TIPO_ALTA, llamada_id, segmento, offset, len(contenido))
+            self._ubicaciones[llamada_id] = (segmento, offset, len(contenido), timestamp)
+
+        return f"{self._ruta_segmento(segmento)}#{offset}"
+
+    def leer(self, llamada_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._sincronizar()
+            ubicacion = self._ubicaciones.get(llamada_id)
+            if ubicacion is not None:
+                try:
+                    contenido = self._leer_bytes(*ubicacion[:3])
+                except FileNotFoundError:
+                    # Otro proceso acaba de compactar ese segmento: el índice nuevo ya está en disco
+                    self._inodo_indice = None
+                    self._sincronizar()
+                    ubicacion = self._ubicaciones.get(llamada_id)
+                    if ubicacion is not None:
+                        contenido = self._leer_bytes(*ubicacion[:3])
+
+        if ubicacion is None:
+            return self.plano.leer(llamada_id)
+        return json.loads(contenido)
+
+    def eliminar(self, llamada_id: str) -> bool:
+        with self._exclusivo():
+            ubicacion = self._ubicaciones.pop(llamada_id, None)
+            if ubicacion:
+                self._registrar(TIPO_BAJA, llamada_id)
+                self._bytes_muertos[ubicacion[0]] = self._bytes_muertos.get(ubicacion[0], 0) + ubicacion[2]
+
+        return self.plano.eliminar(llamada_id) or ubicacion is not None
+
+    def listar(self) -> Iterator[Dict[str, Any]]:
+        yield from self.plano.listar()
+        with self._lock:
+            self._sincronizar()
+            ubicaciones = list(self._ubicaciones.items())
+        for llamada_id, (segmento, offset, _, timestamp) in ubicaciones:
+            yield {
+                'llamada_id': llamada_id,
+                'archivo': f"{self._ruta_segmento(segmento).name}#{offset}",
+                'fecha_modificacion': datetime.fromtimestamp(timestamp)
+            }
+
+    def compactar(self, umbral_muertos: float = 0.3) -> Dict[str, int]:
+        """Reescribe los segmentos cerrados con al menos ``umbral_muertos`` de bytes borrados."""
+        with self._exclusivo():
+            candidatos = []
+            for segmento in self._segmentos_en_disco():
+                if segmento == self._segmento_activo:
+                    continue
+                tamano = self._ruta_segmento(segmento).stat().st_size
+                if tamano and self._bytes_muertos.get(segmento, 0) / tamano >= umbral_muertos:
+                    candidatos.append(segmento)
+
+            if not candidatos:
+                return {'segmentos_compactados': 0, 'registros_movidos': 0}
+
+            # Los registros vivos se copian al final del segmento activo
+            movidos = 0
+            for llamada_id, (segmento, offset, longitud, timestamp) in list(self._ubicaciones.items()):
+                if segmento not in candidatos:
+                    continue
+                contenido = self._leer_bytes(segmento, offset, longitud)
+                if self._tamano_activo and self._tamano_activo + longitud > self.max_bytes_segmento:
+                    self._rotar_segmento()
+                nuevo_offset = self._tamano_activo
+                self._escritura.write(contenido)
+                self._tamano_activo += longitud
+                self._ubicaciones[llamada_id] = (self._segmento_activo, nuevo_offset, longitud, timestamp)
+                movidos += 1
+            self._escritura.flush()
+            os.fsync(self._escritura.fileno())
+
+            # Índice nuevo con solo los registros vivos, sustituido de forma atómica; los demás
+            # procesos ven el cambio de inodo y lo recargan
+            registros = bytearray()
+            for llamada_id, (segmento, offset, longitud, timestamp) in self._ubicaciones.items():
+                id_bytes = llamada_id.encode('utf-8')
+                registros += FORMATO_INDICE.pack(TIPO_ALTA, timestamp, segmento, offset, longitud, len(id_bytes)) + id_bytes
+            self._indice.close()
+            escribir_atomico(self._ruta_indice, bytes(registros))
+            self._indice = open(self._ruta_indice, 'ab')
+            self._inodo_indice = os.fstat(self._indice.fileno()).st_ino
+            self._posicion_indice = len(registros)
+
+            for segmento in candidatos:
+                mapa = self._mapas.pop(segmento, None)
+                if mapa is not None:
+                    mapa.close()
+                fd = self._fd_lectura.pop(segmento, None)
+                if fd is not None:
+                    os.close(fd)
+                self._ruta_segmento(segmento).unlink()
+                self._bytes_muertos.pop(segmento, None)
+
+        logging.info(f"Compactación de segmentos: {len(candidatos)} segmentos, {movidos} registros movidos")
+        return {'segmentos_compactados': len(candidatos), 'registros_movidos': movidos}
+
+    def cerrar(self):
+        with self._lock:
+            self._escritura.close()
+            self._indice.close()
+            self._cerrar_lectores()
+            self._bloqueo.close()
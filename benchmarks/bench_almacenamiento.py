@@ -0,0 +1,91 @@
+"""
+Compara los backends de almacenamiento de transcripciones (archivo por llamada vs segmentos).
+
+Uso: python -m benchmarks.bench_almacenamiento --n 100000 1000000 --backends plano segmentos
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+from APP.Infrastructure.almacenamiento_transcripciones import crear_almacenamiento
+
+
+def documento_sintetico(llamada_id: str, palabras: int = 150) -> dict:
+    vocabulario = ["factura", "cuenta", "pago", "servicio", "ayuda", "cliente", "plan", "oferta", "gracias"]
+    texto = " ".join(random.choice(vocabulario) for _ in range(palabras))
+    return {
+        "metadata": {"llamada_id": llamada_id, "version": "1.0"},
+        "transcripcion": {"texto": f"Operador: {texto}", "longitud_palabras": palabras + 1},
+    }
+
+
+def uso_disco(directorio: Path) -> tuple:
+    archivos = 0
+    total = 0
+    for raiz, _, nombres in os.walk(directorio):
+        for nombre in nombres:
+            archivos += 1
+            total += os.path.getsize(os.path.join(raiz, nombre))
+    return archivos, total
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(backend: str, n: int, lecturas: int, directorio_base: Path) -> dict:
+    directorio = Path(tempfile.mkdtemp(prefix=f"bench_{backend}_", dir=directorio_base))
+    try:
+        almacenamiento = crear_almacenamiento(directorio, backend, compresion='ninguna')
+        ids = [str(uuid4()) for _ in range(n)]
+
+        inicio = time.perf_counter()
+        for llamada_id in ids:
+            almacenamiento.guardar(llamada_id, documento_sintetico(llamada_id))
+        escritura = time.perf_counter() - inicio
+
+        latencias = []
+        for llamada_id in random.sample(ids, min(lecturas, n)):
+            t = time.perf_counter()
+            almacenamiento.leer(llamada_id)
+            latencias.append(time.perf_counter() - t)
+
+        archivos, bytes_totales = uso_disco(directorio)
+        if hasattr(almacenamiento, 'cerrar'):
+            almacenamiento.cerrar()
+
+        return {
+            "backend": backend,
+            "n": n,
+            "escrituras_por_segundo": round(n / escritura, 1),
+            "lectura_p50_ms": round(percentil(latencias, 0.5) * 1000, 4),
+            "lectura_p99_ms": round(percentil(latencias, 0.99) * 1000, 4),
+            "archivos": archivos,
+            "bytes_en_disco": bytes_totales,
+        }
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--backends", nargs="+", default=["plano", "segmentos"])
+    parser.add_argument("--lecturas", type=int, default=10000)
+    parser.add_argument("--directorio", default=tempfile.gettempdir())
+    args = parser.parse_args()
+
+    random.seed(0)
+    for n in args.n:
+        for backend in args.backends:
+            print(json.dumps(medir(backend, n, args.lecturas, Path(args.directorio))), flush=True)
+
+
+if __name__ == "__main__":
+    main()
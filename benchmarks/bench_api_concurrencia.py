@@ -0,0 +1,130 @@
+"""
+Prueba de carga de GET /llamadas/{id} con la API en modo síncrono (psycopg2 en el threadpool)
+y asíncrono (asyncpg, APP_DATABASE_ASYNC=true).
+
+Cada modo arranca su propio uvicorn (un worker) contra el mismo PostgreSQL y las mismas llamadas
+sembradas. Para cada nivel de concurrencia se lanzan peticiones durante un tiempo fijo y se
+informa de peticiones por segundo, latencias (p50/p95/p99) y errores.
+
+Uso: python -m benchmarks.bench_api_concurrencia --concurrencia 16 64 256 --segundos 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+from benchmarks.generador import generar_llamadas, llamada_json, percentiles
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def arrancar_api(modo: str, puerto: int, directorio: str) -> subprocess.Popen:
+    entorno = dict(
+        os.environ,
+        PYTHONPATH=str(RAIZ),
+        APP_DATABASE_ASYNC="true" if modo == "async" else "false",
+        APP_CALENTAMIENTO_AL_ARRANCAR="false",
+        APP_LOG_LEVEL="WARNING",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "APP.Application.LlamadaAPP:app",
+         "--port", str(puerto), "--log-level", "warning", "--no-access-log"],
+        cwd=directorio, env=entorno
+    )
+
+
+def esperar_api(url: str, timeout: float = 60.0):
+    limite = time.time() + timeout
+    while time.time() < limite:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"La API no respondió en {url}")
+
+
+def sembrar_llamadas(url: str, cantidad: int, semilla: int = 0) -> list:
+    # Operadores con prefijo "bench:" para poder limpiarlos después (ver benchmarks.suite)
+    registros = [
+        {**llamada_json(llamada), "operator_name": f"bench:{llamada['operator_name']}"}
+        for llamada in generar_llamadas(cantidad, semilla)
+    ]
+    respuesta = httpx.post(f"{url}/llamadas/bulk", json=registros, timeout=300)
+    respuesta.raise_for_status()
+    return [r["id"] for r in respuesta.json()["resultados"] if r["ok"]]
+
+
+async def carga(url: str, rutas: list, concurrencia: int, segundos: float) -> dict:
+    """Lanza GET sobre rutas elegidas al azar desde ``concurrencia`` clientes durante ``segundos``."""
+    latencias = []
+    errores = 0
+    limite = time.perf_counter() + segundos
+
+    async def cliente(http: httpx.AsyncClient):
+        nonlocal errores
+        while time.perf_counter() < limite:
+            inicio = time.perf_counter()
+            try:
+                respuesta = await http.get(f"{url}{random.choice(rutas)}")
+                if respuesta.status_code != 200:
+                    errores += 1
+                    continue
+            except httpx.HTTPError:
+                errores += 1
+                continue
+            latencias.append(time.perf_counter() - inicio)
+
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    async with httpx.AsyncClient(limits=limites, timeout=30) as http:
+        inicio = time.perf_counter()
+        await asyncio.gather(*[cliente(http) for _ in range(concurrencia)])
+        duracion = time.perf_counter() - inicio
+
+    return {
+        "concurrencia": concurrencia,
+        "peticiones": len(latencias),
+        "errores": errores,
+        "peticiones_por_segundo": round(len(latencias) / duracion, 1),
+        **{f"latencia_{clave}": valor for clave, valor in percentiles(latencias).items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modos", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--concurrencia", nargs="+", type=int, default=[16, 64, 256])
+    parser.add_argument("--segundos", type=float, default=10.0)
+    parser.add_argument("--llamadas", type=int, default=500, help="Llamadas sembradas para las lecturas")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--directorio", default=".", help="Directorio de trabajo de la API (transcripciones)")
+    args = parser.parse_args()
+
+    url = f"http://127.0.0.1:{args.puerto}"
+    rutas = None
+    for modo in args.modos:
+        proceso = arrancar_api(modo, args.puerto, args.directorio)
+        try:
+            esperar_api(url)
+            if rutas is None:
+                rutas = [f"/llamadas/{llamada_id}" for llamada_id in sembrar_llamadas(url, args.llamadas)]
+            # Una pasada corta para abrir las conexiones del pool antes de medir
+            asyncio.run(carga(url, rutas, max(args.concurrencia), 1.0))
+            for concurrencia in args.concurrencia:
+                resultado = asyncio.run(carga(url, rutas, concurrencia, args.segundos))
+                print(json.dumps({"modo": modo, **resultado}), flush=True)
+        finally:
+            proceso.terminate()
+            proceso.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
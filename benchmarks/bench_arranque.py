@@ -0,0 +1,113 @@
+"""
+Mide el tiempo de importación y de arranque de la API; sirve de control de regresiones.
+
+Cada medida se hace en un proceso nuevo. Falla (código 1) si importar la API tarda más del
+límite o si arrastra módulos pesados (torch, transformers) o abre conexiones a PostgreSQL.
+
+Uso: python -m benchmarks.bench_arranque --repeticiones 5 --max-importacion-segundos 2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+MODULOS_PESADOS = ["torch", "transformers"]
+
+CODIGO_IMPORTACION = """
+import json, sys, time
+inicio = time.perf_counter()
+import APP.Application.LlamadaAPP as api
+duracion = time.perf_counter() - inicio
+print(json.dumps({
+    "segundos": duracion,
+    "modulos_pesados": [m for m in %r if m in sys.modules],
+    "conexion_bd_abierta": api.db_manager._pool is not None,
+}))
+"""
+
+CODIGO_ARRANQUE = """
+import json, time
+inicio = time.perf_counter()
+from fastapi.testclient import TestClient
+import APP.Application.LlamadaAPP as api
+with TestClient(api.app) as cliente:
+    respuesta = cliente.get("/health")
+    duracion = time.perf_counter() - inicio
+print(json.dumps({"segundos": duracion, "status": respuesta.status_code}))
+"""
+
+
+def ejecutar(codigo: str, directorio: str, argumentos_python: list = None) -> subprocess.CompletedProcess:
+    # Directorio de trabajo temporal: la importación no debe crear nada en el repositorio
+    entorno = dict(os.environ, PYTHONPATH=str(RAIZ))
+    return subprocess.run(
+        [sys.executable, *(argumentos_python or []), "-c", codigo],
+        cwd=directorio, env=entorno, capture_output=True, text=True
+    )
+
+
+def modulos_mas_lentos(salida_importtime: str, n: int) -> list:
+    modulos = []
+    for linea in salida_importtime.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.append((int(acumulado), nombre.strip()))
+    return [{"modulo": nombre, "ms": round(us / 1000, 1)} for us, nombre in sorted(modulos, reverse=True)[:n]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--max-importacion-segundos", type=float, default=2.0)
+    parser.add_argument("--arranque", action="store_true", help="Mide también el arranque completo (necesita PostgreSQL)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_arranque_") as directorio:
+        importaciones = []
+        for _ in range(args.repeticiones):
+            salida = ejecutar(CODIGO_IMPORTACION % MODULOS_PESADOS, directorio)
+            if salida.returncode != 0:
+                print(salida.stderr, file=sys.stderr)
+                sys.exit(1)
+            importaciones.append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+        perfil = ejecutar("import APP.Application.LlamadaAPP", directorio, ["-X", "importtime"])
+        resultado = {
+            "importacion_segundos_min": round(min(i["segundos"] for i in importaciones), 3),
+            "importacion_segundos_max": round(max(i["segundos"] for i in importaciones), 3),
+            "modulos_pesados": importaciones[-1]["modulos_pesados"],
+            "conexion_bd_abierta": importaciones[-1]["conexion_bd_abierta"],
+            "archivos_creados": sorted(os.listdir(directorio)),
+            "modulos_mas_lentos": modulos_mas_lentos(perfil.stderr, 10),
+        }
+
+        if args.arranque:
+            salida = ejecutar(CODIGO_ARRANQUE, directorio)
+            if salida.returncode == 0:
+                resultado["arranque"] = json.loads(salida.stdout.strip().splitlines()[-1])
+            else:
+                resultado["arranque"] = {"error": salida.stderr.strip().splitlines()[-1:]}
+
+    print(json.dumps(resultado, indent=2))
+
+    fallos = []
+    if resultado["importacion_segundos_min"] > args.max_importacion_segundos:
+        fallos.append(f"importación en {resultado['importacion_segundos_min']}s")
+    if resultado["modulos_pesados"]:
+        fallos.append(f"módulos pesados importados: {resultado['modulos_pesados']}")
+    if resultado["conexion_bd_abierta"]:
+        fallos.append("se abre conexión a PostgreSQL al importar")
+    if resultado["archivos_creados"]:
+        fallos.append(f"la importación crea archivos: {resultado['archivos_creados']}")
+    if fallos:
+        print("Regresión de arranque: " + "; ".join(fallos), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Compara los perfiles de carga del modelo (estandar, int8, 4bit, con o sin torch.compile).
+
+Cada perfil se ejecuta en un proceso aparte para medir la memoria residente sin interferencias.
+Se informa del tiempo de carga, la memoria, los tokens por segundo y la coincidencia de las
+puntuaciones con el perfil de referencia sobre las transcripciones de ejemplo.
+
+Uso: python -m benchmarks.bench_perfiles_modelo --perfiles estandar int8 int8+compilado --hilos 8
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+CAMPOS_PUNTUACION = [
+    ("regulacion", "cumplimiento"),
+    ("habilidad_comercial", "puntuacion"),
+    ("conocimiento_producto", "puntuacion"),
+    ("cierre_venta", "puntuacion"),
+    (None, "puntuacion_general"),
+]
+
+
+def cargar_transcripciones(directorio: Path, limite: int) -> list:
+    from APP.Infrastructure.almacenamiento_transcripciones import AlmacenamientoFragmentado
+
+    almacenamiento = AlmacenamientoFragmentado(directorio)
+    textos = []
+    for entrada in sorted(almacenamiento.listar(), key=lambda e: e['llamada_id']):
+        data = almacenamiento.leer(entrada['llamada_id'])
+        texto = (data or {}).get('transcripcion', {}).get('texto')
+        if texto:
+            textos.append(texto)
+        if len(textos) >= limite:
+            break
+    return textos
+
+
+def puntuaciones(resultado: dict) -> list:
+    valores = []
+    for seccion, campo in CAMPOS_PUNTUACION:
+        contenedor = resultado if seccion is None else resultado.get(seccion) or {}
+        valores.append(contenedor.get(campo) if isinstance(contenedor, dict) else None)
+    return valores
+
+
+def memoria_residente_mb() -> float:
+    # ru_maxrss viene en KB en Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def ejecutar_perfil(directorio: Path, limite: int) -> dict:
+    """Se ejecuta en el proceso hijo, con el perfil ya fijado en las variables de entorno."""
+    from APP.Domain.ModelManager import ModelManager
+    from APP.Application.Analisis import analizar_lote, obtener_estadisticas_generacion
+
+    textos = cargar_transcripciones(directorio, limite)
+
+    inicio = time.perf_counter()
+    manager = ModelManager()
+    carga = time.perf_counter() - inicio
+    memoria_modelo = memoria_residente_mb()
+
+    tokens_antes = obtener_estadisticas_generacion()["tokens_generados"]
+    inicio = time.perf_counter()
+    resultados = [analizar_lote([texto])[0] for texto in textos]
+    duracion = time.perf_counter() - inicio
+    tokens = obtener_estadisticas_generacion()["tokens_generados"] - tokens_antes
+
+    return {
+        **manager.estadisticas_carga,
+        "segundos_carga": round(carga, 2),
+        "memoria_modelo_mb": memoria_modelo,
+        "memoria_pico_mb": memoria_residente_mb(),
+        "transcripciones": len(textos),
+        "tokens_generados": tokens,
+        "tokens_por_segundo": round(tokens / duracion, 2) if duracion else None,
+        "segundos_por_analisis": round(duracion / len(textos), 2) if textos else None,
+        "puntuaciones": [puntuaciones(resultado) for resultado in resultados],
+    }
+
+
+def lanzar_perfil(perfil: str, args) -> dict:
+    nombre, _, extra = perfil.partition("+")
+    entorno = dict(os.environ)
+    entorno["APP_ML_MODEL_PERFIL"] = nombre
+    entorno["APP_ML_MODEL_COMPILAR"] = "true" if extra == "compilado" else "false"
+    if args.hilos:
+        entorno["APP_ML_TORCH_HILOS"] = str(args.hilos)
+    if args.hilos_interop:
+        entorno["APP_ML_TORCH_HILOS_INTEROP"] = str(args.hilos_interop)
+
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_perfiles_modelo", "--hijo",
+         "--directorio", args.directorio, "--limite", str(args.limite)],
+        env=entorno, capture_output=True, text=True
+    )
+    if salida.returncode != 0:
+        return {"perfil": perfil, "error": salida.stderr.strip().splitlines()[-1:]}
+    resultado = json.loads(salida.stdout.strip().splitlines()[-1])
+    # Sin bitsandbytes el perfil 4bit acaba cargando int8
+    resultado["perfil_efectivo"] = resultado.pop("perfil")
+    resultado["perfil"] = perfil
+    return resultado
+
+
+def coincidencia(referencia: list, otras: list) -> dict:
+    iguales = 0
+    diferencia = 0
+    total = 0
+    for fila_ref, fila in zip(referencia, otras):
+        for valor_ref, valor in zip(fila_ref, fila):
+            if valor_ref is None or valor is None:
+                continue
+            total += 1
+            iguales += valor_ref == valor
+            diferencia += abs(valor_ref - valor)
+    return {
+        "puntuaciones_comparadas": total,
+        "coincidencia_exacta": round(iguales / total, 3) if total else None,
+        "error_absoluto_medio": round(diferencia / total, 3) if total else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfiles", nargs="+", default=["estandar", "int8", "4bit"])
+    parser.add_argument("--directorio", default="transcripciones")
+    parser.add_argument("--limite", type=int, default=20)
+    parser.add_argument("--hilos", type=int, default=0)
+    parser.add_argument("--hilos-interop", type=int, default=0)
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        print(json.dumps(ejecutar_perfil(Path(args.directorio), args.limite)), flush=True)
+        return
+
+    # El primer perfil es la referencia para la coincidencia de puntuaciones
+    referencia = None
+    for perfil in args.perfiles:
+        resultado = lanzar_perfil(perfil, args)
+        if "error" not in resultado:
+            if referencia is None:
+                referencia = resultado["puntuaciones"]
+            resultado.update(coincidencia(referencia, resultado["puntuaciones"]))
+            del resultado["puntuaciones"]
+        print(json.dumps(resultado), flush=True)
+
+
+if __name__ == "__main__":
+    main()
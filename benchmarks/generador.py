@@ -0,0 +1,94 @@
+"""
+Generador de llamadas y transcripciones sintéticas para los benchmarks.
+
+Todo sale de un random.Random con semilla: la misma semilla produce exactamente las mismas
+llamadas, así que dos ejecuciones de la suite miden sobre los mismos datos.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterator, List
+from uuid import UUID
+
+OPERADORES = ["Laura Gómez", "Carlos Ruiz", "Marta Sánchez", "Javier Ortega", "Lucía Navarro", "Pablo Herrera"]
+NOMBRES = ["Ana", "Pedro", "María", "José", "Elena", "Luis", "Carmen", "Miguel", "Rosa", "Andrés"]
+APELLIDOS = ["García", "López", "Martín", "Pérez", "Fernández", "Romero", "Díaz", "Moreno"]
+PRODUCTOS = ["fibra óptica", "tarifa móvil", "seguro de hogar", "plan de pensiones", "tarjeta de crédito", "alarma"]
+PALABRAS_CLAVE = ["factura", "baja", "oferta", "reclamación", "portabilidad", "permanencia", "descuento", "avería"]
+
+FRASES_OPERADOR = [
+    "Buenos días, le llamo de parte de la compañía, ¿tiene un momento?",
+    "Le informo de que esta llamada puede ser grabada por motivos de calidad.",
+    "Tenemos una oferta de {producto} con un descuento del {descuento}% durante el primer año.",
+    "¿Me confirma su nombre completo y los cuatro últimos dígitos de su DNI?",
+    "La {producto} no tiene permanencia y puede cancelarla cuando quiera.",
+    "Entiendo su situación, voy a revisar la factura del último mes.",
+    "El precio final sería de {precio} euros al mes con impuestos incluidos.",
+    "Le envío ahora mismo el resumen de las condiciones por correo electrónico.",
+    "¿Quiere que tramitemos el alta hoy mismo?",
+    "Muchas gracias por su tiempo, que tenga un buen día.",
+]
+FRASES_CLIENTE = [
+    "Sí, dígame.",
+    "Ahora mismo estoy un poco ocupado, pero cuénteme.",
+    "¿Y eso cuánto me costaría exactamente?",
+    "Ya tengo {producto} con otra compañía y estoy contento.",
+    "Me interesa, pero quiero leer bien las condiciones antes.",
+    "La última factura vino con un cargo que no entiendo.",
+    "¿Tiene permanencia? No quiero volver a quedarme atado.",
+    "Vale, de acuerdo, adelante con el alta.",
+    "No, gracias, no me interesa.",
+    "¿Me lo puede mandar por escrito?",
+]
+
+
+def generar_transcripcion(rng: random.Random, turnos: int) -> str:
+    producto = rng.choice(PRODUCTOS)
+    lineas = []
+    for turno in range(turnos):
+        frases = FRASES_OPERADOR if turno % 2 == 0 else FRASES_CLIENTE
+        frase = rng.choice(frases).format(
+            producto=producto, descuento=rng.choice([10, 15, 20, 30]), precio=rng.randint(15, 90)
+        )
+        lineas.append(f"{'Operador' if turno % 2 == 0 else 'Cliente'}: {frase}")
+    return "\n".join(lineas)
+
+
+def generar_llamada(rng: random.Random, turnos_min: int = 6, turnos_max: int = 40) -> Dict[str, Any]:
+    """Llamada con el formato de POST /llamadas/ (LlamadaCreate) y un id determinista."""
+    inicio = datetime(2024, 1, 1, 8) + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+    return {
+        "id": str(UUID(int=rng.getrandbits(128), version=4)),
+        "customer_name": f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}",
+        "operator_name": rng.choice(OPERADORES),
+        "start_at": inicio,
+        "end_at": inicio + timedelta(seconds=rng.randint(60, 1800)),
+        "palabras_clave": rng.sample(PALABRAS_CLAVE, rng.randint(0, 3)),
+        "transcripcion": generar_transcripcion(rng, rng.randint(turnos_min, turnos_max)),
+    }
+
+
+def generar_llamadas(n: int, semilla: int = 0, **kwargs) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(semilla)
+    for _ in range(n):
+        yield generar_llamada(rng, **kwargs)
+
+
+def llamada_json(llamada: Dict[str, Any]) -> Dict[str, Any]:
+    """La misma llamada serializable para la API (fechas ISO, sin id: lo asigna el servidor)."""
+    return {
+        **{clave: valor for clave, valor in llamada.items() if clave != "id"},
+        "start_at": llamada["start_at"].isoformat(),
+        "end_at": llamada["end_at"].isoformat(),
+    }
+
+
+def percentiles(valores: List[float], escala: float = 1000.0) -> Dict[str, float]:
+    """p50/p95/p99 en milisegundos (por defecto) de una lista de duraciones en segundos."""
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+
+    def p(fraccion: float) -> float:
+        return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * fraccion))] * escala, 3)
+
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99)}
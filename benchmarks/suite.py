@@ -0,0 +1,417 @@
+"""
+Suite de rendimiento reproducible del pipeline de llamadas.
+
+Áreas:
+  transcripciones  guardar, leer y listar con TranscripcionService a distintas escalas (--n)
+  db               operaciones de DatabaseManager contra el PostgreSQL configurado (APP_DATABASE_*)
+  api              latencia de extremo a extremo con carga concurrente sobre uvicorn
+  analisis         analizar_llamada con un modelo causal pequeño en lugar de Mistral
+
+Los datos salen de benchmarks.generador con una semilla fija. El resultado se escribe en JSON
+(--salida) y se puede comparar con una línea base guardada (--comparar): la suite termina con
+código 1 si alguna métrica empeora más que la tolerancia. Las áreas que no pueden ejecutarse
+(sin PostgreSQL, sin uvicorn, sin modelo) se marcan como omitidas y no cuentan como regresión.
+
+Uso:
+  python -m benchmarks.suite --areas transcripciones db --n 1000 10000 --salida linea_base.json
+  python -m benchmarks.suite --areas transcripciones db --n 1000 10000 --comparar linea_base.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+from benchmarks.generador import generar_llamadas, percentiles
+
+RAIZ = Path(__file__).resolve().parent.parent
+AREAS = ["transcripciones", "db", "api", "analisis"]
+PREFIJO_OPERADOR = "bench:"
+
+
+def cronometrar(funcion, *args, **kwargs):
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def por_segundo(cantidad: int, segundos: float) -> float:
+    return round(cantidad / segundos, 1) if segundos else None
+
+
+# --- transcripciones -------------------------------------------------------------------------
+
+def bench_transcripciones(args) -> Dict[str, Any]:
+    from APP.Infrastructure.TranscripcionService import TranscripcionService
+    from APP.Infrastructure.almacenamiento_transcripciones import crear_almacenamiento
+    from config import settings
+
+    resultados = {}
+    for n in args.n:
+        directorio = Path(tempfile.mkdtemp(prefix="bench_transcripciones_", dir=args.directorio))
+        try:
+            almacenamiento = crear_almacenamiento(
+                directorio, settings.transcripciones_backend, settings.transcripciones_compresion,
+                settings.transcripciones_segmento_max_mb * 1024 * 1024
+            )
+            servicio = TranscripcionService(str(directorio), almacenamiento=almacenamiento)
+            llamadas = generar_llamadas(n, args.semilla)
+
+            ids = []
+            inicio = time.perf_counter()
+            for llamada in llamadas:
+                llamada_id = llamada.pop("id")
+                servicio.guardar_transcripcion(llamada_id, **llamada)
+                ids.append(llamada_id)
+            escritura = time.perf_counter() - inicio
+
+            latencias = []
+            for llamada_id in random.Random(args.semilla).sample(ids, min(args.lecturas, n)):
+                _, segundos = cronometrar(servicio.leer_transcripcion_json, llamada_id)
+                latencias.append(segundos)
+
+            _, listado_pagina = cronometrar(servicio.listar_transcripciones, limit=100)
+            listado, listado_completo = cronometrar(servicio.listar_transcripciones)
+            if hasattr(almacenamiento, 'cerrar'):
+                almacenamiento.cerrar()
+
+            resultados[f"n={n}"] = {
+                "backend": settings.transcripciones_backend,
+                "guardar_por_segundo": por_segundo(n, escritura),
+                "leer_por_segundo": por_segundo(len(latencias), sum(latencias)),
+                **{f"leer_{clave}": valor for clave, valor in percentiles(latencias).items()},
+                "listar_100_ms": round(listado_pagina * 1000, 3),
+                "listar_todo_ms": round(listado_completo * 1000, 3),
+                "listadas": len(listado),
+            }
+        finally:
+            shutil.rmtree(directorio, ignore_errors=True)
+    return resultados
+
+
+# --- db --------------------------------------------------------------------------------------
+
+def limpiar_datos_bench(db_manager):
+    """Borra las llamadas de benchmark (operador con prefijo bench:) y lo que cuelga de ellas."""
+    patron = f"{PREFIJO_OPERADOR}%"
+    with db_manager._get_connection() as conn:
+        with conn.cursor() as cursor:
+            for tabla in ("analisis_llamadas", "analisis_jobs"):
+                cursor.execute(f"""
+                    DELETE FROM {tabla} WHERE llamada_id IN (
+                        SELECT id FROM llamadas WHERE operator_name LIKE %s
+                    )
+                """, (patron,))
+            cursor.execute("DELETE FROM llamadas WHERE operator_name LIKE %s", (patron,))
+            cursor.execute("DELETE FROM operador_estadisticas WHERE operator_name LIKE %s", (patron,))
+            conn.commit()
+
+
+def datos_llamada_db(llamada: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": llamada["id"],
+        "customer_name": llamada["customer_name"],
+        "operator_name": f"{PREFIJO_OPERADOR}{llamada['operator_name']}",
+        "start_at": llamada["start_at"].isoformat(),
+        "end_at": llamada["end_at"].isoformat(),
+        "palabras_clave": llamada["palabras_clave"],
+        "transcripcion_archivo": None,
+    }
+
+
+def analisis_sintetico(rng: random.Random) -> Dict[str, Any]:
+    return {
+        "regulacion": {"cumplimiento": rng.randint(1, 10), "comentario": "Informa de la grabación."},
+        "habilidad_comercial": {"puntuacion": rng.randint(1, 10), "comentario": "Argumenta el precio."},
+        "conocimiento_producto": {"puntuacion": rng.randint(1, 10), "comentario": "Conoce las condiciones."},
+        "cierre_venta": {"puntuacion": rng.randint(1, 10), "comentario": "Propone el alta."},
+        "puntuacion_general": rng.randint(1, 10),
+        "aspectos_positivos": ["Cordialidad"],
+        "areas_mejora": ["Escucha activa"],
+        "recomendacion": "Reforzar el cierre.",
+    }
+
+
+def bench_db(args) -> Dict[str, Any]:
+    from APP.Infrastructure.database import db_manager, fila_busqueda
+
+    try:
+        db_manager.inicializar_esquema()
+    except Exception as e:
+        return {"omitido": f"PostgreSQL no disponible: {e}"}
+
+    n = args.llamadas_db
+    llamadas = list(generar_llamadas(n, args.semilla))
+    rng = random.Random(args.semilla)
+    resultados = {}
+    limpiar_datos_bench(db_manager)
+    try:
+        # Una décima parte fila a fila y el resto en lotes, como POST /llamadas/ y /llamadas/bulk
+        individuales = llamadas[:max(1, n // 10)]
+        latencias = []
+        for llamada in individuales:
+            _, segundos = cronometrar(db_manager.guardar_llamada, datos_llamada_db(llamada))
+            latencias.append(segundos)
+        resultados["guardar_llamada"] = {
+            "por_segundo": por_segundo(len(latencias), sum(latencias)), **percentiles(latencias)
+        }
+
+        resto = [datos_llamada_db(llamada) for llamada in llamadas[len(individuales):]]
+        inicio = time.perf_counter()
+        for i in range(0, len(resto), args.tamano_lote):
+            db_manager.guardar_llamadas_lote(resto[i:i + args.tamano_lote])
+        resultados["guardar_llamadas_lote"] = {"por_segundo": por_segundo(len(resto), time.perf_counter() - inicio)}
+
+        filas = [fila_busqueda(llamada["id"], llamada["transcripcion"], llamada["palabras_clave"]) for llamada in llamadas]
+        _, segundos = cronometrar(db_manager.indexar_transcripciones, filas)
+        resultados["indexar_transcripciones"] = {"por_segundo": por_segundo(len(filas), segundos)}
+
+        def medir(nombre: str, repeticiones: int, funcion):
+            latencias = [cronometrar(funcion)[1] for _ in range(repeticiones)]
+            resultados[nombre] = {"por_segundo": por_segundo(len(latencias), sum(latencias)), **percentiles(latencias)}
+
+        ids = [llamada["id"] for llamada in llamadas]
+        operadores = sorted({f"{PREFIJO_OPERADOR}{llamada['operator_name']}" for llamada in llamadas})
+        medir("obtener_llamada", args.lecturas, lambda: db_manager.obtener_llamada(rng.choice(ids)))
+        medir("listar_llamadas", 200, lambda: db_manager.listar_llamadas(limit=50, operator_name=rng.choice(operadores)))
+        medir("buscar_llamadas", 200, lambda: db_manager.buscar_llamadas(rng.choice(["factura", "permanencia", "fibra", "alta"])))
+        medir("guardar_analisis", min(n, 500), lambda: db_manager.guardar_analisis(rng.choice(ids), analisis_sintetico(rng)))
+        medir("obtener_analisis", 500, lambda: db_manager.obtener_analisis(rng.choice(ids)))
+        medir("obtener_estadisticas_operador", 500, lambda: db_manager.obtener_estadisticas_operador(rng.choice(operadores)))
+    finally:
+        limpiar_datos_bench(db_manager)
+    return resultados
+
+
+# --- api -------------------------------------------------------------------------------------
+
+def bench_api(args) -> Dict[str, Any]:
+    from benchmarks.bench_api_concurrencia import arrancar_api, esperar_api, sembrar_llamadas, carga
+
+    try:
+        import uvicorn  # noqa: F401
+    except ImportError:
+        return {"omitido": "uvicorn no está instalado"}
+
+    url = f"http://127.0.0.1:{args.puerto}"
+    resultados = {}
+    directorio = tempfile.mkdtemp(prefix="bench_api_", dir=args.directorio)
+    try:
+        for modo in args.modos_api:
+            proceso = arrancar_api(modo, args.puerto, directorio)
+            try:
+                esperar_api(url)
+                ids = sembrar_llamadas(url, args.llamadas_api, args.semilla)
+                rutas = {
+                    "obtener_llamada": [f"/llamadas/{llamada_id}" for llamada_id in ids],
+                    "listar_llamadas": ["/llamadas/?limit=50"],
+                    "buscar_llamadas": [f"/llamadas/search?q={q}" for q in ("factura", "permanencia", "fibra")],
+                }
+                asyncio.run(carga(url, rutas["obtener_llamada"], args.concurrencia, 1.0))
+                for nombre, lista in rutas.items():
+                    medida = asyncio.run(carga(url, lista, args.concurrencia, args.segundos))
+                    resultados[f"{modo}.{nombre}"] = medida
+            except Exception as e:
+                resultados[modo] = {"omitido": f"La API no arrancó o falló: {e}"}
+            finally:
+                proceso.terminate()
+                proceso.wait(timeout=30)
+    finally:
+        shutil.rmtree(directorio, ignore_errors=True)
+        try:
+            from APP.Infrastructure.database import db_manager
+            limpiar_datos_bench(db_manager)
+        except Exception as e:
+            logging.warning(f"No se pudieron limpiar las llamadas de benchmark: {e}")
+    return resultados
+
+
+# --- analisis --------------------------------------------------------------------------------
+
+def ejecutar_analisis(args) -> Dict[str, Any]:
+    """Se ejecuta en el proceso hijo, con el modelo pequeño fijado en las variables de entorno."""
+    from APP.Domain.ModelManager import ModelManager
+    from APP.Application.Analisis import analizar_llamada, obtener_estadisticas_generacion, motor_analisis
+
+    _, carga_modelo = cronometrar(lambda: ModelManager().get_model())
+    textos = [llamada["transcripcion"] for llamada in generar_llamadas(args.analisis, args.semilla, turnos_max=20)]
+
+    tokens_antes = obtener_estadisticas_generacion()["tokens_generados"]
+    latencias = []
+    validos = 0
+    for texto in textos:
+        resultado, segundos = cronometrar(analizar_llamada, texto)
+        latencias.append(segundos)
+        validos += "error" not in resultado and not resultado.get("respuesta_truncada")
+    tokens = obtener_estadisticas_generacion()["tokens_generados"] - tokens_antes
+
+    # Las mismas transcripciones enviadas a la vez: mide el batching del motor
+    inicio = time.perf_counter()
+    futuros = [motor_analisis.enviar(texto) for texto in textos]
+    for futuro in futuros:
+        futuro.result()
+    concurrente = time.perf_counter() - inicio
+
+    return {
+        "carga_modelo_segundos": round(carga_modelo, 3),
+        "secuencial_por_segundo": por_segundo(len(textos), sum(latencias)),
+        **{f"latencia_{clave}": valor for clave, valor in percentiles(latencias).items()},
+        "tokens_por_segundo": por_segundo(tokens, sum(latencias)),
+        "concurrente_por_segundo": por_segundo(len(textos), concurrente),
+        "json_valido": round(validos / len(textos), 3) if textos else None,
+        # Solo con --modelo-borrador (decodificación asistida)
+        "tasa_aceptacion": obtener_estadisticas_generacion()["tasa_aceptacion"],
+    }
+
+
+def bench_analisis(args) -> Dict[str, Any]:
+    entorno = dict(
+        os.environ,
+        PYTHONPATH=str(RAIZ),
+        APP_ML_MODEL_NAME=args.modelo,
+        APP_ML_MODELO_BORRADOR=args.modelo_borrador,
+        APP_ML_MODEL_DEVICE="cpu",
+        APP_ML_MODEL_DTYPE="float32",
+        APP_MAX_NEW_TOKENS=str(args.max_new_tokens),
+        APP_INFERENCIA_REMOTA="false",
+    )
+    salida = subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--hijo-analisis",
+         "--analisis", str(args.analisis), "--semilla", str(args.semilla)],
+        cwd=RAIZ, env=entorno, capture_output=True, text=True
+    )
+    if salida.returncode != 0:
+        return {"omitido": f"No se pudo ejecutar el modelo {args.modelo}: {salida.stderr.strip().splitlines()[-1:]}"}
+    return {"modelo": args.modelo, "borrador": args.modelo_borrador or None, **json.loads(salida.stdout.strip().splitlines()[-1])}
+
+
+# --- resultados y comparación ----------------------------------------------------------------
+
+def metadatos() -> Dict[str, Any]:
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ, capture_output=True, text=True)
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit.stdout.strip() or None,
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def aplanar(resultados: Dict[str, Any], prefijo: str = "") -> Dict[str, Any]:
+    plano = {}
+    for clave, valor in resultados.items():
+        nombre = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            plano.update(aplanar(valor, f"{nombre}."))
+        else:
+            plano[nombre] = valor
+    return plano
+
+
+def sentido(metrica: str) -> int:
+    """+1 si más es mejor, -1 si menos es mejor, 0 si la métrica es informativa."""
+    if metrica.endswith("por_segundo") or metrica.endswith("json_valido") or metrica.endswith("tasa_aceptacion"):
+        return 1
+    if metrica.endswith("_ms") or metrica.endswith("_segundos"):
+        return -1
+    return 0
+
+
+def comparar(actual: Dict[str, Any], base: Dict[str, Any], tolerancia: float) -> List[Dict[str, Any]]:
+    actual_plano = aplanar(actual)
+    regresiones = []
+    for metrica, valor_base in aplanar(base).items():
+        direccion = sentido(metrica)
+        valor = actual_plano.get(metrica)
+        if not direccion or not isinstance(valor, (int, float)) or not isinstance(valor_base, (int, float)) or not valor_base:
+            continue
+        cambio = (valor - valor_base) / valor_base
+        if cambio * direccion < -tolerancia:
+            regresiones.append({
+                "metrica": metrica, "base": valor_base, "actual": valor, "cambio": f"{cambio:+.1%}"
+            })
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--areas", nargs="+", default=AREAS, choices=AREAS)
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="Línea base JSON con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.15, help="Empeoramiento relativo permitido")
+    parser.add_argument("--directorio", default=tempfile.gettempdir(), help="Directorio para los datos temporales")
+
+    grupo = parser.add_argument_group("transcripciones")
+    grupo.add_argument("--n", type=int, nargs="+", default=[1000, 10000], help="Escalas, p. ej. 1000 100000 1000000")
+    grupo.add_argument("--lecturas", type=int, default=2000)
+
+    grupo = parser.add_argument_group("db")
+    grupo.add_argument("--llamadas-db", type=int, default=5000)
+    grupo.add_argument("--tamano-lote", type=int, default=500)
+
+    grupo = parser.add_argument_group("api")
+    grupo.add_argument("--modos-api", nargs="+", default=["async"], choices=["sync", "async"])
+    grupo.add_argument("--llamadas-api", type=int, default=500)
+    grupo.add_argument("--concurrencia", type=int, default=32)
+    grupo.add_argument("--segundos", type=float, default=10.0)
+    grupo.add_argument("--puerto", type=int, default=8765)
+
+    grupo = parser.add_argument_group("analisis")
+    grupo.add_argument("--modelo", default="sshleifer/tiny-gpt2", help="Modelo causal pequeño (id de HF o ruta local)")
+    grupo.add_argument("--modelo-borrador", default="", help="Borrador para decodificación asistida (vacío = sin)")
+    grupo.add_argument("--analisis", type=int, default=20, help="Transcripciones analizadas")
+    grupo.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--hijo-analisis", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Los logs por operación (INFO) distorsionan las medidas
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.hijo_analisis:
+        print(json.dumps(ejecutar_analisis(args)), flush=True)
+        return
+
+    funciones = {
+        "transcripciones": bench_transcripciones,
+        "db": bench_db,
+        "api": bench_api,
+        "analisis": bench_analisis,
+    }
+    resultados = {}
+    for area in args.areas:
+        inicio = time.perf_counter()
+        resultados[area] = funciones[area](args)
+        logging.warning(f"Área {area} completada en {time.perf_counter() - inicio:.1f}s")
+
+    informe = {"metadatos": metadatos(), "parametros": vars(args), "resultados": resultados}
+    texto = json.dumps(informe, indent=2, ensure_ascii=False, default=str)
+    print(texto)
+    if args.salida:
+        Path(args.salida).write_text(texto, encoding="utf-8")
+
+    if args.comparar:
+        base = json.loads(Path(args.comparar).read_text(encoding="utf-8"))
+        regresiones = comparar(resultados, base["resultados"], args.tolerancia)
+        for regresion in regresiones:
+            print(f"Regresión: {regresion['metrica']} {regresion['base']} -> {regresion['actual']} "
+                  f"({regresion['cambio']})", file=sys.stderr)
+        if regresiones:
+            sys.exit(1)
+        print(f"Sin regresiones respecto a {args.comparar} (tolerancia {args.tolerancia:.0%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
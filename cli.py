@@ -0,0 +1,189 @@
+"""
+Comandos de mantenimiento de la aplicación.
+
+Uso: python cli.py <comando> [opciones]
+"""
+import argparse
+import logging
+from datetime import datetime
+from config import settings
+
+
+def migrar_esquema(args):
+    from APP.Infrastructure.database import db_manager
+    db_manager.inicializar_esquema()
+    print("Esquema de base de datos creado/actualizado")
+
+
+def reconstruir_estadisticas(args):
+    from APP.Infrastructure.database import db_manager
+    filas = db_manager.reconstruir_estadisticas_operadores()
+    print(f"Estadísticas de operadores reconstruidas: {filas} filas")
+
+
+def migrar_transcripciones(args):
+    from APP.Infrastructure.almacenamiento_transcripciones import AlmacenamientoFragmentado
+    almacenamiento = AlmacenamientoFragmentado(args.directorio, compresion=args.compresion)
+    resultado = almacenamiento.migrar_desde_plano(eliminar_originales=not args.conservar)
+    print(f"Transcripciones migradas: {resultado['migrados']} (errores: {resultado['errores']})")
+
+
+def compactar_transcripciones(args):
+    from APP.Infrastructure.segmentos_transcripciones import AlmacenamientoSegmentos
+    almacenamiento = AlmacenamientoSegmentos(
+        args.directorio, max_bytes_segmento=settings.transcripciones_segmento_max_mb * 1024 * 1024
+    )
+    resultado = almacenamiento.compactar(umbral_muertos=args.umbral)
+    almacenamiento.cerrar()
+    print(f"Segmentos compactados: {resultado['segmentos_compactados']} "
+          f"(registros movidos: {resultado['registros_movidos']})")
+
+
+def reconstruir_indice_transcripciones(args):
+    from APP.Infrastructure.TranscripcionService import TranscripcionService
+    total = TranscripcionService(args.directorio).reconstruir_indice()
+    print(f"Índice de transcripciones reconstruido: {total} entradas")
+
+
+def indexar_busqueda(args):
+    from APP.Infrastructure.database import db_manager, fila_busqueda
+    from APP.Infrastructure.TranscripcionService import TranscripcionService
+
+    leidas = 0
+    indexadas = 0
+    lote = []
+    for llamada_id, data in TranscripcionService(args.directorio).iterar_transcripciones():
+        leidas += 1
+        lote.append(fila_busqueda(
+            llamada_id,
+            data.get('transcripcion', {}).get('texto'),
+            data.get('metadata', {}).get('palabras_clave')
+        ))
+        if len(lote) >= args.lote:
+            indexadas += db_manager.indexar_transcripciones(lote)
+            lote = []
+    indexadas += db_manager.indexar_transcripciones(lote)
+    print(f"Transcripciones indexadas para búsqueda: {indexadas} de {leidas} (el resto no tiene llamada en la base de datos)")
+
+
+def reanalizar(args):
+    from APP.Application.ReanalisisLote import GestorReanalisis
+    from APP.Infrastructure.TranscripcionService import TranscripcionService
+
+    gestor = GestorReanalisis(TranscripcionService(args.directorio))
+    reanalisis = gestor.preparar(force=args.force, reanudar=args.reanudar)
+    print(f"Reanálisis {reanalisis['id']}: {reanalisis['total']} llamadas (Ctrl+C para parar)")
+    try:
+        reanalisis = gestor.ejecutar(reanalisis)
+    except KeyboardInterrupt:
+        print(f"\nReanálisis detenido. Para continuar: python cli.py reanalizar --reanudar {reanalisis['id']}")
+        return
+    print(f"Reanálisis {reanalisis['id']} {reanalisis['estado']}: {reanalisis['analizadas']} analizadas, "
+          f"{reanalisis['omitidas']} omitidas, {reanalisis['fallidas']} fallidas de {reanalisis['procesadas']}")
+
+
+def exportar_parquet(args):
+    from APP.Infrastructure.database import db_manager
+    from APP.Infrastructure.exportacion import escribir_parquet
+
+    bloques = db_manager.iterar_exportacion(
+        desde=args.desde, hasta=args.hasta, operator_name=args.operador, tamano=settings.exportacion_tamano_bloque
+    )
+    try:
+        resultado = escribir_parquet(bloques, args.salida, filas_por_grupo=args.filas_por_grupo)
+    finally:
+        bloques.close()
+    print(f"Llamadas exportadas a Parquet: {resultado['filas']} filas en {resultado['particiones']} "
+          f"particiones por fecha ({args.salida})")
+
+
+def servidor_inferencia(args):
+    from APP.Application.InferenciaRemota import iniciar_servidor
+    iniciar_servidor(args.workers, args.dispositivos)
+
+
+def main():
+    logging.basicConfig(level=settings.log_level)
+
+    parser = argparse.ArgumentParser(description="Comandos de mantenimiento de la API de llamadas")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    comando = subparsers.add_parser(
+        "migrar-esquema",
+        help="Crea o actualiza las tablas e índices de PostgreSQL"
+    )
+    comando.set_defaults(funcion=migrar_esquema)
+
+    comando = subparsers.add_parser(
+        "reconstruir-estadisticas",
+        help="Recalcula la tabla operador_estadisticas desde llamadas y análisis"
+    )
+    comando.set_defaults(funcion=reconstruir_estadisticas)
+
+    comando = subparsers.add_parser(
+        "migrar-transcripciones",
+        help="Convierte los llamada_<id>.json planos al almacenamiento fragmentado y comprimido"
+    )
+    comando.add_argument("--directorio", default="transcripciones")
+    comando.add_argument("--compresion", default=settings.transcripciones_compresion, choices=["zstd", "gzip", "ninguna"])
+    comando.add_argument("--conservar", action="store_true", help="No borra los archivos originales")
+    comando.set_defaults(funcion=migrar_transcripciones)
+
+    comando = subparsers.add_parser(
+        "compactar-transcripciones",
+        help="Reescribe los segmentos con transcripciones eliminadas (backend segmentos)"
+    )
+    comando.add_argument("--directorio", default="transcripciones")
+    comando.add_argument("--umbral", type=float, default=0.3, help="Fracción mínima de bytes eliminados")
+    comando.set_defaults(funcion=compactar_transcripciones)
+
+    comando = subparsers.add_parser(
+        "reconstruir-indice-transcripciones",
+        help="Regenera el índice de metadatos de transcripciones leyendo el almacenamiento"
+    )
+    comando.add_argument("--directorio", default="transcripciones")
+    comando.set_defaults(funcion=reconstruir_indice_transcripciones)
+
+    comando = subparsers.add_parser(
+        "indexar-busqueda",
+        help="Indexa en llamadas_busqueda las transcripciones ya almacenadas (búsqueda de texto completo)"
+    )
+    comando.add_argument("--directorio", default="transcripciones")
+    comando.add_argument("--lote", type=int, default=500)
+    comando.set_defaults(funcion=indexar_busqueda)
+
+    comando = subparsers.add_parser(
+        "reanalizar",
+        help="Vuelve a analizar las llamadas guardadas con el modelo y prompt actuales (reanudable)"
+    )
+    comando.add_argument("--directorio", default="transcripciones")
+    comando.add_argument("--force", action="store_true", help="Reanaliza también las que ya tienen análisis vigente")
+    comando.add_argument("--reanudar", metavar="ID", help="Continúa un reanálisis interrumpido desde su checkpoint")
+    comando.set_defaults(funcion=reanalizar)
+
+    comando = subparsers.add_parser(
+        "exportar-parquet",
+        help="Exporta llamadas y su último análisis a Parquet particionado por fecha (requiere pyarrow)"
+    )
+    comando.add_argument("--salida", required=True, help="Directorio de salida (vacío o inexistente)")
+    comando.add_argument("--desde", type=datetime.fromisoformat, help="start_at mínimo (ISO, incluido)")
+    comando.add_argument("--hasta", type=datetime.fromisoformat, help="start_at máximo (ISO, excluido)")
+    comando.add_argument("--operador", help="Solo las llamadas de este operador")
+    comando.add_argument("--filas-por-grupo", type=int, default=50000, help="Filas por row group")
+    comando.set_defaults(funcion=exportar_parquet)
+
+    comando = subparsers.add_parser(
+        "servidor-inferencia",
+        help="Arranca los procesos que cargan el modelo y atienden los análisis de la API"
+    )
+    comando.add_argument("--workers", type=int, default=settings.inferencia_workers)
+    comando.add_argument("--dispositivos", default=settings.inferencia_dispositivos,
+                         help="Lista separada por comas, p. ej. cuda:0,cuda:1")
+    comando.set_defaults(funcion=servidor_inferencia)
+
+    args = parser.parse_args()
+    args.funcion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,11 +8,69 @@ class Settings(BaseSettings):
     ml_model_device: str = "auto"
     ml_model_dtype: str = "float16"
     max_new_tokens: int = 700
+    ml_model_perfil: str = "estandar"  # estandar | int8 | 4bit
+    ml_model_compilar: bool = False
+    ml_torch_hilos: int = 0  # 0 = valor por defecto de torch
+    ml_torch_hilos_interop: int = 0
+    ml_modelo_borrador: str = ""  # modelo pequeño para decodificación asistida; vacío = desactivada
+    ml_borrador_tokens: int = 5  # tokens que propone el borrador en cada paso
+    
+    # Configuración del motor de análisis por lotes
+    analisis_batch_ventana_ms: int = 50
+    analisis_batch_max_tamano: int = 8
+    analisis_cache_prefijo: bool = True
+    analisis_cache_max_entradas: int = 1024
+    analisis_json_restringido: bool = True
+    analisis_json_top_k: int = 10
+    analisis_presupuesto_tokens: int = 3000  # tokens de transcripción por ventana
+    analisis_solapamiento_tokens: int = 200
+    
+    # Configuración de la cola de jobs de análisis
+    analisis_jobs_workers: int = 2
+    analisis_jobs_max_cola: int = 100
+    analisis_jobs_intervalo_segundos: float = 1.0
+    analisis_jobs_timeout_segundos: float = 120.0  # un job en running sin latido más antiguo se considera abandonado
+    analisis_jobs_latido_segundos: float = 30.0  # cada cuánto renuevan heartbeat_at los workers
+    
+    # Reanálisis por lotes de llamadas históricas (cli.py reanalizar o POST /analisis/reanalisis)
+    reanalisis_bloque: int = 256  # llamadas por checkpoint
+    reanalisis_prefetch_bloques: int = 2  # bloques de transcripciones leídos por adelantado
+    reanalisis_hilos_lectura: int = 4
+    
+    # Exportación de llamadas y análisis (GET /export/llamadas, cli.py exportar-parquet)
+    exportacion_tamano_bloque: int = 2000  # filas por viaje al cursor del servidor
+    
+    # Configuración del servidor de inferencia (procesos con el modelo)
+    inferencia_remota: bool = False
+    inferencia_host: str = "127.0.0.1"
+    inferencia_puerto: int = 50051
+    inferencia_clave: str = ""  # obligatoria: authkey del canal IPC (se deserializa con pickle)
+    inferencia_workers: int = 1
+    inferencia_dispositivos: str = "cpu"  # separados por comas, se reparten entre los workers
+    inferencia_timeout_segundos: float = 300.0
+    
+    # Calentamiento al arrancar (/ready responde 503 hasta que termina)
+    calentamiento_al_arrancar: bool = True
+    calentamiento_tokens: int = 8
+    calentamiento_reintentos: int = 0  # reintentos por paso fallido; 0 = sin límite
+    calentamiento_espera_max_segundos: float = 60.0  # tope de la espera exponencial entre reintentos
+    
+    # Métricas en /metrics (formato Prometheus); desactivadas no miden nada
+    metricas_habilitadas: bool = True
     
     # Configuración de la API
     api_host: str = "localhost"
     api_port: int = 8000
     debug_mode: bool = False
+    bulk_tamano_lote: int = 500
+    api_limite_max: int = 500  # tope de ?limit= en los listados
+    
+    # Configuración del almacenamiento de transcripciones
+    transcripciones_backend: str = "fragmentado"  # plano | fragmentado | segmentos
+    transcripciones_compresion: str = "zstd"  # zstd | gzip | ninguna
+    # segmentos: varios procesos (workers de uvicorn, CLI) solo en la misma máquina; flock no vale en NFS
+    transcripciones_segmento_max_mb: int = 256
+    transcripciones_indice: bool = True
     
     # Configuración de logging
     log_level: str = "INFO"
@@ -25,6 +83,13 @@ class Settings(BaseSettings):
     database_name: str = "postgres"
     database_user: str = "postgres"
     database_password: str = "postgres"
+    database_pool_min: int = 1
+    database_pool_max: int = 10
+    database_pool_idle_timeout_segundos: float = 300.0
+    database_pool_timeout_espera_segundos: float = 30.0
+    database_pool_verificar_tras_segundos: float = 30.0
+    database_async: bool = True  # endpoints CRUD con asyncpg; False los sirve con psycopg2 en el threadpool
+    database_migrar_al_arrancar: bool = True  # si es False, usar `python cli.py migrar-esquema`
     
     class Config:
         env_file = ".env"
@@ -3,7 +3,7 @@ Ejemplo de uso del TranscripcionService
 """
 from APP.Domain.Llamda import Llamda
 from APP.Infrastructure.TranscripcionService import TranscripcionService
-from datetime import datetime
+from datetime import datetime, timedelta
 
 def ejemplo_uso_basico():
     """Ejemplo básico de guardado y lectura"""
@@ -22,12 +22,13 @@ def ejemplo_uso_basico():
     Operador: Perfecto, veo que tiene un cargo pendiente...
     """
     
-    # Guardar transcripción simple
-    archivo_txt = servicio.guardar_transcripcion_simple(llamada_id, transcripcion)
-    print(f"Guardado en: {archivo_txt}")
+    # Guardar transcripción sin metadata
+    archivo = servicio.guardar_transcripcion(llamada_id, transcripcion)
+    print(f"Guardado en: {archivo}")
     
     # Leer transcripción
-    contenido = servicio.leer_transcripcion_simple(llamada_id)
+    data = servicio.leer_transcripcion_json(llamada_id)
+    contenido = data['transcripcion']['texto']
     print(f"Contenido leído: {contenido[:100]}...")
 
 def ejemplo_uso_avanzado():
@@ -35,18 +36,21 @@ def ejemplo_uso_avanzado():
     print("\n=== Ejemplo 2: Con metadata ===")
     
     servicio = TranscripcionService()
-    llamada_id = "456g7890-h12i-34j5-k678-901234567890"
+    llamada_id = "456e7890-a12b-34c5-d678-901234567890"
     
     transcripcion = "Cliente muy satisfecho con el servicio..."
-    metadata = {
-        "cliente": "María García",
-        "operador": "Juan Pérez",
-        "duracion_minutos": 15,
-        "categoria": "Soporte técnico"
-    }
+    inicio = datetime.now()
     
     # Guardar con metadata
-    archivo_json = servicio.guardar_transcripcion_json(llamada_id, transcripcion, metadata)
+    archivo_json = servicio.guardar_transcripcion(
+        llamada_id,
+        transcripcion,
+        customer_name="María García",
+        operator_name="Juan Pérez",
+        start_at=inicio,
+        end_at=inicio + timedelta(minutes=15),
+        palabras_clave=["soporte técnico"]
+    )
     print(f"Guardado JSON en: {archivo_json}")
     
     # Leer con metadata
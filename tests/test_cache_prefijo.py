@@ -0,0 +1,91 @@
+"""La salida greedy debe ser idéntica con y sin el KV cache del prefijo del prompt."""
+import pytest
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+tokenizers = pytest.importorskip("tokenizers")
+
+from APP.Application import Analisis
+from APP.Domain.ModelManager import ModelManager
+from config import settings
+
+TRANSCRIPCIONES = [
+    "Operador: Buenos días, ¿en qué le puedo ayudar?\nCliente: Tengo una consulta sobre mi factura.",
+    "Operador: Hola.\nCliente: Quiero darme de baja.",
+    "Operador: Gracias por llamar, le explico la tarifa con todo detalle.\nCliente: Vale, perfecto, adelante.",
+]
+
+
+@pytest.fixture(scope="module")
+def directorio_modelo(tmp_path_factory):
+    """Mistral diminuto con pesos aleatorios y un tokenizer BPE entrenado sobre el prompt."""
+    from tokenizers import Tokenizer, models, trainers, pre_tokenizers, decoders, processors
+    from transformers import PreTrainedTokenizerFast, MistralConfig, MistralForCausalLM
+
+    directorio = tmp_path_factory.mktemp("modelo")
+    texto = Analisis.PROMPT_INSTRUCCION + Analisis.PROMPT_CIERRE + " ".join(TRANSCRIPCIONES)
+
+    bpe = Tokenizer(models.BPE(unk_token="<unk>"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator([texto], trainers.BpeTrainer(
+        vocab_size=400,
+        special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    bpe.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 1)])
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<s>", eos_token="</s>", unk_token="<unk>")
+    tokenizer.save_pretrained(directorio)
+
+    torch.manual_seed(0)
+    MistralForCausalLM(MistralConfig(
+        vocab_size=len(tokenizer),
+        hidden_size=64,
+        intermediate_size=128,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=2048,
+        bos_token_id=1,
+        eos_token_id=2
+    )).save_pretrained(directorio)
+    return str(directorio)
+
+
+@pytest.fixture
+def modelo_diminuto(directorio_modelo, monkeypatch):
+    monkeypatch.setattr(settings, "ml_model_name", directorio_modelo)
+    monkeypatch.setattr(settings, "ml_model_device", "cpu")
+    monkeypatch.setattr(settings, "ml_model_dtype", "float32")
+    monkeypatch.setattr(settings, "ml_model_perfil", "estandar")
+    monkeypatch.setattr(settings, "ml_model_compilar", False)
+    monkeypatch.setattr(settings, "ml_modelo_borrador", "")
+    monkeypatch.setattr(settings, "max_new_tokens", 24)
+    # Singleton limpio: se carga el modelo diminuto y se restaura el anterior al terminar
+    for atributo in ("_instance", "_model", "_tokenizer", "_borrador", "_tokenizer_borrador"):
+        monkeypatch.setattr(ModelManager, atributo, None)
+    monkeypatch.setattr(ModelManager, "_prefijos", {})
+    return ModelManager().get_model()
+
+
+def _generar(transcripciones, cache_prefijo: bool):
+    settings.analisis_cache_prefijo = cache_prefijo
+    entradas = Analisis._preparar_entradas(transcripciones)
+    assert ("past_key_values" in entradas) == cache_prefijo
+    _, model = ModelManager().get_model()
+    with torch.no_grad():
+        return model.generate(**entradas)
+
+
+@pytest.mark.parametrize("json_restringido", [False, True])
+@pytest.mark.parametrize("transcripciones", [TRANSCRIPCIONES[:1], TRANSCRIPCIONES], ids=["una", "lote_con_padding"])
+def test_salida_identica_con_y_sin_cache_de_prefijo(modelo_diminuto, monkeypatch, transcripciones, json_restringido):
+    monkeypatch.setattr(settings, "analisis_json_restringido", json_restringido)
+    monkeypatch.setattr(settings, "analisis_cache_prefijo", settings.analisis_cache_prefijo)
+
+    sin_cache = _generar(transcripciones, cache_prefijo=False)
+    con_cache = _generar(transcripciones, cache_prefijo=True)
+
+    assert torch.equal(sin_cache, con_cache)
+    # Varias generaciones reutilizan el mismo prefijo: la copia no debe quedar contaminada
+    assert torch.equal(con_cache, _generar(transcripciones, cache_prefijo=True))
@@ -0,0 +1,206 @@
+"""Decodificación restringida al esquema de análisis, reparación de truncados y puntuaciones."""
+import json
+
+import pytest
+
+from APP.Application.DecodificacionJSON import (
+    ESTADO_INICIAL, MAX_ELEMENTOS_LISTA, ProcesadorJSONRestringido, avanzar_texto,
+    completar_puntuaciones, reparar_truncado
+)
+
+ANALISIS = {
+    "regulacion": {"cumplimiento": 8, "comentario": "Cumple el guion"},
+    "habilidad_comercial": {"puntuacion": 7, "comentario": "Escucha al \"cliente\""},
+    "conocimiento_producto": {"puntuacion": 10, "comentario": "Domina la tarifa"},
+    "cierre_venta": {"puntuacion": 0, "comentario": ""},
+    "puntuacion_general": 6,
+    "aspectos_positivos": ["Amable", "Claro"],
+    "areas_mejora": [],
+    "recomendacion": "Proponer el cierre antes",
+}
+TEXTO_ANALISIS = json.dumps(ANALISIS, ensure_ascii=False)
+
+
+def test_documento_completo_es_valido():
+    estado = avanzar_texto(ESTADO_INICIAL, TEXTO_ANALISIS)
+
+    assert estado is not None and estado.terminado
+    assert avanzar_texto(estado, " \n") is not None
+    assert avanzar_texto(estado, "{") is None
+
+
+def test_escapes_validos():
+    assert avanzar_texto(ESTADO_INICIAL, '{"recomendacion": "\\"\\n\\u00e9\\uD83D"') is not None
+
+
+def test_todos_los_prefijos_son_validos():
+    assert all(avanzar_texto(ESTADO_INICIAL, TEXTO_ANALISIS[:i]) is not None for i in range(len(TEXTO_ANALISIS)))
+
+
+@pytest.mark.parametrize("texto", [
+    '[',
+    '{"nota"',
+    '{"puntuacion_general": 11',
+    '{"puntuacion_general": -1',
+    '{"puntuacion_general": 1.5',
+    '{"puntuacion_general": "7"',
+    '{"puntuacion_general": 7, "puntuacion_general"',
+    '{"puntuacion_general": 7}',
+    '{"recomendacion": "a\x01',
+    '{"recomendacion": "\\x',
+    '{"recomendacion": "\\u12"',
+    '{"aspectos_positivos": [' + ', '.join(['"x"'] * MAX_ELEMENTOS_LISTA) + ',',
+    TEXTO_ANALISIS[:1] + ' ' * 17,
+], ids=[
+    "no_objeto", "clave_desconocida", "mayor_de_10", "negativo", "decimal", "entero_como_texto",
+    "clave_repetida", "cierre_incompleto", "control_en_texto", "escape_desconocido", "unicode_corto",
+    "lista_larga", "demasiados_espacios"
+])
+def test_prefijos_invalidos(texto):
+    assert avanzar_texto(ESTADO_INICIAL, texto) is None
+
+
+def test_reparar_truncado_en_cualquier_punto():
+    for corte in range(1, len(TEXTO_ANALISIS)):
+        reparado = reparar_truncado(TEXTO_ANALISIS[:corte])
+        assert isinstance(json.loads(reparado), dict), reparado
+
+
+def test_reparar_truncado_conserva_lo_generado():
+    corte = TEXTO_ANALISIS.index('"cierre_venta"') + len('"cierre_venta": {"puntuacion": 0')
+
+    documento = json.loads(reparar_truncado(TEXTO_ANALISIS[:corte]))
+
+    assert documento["regulacion"] == ANALISIS["regulacion"]
+    assert documento["cierre_venta"] == {"puntuacion": 0}
+    assert "puntuacion_general" not in documento
+
+
+def test_reparar_truncado_sin_reparacion_posible():
+    assert reparar_truncado(TEXTO_ANALISIS) is None
+    assert reparar_truncado('{"nota": 1') is None
+    assert reparar_truncado('') is None
+
+
+@pytest.mark.parametrize("texto", ['{"recomendacion": "a\\', '{"recomendacion": "a\\u00'])
+def test_reparar_truncado_a_mitad_de_escape(texto):
+    assert isinstance(json.loads(reparar_truncado(texto))["recomendacion"], str)
+
+
+def test_completar_puntuaciones_normaliza_y_estima():
+    resultado = {
+        "regulacion": {"cumplimiento": 7.6},
+        "habilidad_comercial": {"puntuacion": "9"},
+        "conocimiento_producto": {"puntuacion": 14},
+        "cierre_venta": {"puntuacion": True},
+        "puntuacion_general": None,
+    }
+    respuesta = '{"conocimiento_producto": {"puntuacion": 6, "comentario": "x"}, "cierre_venta": {}}'
+
+    completar_puntuaciones(resultado, respuesta)
+
+    assert resultado["regulacion"]["cumplimiento"] == 8
+    assert resultado["habilidad_comercial"]["puntuacion"] == 9
+    # Fuera de rango en el JSON: se recupera del texto crudo de su sección
+    assert resultado["conocimiento_producto"]["puntuacion"] == 6
+    # Sin valor válido en ningún sitio: media de las demás
+    assert resultado["cierre_venta"]["puntuacion"] == 8
+    assert resultado["puntuacion_general"] == 8
+    assert resultado["puntuaciones_estimadas"] == [
+        "conocimiento_producto.puntuacion", "cierre_venta.puntuacion", "puntuacion_general"
+    ]
+
+
+def test_completar_puntuaciones_sin_nada_que_estimar():
+    resultado = completar_puntuaciones(json.loads(TEXTO_ANALISIS))
+
+    assert "puntuaciones_estimadas" not in resultado
+    assert resultado["conocimiento_producto"]["puntuacion"] == 10
+
+
+def test_completar_puntuaciones_sin_secciones():
+    resultado = completar_puntuaciones({})
+
+    assert resultado["regulacion"] == {"cumplimiento": None}
+    assert resultado["puntuacion_general"] is None
+    assert len(resultado["puntuaciones_estimadas"]) == 5
+
+
+@pytest.fixture(scope="module")
+def tokenizer():
+    """Tokenizer BPE diminuto entrenado sobre el esquema; el alfabeto de bytes cubre cualquier texto."""
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    from tokenizers import Tokenizer, models, trainers, pre_tokenizers, decoders
+    from transformers import PreTrainedTokenizerFast
+
+    bpe = Tokenizer(models.BPE(unk_token="<unk>"))
+    bpe.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    bpe.decoder = decoders.ByteLevel()
+    bpe.train_from_iterator([TEXTO_ANALISIS, json.dumps(ANALISIS, indent=2)], trainers.BpeTrainer(
+        vocab_size=300,
+        special_tokens=["<unk>", "<s>", "</s>"],
+        initial_alphabet=pre_tokenizers.ByteLevel.alphabet()
+    ))
+    return PreTrainedTokenizerFast(tokenizer_object=bpe, bos_token="<s>", eos_token="</s>", unk_token="<unk>")
+
+
+def _generar(tokenizer, puntuaciones, filas: int = 1, max_pasos: int = 4000):
+    """Decodificación greedy con el procesador sobre puntuaciones dadas por ``puntuaciones(paso)``."""
+    import torch
+
+    prompt = torch.full((filas, 3), tokenizer.bos_token_id)
+    procesador = ProcesadorJSONRestringido(tokenizer, filas=filas, top_k=5)
+    input_ids = prompt
+    terminadas = torch.zeros(filas, dtype=torch.bool)
+    for paso in range(max_pasos):
+        restringidas = procesador(input_ids, puntuaciones(paso, filas, len(tokenizer)))
+        siguiente = restringidas.argmax(dim=-1)
+        siguiente[terminadas] = tokenizer.eos_token_id
+        input_ids = torch.cat([input_ids, siguiente[:, None]], dim=1)
+        terminadas |= siguiente == tokenizer.eos_token_id
+        if terminadas.all():
+            break
+    return [tokenizer.decode(fila[prompt.shape[1]:], skip_special_tokens=True) for fila in input_ids]
+
+
+def test_generacion_aleatoria_produce_json_del_esquema(tokenizer):
+    import torch
+
+    generador = torch.Generator().manual_seed(0)
+    textos = _generar(tokenizer, lambda paso, filas, vocab: torch.randn(filas, vocab, generator=generador), filas=3)
+
+    for texto in textos:
+        documento = json.loads(texto)
+        assert set(documento) == set(ANALISIS)
+        assert avanzar_texto(ESTADO_INICIAL, texto).terminado
+
+
+def test_eos_antes_de_tiempo_no_corta_el_json(tokenizer):
+    import torch
+
+    generador = torch.Generator().manual_seed(1)
+
+    def puntuaciones(paso, filas, vocab):
+        # El modelo quiere terminar desde el primer paso
+        valores = torch.randn(filas, vocab, generator=generador)
+        valores[:, tokenizer.eos_token_id] = 100
+        return valores
+
+    texto, = _generar(tokenizer, puntuaciones)
+
+    assert avanzar_texto(ESTADO_INICIAL, texto).terminado
+
+
+def test_json_cerrado_solo_admite_eos(tokenizer):
+    import torch
+
+    generados = tokenizer(TEXTO_ANALISIS, add_special_tokens=False).input_ids
+    procesador = ProcesadorJSONRestringido(tokenizer, filas=1)
+    procesador(torch.tensor([[tokenizer.bos_token_id]]), torch.zeros(1, len(tokenizer)))
+
+    restringidas = procesador(
+        torch.tensor([[tokenizer.bos_token_id] + generados]), torch.randn(1, len(tokenizer))
+    )
+
+    assert torch.isfinite(restringidas).nonzero().tolist() == [[0, tokenizer.eos_token_id]]
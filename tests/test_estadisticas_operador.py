@@ -0,0 +1,84 @@
+"""Las estadísticas por operador cuentan solo el último análisis de cada llamada."""
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from APP.Infrastructure.database import db_manager, fila_analisis, PERIODO_TOTAL
+
+
+def _analisis(puntuacion: int) -> dict:
+    return {
+        'regulacion': {'cumplimiento': puntuacion, 'comentario': ''},
+        'habilidad_comercial': {'puntuacion': puntuacion, 'comentario': ''},
+        'conocimiento_producto': {'puntuacion': puntuacion, 'comentario': ''},
+        'cierre_venta': {'puntuacion': puntuacion, 'comentario': ''},
+        'puntuacion_general': puntuacion
+    }
+
+
+def _ejecutar(sql: str, parametros: tuple = ()):
+    with db_manager._get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, parametros)
+        conn.commit()
+
+
+@pytest.fixture
+def llamadas_operador():
+    try:
+        db_manager.inicializar_esquema()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+
+    operador = f"test-estadisticas-{uuid4()}"
+    llamada_ids = [str(uuid4()) for _ in range(2)]
+    for llamada_id in llamada_ids:
+        db_manager.guardar_llamada({
+            'id': llamada_id,
+            'customer_name': 'cliente',
+            'operator_name': operador,
+            'start_at': datetime(2024, 1, 1, 9).isoformat(),
+            'end_at': None,
+            'palabras_clave': []
+        })
+    yield operador, llamada_ids
+    _ejecutar("DELETE FROM analisis_llamadas WHERE llamada_id = ANY(%s)", (llamada_ids,))
+    _ejecutar("DELETE FROM llamadas WHERE id = ANY(%s)", (llamada_ids,))
+    _ejecutar("DELETE FROM operador_estadisticas WHERE operator_name = %s", (operador,))
+
+
+def _totales(operador: str) -> tuple:
+    with db_manager._get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT total_analisis, suma_puntuacion, n_puntuacion FROM operador_estadisticas
+                WHERE operator_name = %s AND granularidad = 'total' AND periodo = %s
+            """, (operador, PERIODO_TOTAL))
+            return tuple(cursor.fetchone())
+
+
+def test_reanalizar_sustituye_la_contribucion_anterior(llamadas_operador):
+    operador, (primera, segunda) = llamadas_operador
+    db_manager.guardar_analisis(primera, _analisis(4))
+    db_manager.guardar_analisis(segunda, _analisis(6))
+    db_manager.guardar_analisis(primera, _analisis(8))  # force=True desde la API
+
+    assert _totales(operador) == (2, 14, 2)
+
+    reanalisis_id = str(uuid4())
+    db_manager.crear_reanalisis(reanalisis_id, total=2)
+    try:
+        db_manager.guardar_bloque_reanalisis(
+            reanalisis_id,
+            [fila_analisis(primera, _analisis(10)), fila_analisis(segunda, _analisis(2))],
+            ultimo_id=segunda,
+            contadores={'procesadas': 2, 'analizadas': 2}
+        )
+        assert _totales(operador) == (2, 12, 2)
+
+        # La reconstrucción completa llega a lo mismo que los incrementos
+        db_manager.reconstruir_estadisticas_operadores()
+        assert _totales(operador) == (2, 12, 2)
+    finally:
+        _ejecutar("DELETE FROM reanalisis WHERE id = %s", (reanalisis_id,))
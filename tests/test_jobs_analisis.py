@@ -0,0 +1,92 @@
+"""Recuperación de jobs abandonados por latido (heartbeat_at) en lugar de por started_at."""
+import threading
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from APP.Application.JobsAnalisis import GestorJobsAnalisis
+from APP.Infrastructure.database import db_manager
+
+
+def _ejecutar(sql: str, parametros: tuple = ()):
+    with db_manager._get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(sql, parametros)
+            filas = cursor.fetchall() if cursor.description else None
+        conn.commit()
+    return filas
+
+
+@pytest.fixture
+def job_en_running():
+    """Job en running desde hace 10 minutos, como uno largo o uno cuyo proceso murió."""
+    try:
+        db_manager.inicializar_esquema()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+
+    llamada_id = str(uuid4())
+    db_manager.guardar_llamada({
+        'id': llamada_id,
+        'customer_name': 'cliente',
+        'operator_name': f"test-jobs-{llamada_id}",
+        'start_at': datetime(2024, 1, 1, 9).isoformat(),
+        'end_at': None,
+        'palabras_clave': []
+    })
+    job_id = db_manager.crear_job_analisis(str(uuid4()), llamada_id)['id']
+    _ejecutar("""
+        UPDATE analisis_jobs
+        SET estado = 'running',
+            started_at = CURRENT_TIMESTAMP - interval '10 minutes',
+            heartbeat_at = CURRENT_TIMESTAMP - interval '10 minutes'
+        WHERE id = %s
+    """, (job_id,))
+    yield job_id
+    _ejecutar("DELETE FROM analisis_jobs WHERE llamada_id = %s", (llamada_id,))
+    _ejecutar("DELETE FROM llamadas WHERE id = %s", (llamada_id,))
+    _ejecutar("DELETE FROM operador_estadisticas WHERE operator_name = %s", (f"test-jobs-{llamada_id}",))
+
+
+def _estado(job_id: str) -> str:
+    return db_manager.obtener_job_analisis(job_id)['estado']
+
+
+def test_sin_latido_se_reencola(job_en_running):
+    db_manager.recuperar_jobs_analisis(timeout_segundos=120)
+
+    assert _estado(job_en_running) == 'queued'
+
+
+def test_con_latido_reciente_sigue_en_running(job_en_running):
+    db_manager.latido_jobs_analisis([job_en_running])
+    db_manager.recuperar_jobs_analisis(timeout_segundos=120)
+
+    assert _estado(job_en_running) == 'running'
+
+
+def test_el_gestor_renueva_el_latido_de_sus_jobs(job_en_running):
+    gestor = GestorJobsAnalisis(
+        procesador=lambda llamada_id, force: {},
+        num_workers=1,
+        max_cola=10,
+        intervalo_segundos=1.0,
+        timeout_segundos=120,
+        latido_segundos=0.05
+    )
+    gestor._en_curso.add(job_en_running)
+    latido = threading.Thread(target=gestor._bucle_latido)
+    latido.start()
+    try:
+        anterior = db_manager.obtener_job_analisis(job_en_running)['heartbeat_at']
+        for _ in range(100):
+            if db_manager.obtener_job_analisis(job_en_running)['heartbeat_at'] != anterior:
+                break
+            gestor._detener.wait(0.05)
+    finally:
+        gestor._detener.set()
+        latido.join()
+
+    db_manager.recuperar_jobs_analisis(timeout_segundos=120)
+    assert _estado(job_en_running) == 'running'
@@ -0,0 +1,83 @@
+"""Listado con filtros desde/hasta (con zona y paginado), con psycopg2 y con asyncpg."""
+import asyncio
+from datetime import datetime, timezone
+from uuid import uuid4
+
+import pytest
+
+from APP.Infrastructure.database import db_manager
+from APP.Infrastructure.database_async import db_manager_async
+
+
+@pytest.fixture
+def operador():
+    try:
+        db_manager.verificar_conexion()
+    except Exception as e:
+        pytest.skip(f"PostgreSQL no disponible: {e}")
+
+    nombre = f"test-fechas-{uuid4()}"
+    # La de las 10 se inserta la última: created_at no sigue el orden de start_at
+    for hora in (9, 11, 10):
+        db_manager.guardar_llamada({
+            'id': str(uuid4()),
+            'customer_name': 'cliente',
+            'operator_name': nombre,
+            'start_at': datetime(2024, 1, 1, hora).isoformat(),
+            'end_at': None,
+            'palabras_clave': []
+        })
+    yield nombre
+    with db_manager._get_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM llamadas WHERE operator_name = %s", (nombre,))
+            cursor.execute("DELETE FROM operador_estadisticas WHERE operator_name = %s", (nombre,))
+        conn.commit()
+
+
+def _listador(modo: str):
+    if modo == "psycopg2":
+        return db_manager.listar_llamadas
+
+    def listar(**filtros):
+        async def pagina():
+            try:
+                return await db_manager_async.listar_llamadas(**filtros)
+            finally:
+                await db_manager_async.cerrar()
+        return asyncio.run(pagina())
+    return listar
+
+
+def _listar(modo: str, **filtros):
+    return _listador(modo)(**filtros)[0]
+
+
+def _paginar(modo: str, **filtros):
+    listar = _listador(modo)
+    llamadas, cursor_pagina = [], None
+    while True:
+        pagina, cursor_pagina = listar(limit=1, cursor_pagina=cursor_pagina, **filtros)
+        llamadas.extend(pagina)
+        if not cursor_pagina:
+            return llamadas
+
+
+@pytest.mark.parametrize("modo", ["psycopg2", "asyncpg"])
+def test_desde_hasta_con_zona(operador, modo):
+    # Lo que FastAPI entrega para ?desde=2024-01-01T10:30:00Z
+    desde = datetime(2024, 1, 1, 10, 30, tzinfo=timezone.utc)
+    hasta = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+    llamadas = _listar(modo, operator_name=operador, desde=desde, hasta=hasta)
+
+    assert [llamada['start_at'] for llamada in llamadas] == [datetime(2024, 1, 1, 11)]
+    assert len(_listar(modo, operator_name=operador, hasta=desde)) == 2
+
+
+@pytest.mark.parametrize("modo", ["psycopg2", "asyncpg"])
+def test_paginas_con_rango_en_orden_de_start_at(operador, modo):
+    llamadas = _paginar(modo, operator_name=operador, desde=datetime(2024, 1, 1))
+
+    assert [llamada['start_at'].hour for llamada in llamadas] == [11, 10, 9]
+    assert [llamada['start_at'].hour for llamada in _paginar(modo, operator_name=operador)] == [10, 11, 9]
@@ -0,0 +1,41 @@
+"""Motor de lotes: cada solicitud recibe su resultado o una excepción, nunca se queda esperando."""
+import pytest
+
+from APP.Application.MotorAnalisis import MotorAnalisisBatch
+
+
+def _motor(procesar_lote) -> MotorAnalisisBatch:
+    return MotorAnalisisBatch(procesar_lote, ventana_ms=200, max_tamano_lote=4)
+
+
+def test_resultados_en_el_orden_del_lote():
+    motor = _motor(lambda transcripciones: [{"texto": texto} for texto in transcripciones])
+
+    futuros = [motor.enviar(f"t{i}") for i in range(4)]
+
+    assert [futuro.result(timeout=5) for futuro in futuros] == [{"texto": f"t{i}"} for i in range(4)]
+    assert motor.obtener_estadisticas()["lotes_procesados"] == 1
+
+
+@pytest.mark.parametrize("sobran", [-1, 1], ids=["faltan_resultados", "sobran_resultados"])
+def test_lote_con_resultados_de_mas_o_de_menos(sobran):
+    motor = _motor(lambda transcripciones: [{}] * (len(transcripciones) + sobran))
+
+    futuros = [motor.enviar(f"t{i}") for i in range(3)]
+
+    for futuro in futuros:
+        with pytest.raises(RuntimeError, match="resultados para 3 transcripciones"):
+            futuro.result(timeout=5)
+    assert motor.obtener_estadisticas()["lotes_procesados"] == 0
+
+
+def test_excepcion_del_lote_llega_a_todas_las_solicitudes():
+    def procesar_lote(transcripciones):
+        raise ValueError("sin memoria")
+
+    motor = _motor(procesar_lote)
+    futuros = [motor.enviar(f"t{i}") for i in range(2)]
+
+    for futuro in futuros:
+        with pytest.raises(ValueError, match="sin memoria"):
+            futuro.result(timeout=5)
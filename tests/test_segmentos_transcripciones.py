@@ -0,0 +1,184 @@
+"""Almacenamiento en segmentos: ida y vuelta, compactación, cortes a mitad y varios procesos."""
+import multiprocessing
+import os
+
+import pytest
+
+from APP.Infrastructure.segmentos_transcripciones import AlmacenamientoSegmentos, FORMATO_INDICE
+
+
+def _documento(i: int, relleno: int = 80) -> dict:
+    return {"transcripcion": {"texto": "x" * relleno}, "i": i}
+
+
+@pytest.fixture
+def abrir(tmp_path):
+    abiertos = []
+
+    def abrir_almacenamiento(max_bytes_segmento: int = 2000) -> AlmacenamientoSegmentos:
+        almacenamiento = AlmacenamientoSegmentos(tmp_path, max_bytes_segmento=max_bytes_segmento)
+        abiertos.append(almacenamiento)
+        return almacenamiento
+
+    yield abrir_almacenamiento
+    for almacenamiento in abiertos:
+        if not almacenamiento._bloqueo.closed:
+            almacenamiento.cerrar()
+
+
+def test_guardar_leer_eliminar(abrir):
+    almacenamiento = abrir()
+    for i in range(30):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    almacenamiento.guardar("id3", _documento(300))
+
+    assert almacenamiento.leer("id7") == _documento(7)
+    assert almacenamiento.leer("id3") == _documento(300)
+    assert almacenamiento.eliminar("id5") is True
+    assert almacenamiento.leer("id5") is None
+    assert almacenamiento.eliminar("id5") is False
+    assert len(almacenamiento._segmentos_en_disco()) > 1
+    assert {entrada['llamada_id'] for entrada in almacenamiento.listar()} == {f"id{i}" for i in range(30)} - {"id5"}
+
+
+def test_reabrir_conserva_datos(abrir):
+    almacenamiento = abrir()
+    for i in range(30):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    almacenamiento.eliminar("id0")
+    almacenamiento.cerrar()
+
+    reabierto = abrir()
+    assert reabierto.leer("id0") is None
+    assert all(reabierto.leer(f"id{i}") == _documento(i) for i in range(1, 30))
+
+
+def test_compactar_mueve_vivos_y_borra_segmentos(abrir):
+    almacenamiento = abrir()
+    for i in range(40):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    primer_segmento = almacenamiento._segmentos_en_disco()[0]
+    del_primero = [k for k, (segmento, *_) in almacenamiento._ubicaciones.items() if segmento == primer_segmento]
+    for llamada_id in del_primero[1:]:
+        almacenamiento.eliminar(llamada_id)
+
+    resultado = almacenamiento.compactar(umbral_muertos=0.5)
+
+    assert resultado == {'segmentos_compactados': 1, 'registros_movidos': 1}
+    assert primer_segmento not in almacenamiento._segmentos_en_disco()
+    vivos = {f"id{i}" for i in range(40)} - set(del_primero[1:])
+    assert all(almacenamiento.leer(llamada_id) == _documento(int(llamada_id[2:])) for llamada_id in vivos)
+
+    almacenamiento.cerrar()
+    reabierto = abrir()
+    assert {entrada['llamada_id'] for entrada in reabierto.listar()} == vivos
+    assert reabierto.leer(del_primero[0]) == _documento(int(del_primero[0][2:]))
+
+
+def test_bytes_muertos_sobreviven_a_una_compactacion_y_un_reinicio(abrir):
+    almacenamiento = abrir()
+    for i in range(60):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    por_segmento = {}
+    for llamada_id, (segmento, *_) in almacenamiento._ubicaciones.items():
+        por_segmento.setdefault(segmento, []).append(llamada_id)
+    for llamada_id in por_segmento[1]:
+        almacenamiento.eliminar(llamada_id)
+    for llamada_id in por_segmento[2][::2]:
+        almacenamiento.eliminar(llamada_id)
+
+    # Solo se compacta el segmento 1; el índice reescrito ya no tiene las bajas del 2
+    almacenamiento.compactar(umbral_muertos=0.9)
+    muertos_segundo = almacenamiento._bytes_muertos[2]
+    almacenamiento.cerrar()
+
+    reabierto = abrir()
+    assert reabierto._bytes_muertos[2] == muertos_segundo
+    assert reabierto.compactar(umbral_muertos=0.3)['segmentos_compactados'] == 1
+
+
+def test_corte_a_mitad_de_entrada_del_indice(abrir, tmp_path):
+    almacenamiento = abrir()
+    for i in range(5):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    almacenamiento.cerrar()
+
+    # Datos escritos y entrada del índice a medias: se descarta al reabrir
+    ruta_indice = tmp_path / "segmentos" / "indice.log"
+    with open(ruta_indice, 'ab') as f:
+        f.write(FORMATO_INDICE.pack(1, 0.0, 1, 0, 10, 9)[:FORMATO_INDICE.size - 3])
+    tamano_cortado = ruta_indice.stat().st_size
+
+    reabierto = abrir()
+    assert ruta_indice.stat().st_size == tamano_cortado - (FORMATO_INDICE.size - 3)
+    assert all(reabierto.leer(f"id{i}") == _documento(i) for i in range(5))
+    reabierto.guardar("id5", _documento(5))
+    reabierto.cerrar()
+
+    assert abrir().leer("id5") == _documento(5)
+
+
+def test_corte_a_mitad_de_datos(abrir, tmp_path):
+    almacenamiento = abrir(max_bytes_segmento=1024 * 1024)
+    almacenamiento.guardar("id0", _documento(0))
+    almacenamiento.cerrar()
+
+    # Bytes huérfanos al final del segmento (datos sin entrada en el índice)
+    with open(tmp_path / "segmentos" / "segmento_000001.log", 'ab') as f:
+        f.write(b'{"transcripcion": {"te')
+
+    reabierto = abrir(max_bytes_segmento=1024 * 1024)
+    assert reabierto._bytes_muertos[1] == len(b'{"transcripcion": {"te')
+    reabierto.guardar("id1", _documento(1))
+    assert reabierto.leer("id0") == _documento(0)
+    assert reabierto.leer("id1") == _documento(1)
+
+
+def _escribir_en_otro_proceso(directorio: str, inicio: int, fin: int):
+    almacenamiento = AlmacenamientoSegmentos(directorio, max_bytes_segmento=2000)
+    for i in range(inicio, fin):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    almacenamiento.cerrar()
+
+
+def _compactar_en_otro_proceso(directorio: str):
+    almacenamiento = AlmacenamientoSegmentos(directorio, max_bytes_segmento=2000)
+    almacenamiento.compactar(umbral_muertos=0.3)
+    almacenamiento.cerrar()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="necesita fork")
+def test_varios_procesos_comparten_el_directorio(abrir, tmp_path):
+    contexto = multiprocessing.get_context("fork")
+    almacenamiento = abrir()
+    almacenamiento.guardar("propio", _documento(-1))
+
+    escritores = [
+        contexto.Process(target=_escribir_en_otro_proceso, args=(str(tmp_path), n * 50, n * 50 + 50))
+        for n in range(2)
+    ]
+    for proceso in escritores:
+        proceso.start()
+    for i in range(100, 150):
+        almacenamiento.guardar(f"id{i}", _documento(i))
+    for proceso in escritores:
+        proceso.join()
+        assert proceso.exitcode == 0
+
+    # Este proceso ve lo que escribieron los otros, sin registros pisados
+    assert all(almacenamiento.leer(f"id{i}") == _documento(i) for i in range(150))
+
+    for i in range(0, 150, 3):
+        almacenamiento.eliminar(f"id{i}")
+    compactador = contexto.Process(target=_compactar_en_otro_proceso, args=(str(tmp_path),))
+    compactador.start()
+    compactador.join()
+    assert compactador.exitcode == 0
+
+    # Índice compactado por otro proceso: se recarga y las lecturas siguen funcionando
+    vivos = [i for i in range(150) if i % 3]
+    assert all(almacenamiento.leer(f"id{i}") == _documento(i) for i in vivos)
+    assert almacenamiento.leer("id0") is None
+    almacenamiento.guardar("despues", _documento(-2))
+    almacenamiento.cerrar()
+    assert abrir().leer("despues") == _documento(-2)